@@ -0,0 +1,152 @@
+"""
+Benchmark the `PoolParty` and `GraphSearch` clients against the local mock
+server, e.g.:
+
+    python -m benchmarks.bench_api --latency 0.005 --requests 200 --workers 8
+    python -m benchmarks.bench_api --save base.json
+    python -m benchmarks.bench_api --baseline base.json  # exit 1 if slower
+"""
+import argparse
+import datetime
+import sys
+
+from pp_api import PoolParty, GraphSearch
+from pp_api import utils as u
+from pp_api.tests.mock_server import MockServer
+
+from benchmarks import harness
+
+
+PID = 'mock'
+AUTH = ('user', 'password')
+
+
+def bench_extract(pp, gs, server, n):
+    text = ' '.join(server.pref_label(i) for i in range(server.n_concepts))
+
+    def fn(i):
+        r = pp.extract(text, PID)
+        pp.get_cpts_from_response(r)
+    return fn, range(n)
+
+
+def bench_pref_labels(pp, gs, server, n):
+    uris = [server.uri(i) for i in range(20)]
+
+    def fn(i):
+        pp.get_pref_labels(uris, PID)
+    return fn, range(n)
+
+
+def bench_cpt_path(pp, gs, server, n):
+    def fn(i):
+        pp.get_cpt_path(server.uri(i % server.thesaurus_size), PID)
+    return fn, range(n)
+
+
+def bench_corpus_paging(pp, gs, server, n):
+    def fn(i):
+        pp.get_cpt_corpus_freqs('corpus:mock', PID)
+    return fn, range(max(1, n // 20))
+
+
+def bench_gs_create(pp, gs, server, n):
+    cpts = [{'uri': server.uri(i), 'frequencyInDocument': 1 + i % 3}
+            for i in range(server.n_concepts)]
+    date = datetime.datetime(2020, 1, 1)
+    text = server.document_text(0)
+
+    def fn(i):
+        gs.create_with_freqs(
+            id_='http://mock.doc/{}'.format(i), title='t', author='a',
+            date=date, cpts=cpts, search_space_id='space', text=text
+        )
+    return fn, range(n)
+
+
+def bench_gs_payload(pp, gs, server, n):
+    """Facet construction and serialization only, 2000 concepts per doc."""
+    cpts = [{'uri': server.uri(i), 'frequencyInDocument': 1 + i % 3}
+            for i in range(2000)]
+    date = datetime.datetime(2020, 1, 1)
+
+    def fn(i):
+        data = gs.payload_with_freqs(
+            id_='http://mock.doc/{}'.format(i), title='t', author='a',
+            date=date, cpts=cpts, search_space_id='space', text='text'
+        )
+        gs.json_dumps(data)
+    return fn, range(n)
+
+
+def bench_gs_search(pp, gs, server, n):
+    def fn(i):
+        gs.search('space', search_filters=gs.filter_full_text('concept'))
+    return fn, range(n)
+
+
+BENCHMARKS = {
+    'extract': bench_extract,
+    'pref_labels': bench_pref_labels,
+    'cpt_path': bench_cpt_path,
+    'corpus_paging': bench_corpus_paging,
+    'gs_create': bench_gs_create,
+    'gs_payload': bench_gs_payload,
+    'gs_search': bench_gs_search,
+}
+
+
+def run(names, modes, requests=100, workers=8, memory=False, **server_args):
+    results = []
+    with MockServer(**server_args) as server:
+        pp = PoolParty(server.url, auth_data=AUTH, pool_maxsize=workers)
+        gs = GraphSearch(server.url, session=pp.session,
+                         json_dumps=u.fast_json_dumps)
+        for name in names:
+            for mode in modes:
+                fn, items = BENCHMARKS[name](pp, gs, server, requests)
+                results.append(harness.measure(name, mode, fn, items,
+                                               workers=workers, memory=memory))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('benchmarks', nargs='*',
+                        help='any of: ' + ', '.join(BENCHMARKS))
+    parser.add_argument('--modes', nargs='+', default=list(harness.MODES),
+                        choices=harness.MODES)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.,
+                        help='server side latency per request, seconds')
+    parser.add_argument('--concepts', type=int, default=50,
+                        help='concepts per extraction / document')
+    parser.add_argument('--doc-size', type=int, default=1000)
+    parser.add_argument('--memory', action='store_true',
+                        help='record peak memory (slows the run down)')
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--baseline', help='compare with this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    args = parser.parse_args(argv)
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error('unknown benchmark: ' + name)
+
+    results = run(args.benchmarks or list(BENCHMARKS), args.modes, requests=args.requests,
+                  workers=args.workers, memory=args.memory,
+                  latency=args.latency, n_concepts=args.concepts,
+                  doc_size=args.doc_size)
+    print(harness.format_table(results))
+    if args.save:
+        harness.save(results, args.save)
+    if args.baseline:
+        regressions = harness.compare(results, args.baseline, args.tolerance)
+        for msg in regressions:
+            print('REGRESSION: ' + msg)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+"""
+Measure the cold import time of `pp_api` and check which heavy dependencies
+get loaded by it, e.g.:
+
+    python -m benchmarks.bench_import --repeat 20
+    python -m benchmarks.bench_import --max-ms 150  # exit 1 if slower
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+
+HEAVY = ('numpy', 'rdflib', 'nif', 'decouple', 'SPARQLWrapper')
+
+_probe = """
+import json, sys, time
+start = time.perf_counter()
+{stmt}
+took = time.perf_counter() - start
+print(json.dumps({{'took': took, 'loaded': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(stmt='import pp_api', repeat=10):
+    """
+    Run `stmt` in `repeat` fresh interpreters.
+
+    :return: (list of seconds, set of heavy modules loaded by `stmt`)
+    """
+    times = []
+    loaded = set()
+    for _ in range(repeat):
+        out = subprocess.check_output(
+            [sys.executable, '-c', _probe.format(stmt=stmt, heavy=HEAVY)])
+        res = json.loads(out.decode().strip().splitlines()[-1])
+        times.append(res['took'])
+        loaded.update(res['loaded'])
+    return times, loaded
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--max-ms', type=float,
+                        help='fail if the median import time is higher')
+    args = parser.parse_args(argv)
+
+    failed = False
+    for stmt in ['import pp_api', 'from pp_api import PoolParty, GraphSearch']:
+        times, loaded = measure(stmt, args.repeat)
+        median_ms = statistics.median(times) * 1000
+        print('{:<45} median {:7.1f} ms  min {:7.1f} ms  heavy: {}'.format(
+            stmt, median_ms, min(times) * 1000,
+            ', '.join(sorted(loaded)) or '-'))
+        if loaded or (args.max_ms and median_ms > args.max_ms):
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
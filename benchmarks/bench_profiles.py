@@ -0,0 +1,66 @@
+"""
+Compare the extraction profiles (`pp_api.profiles`) against the mock server:
+latency, answer size and parsing time per profile, e.g.:
+
+    python -m benchmarks.bench_profiles --concepts 500 --requests 50
+"""
+import argparse
+import io
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from pp_api import PoolParty
+from pp_api.profiles import PROFILES
+from pp_api.tests.mock_server import MockServer
+
+
+PID = 'mock'
+AUTH = ('user', 'password')
+
+
+def bench_profile(pp, text, profile, n):
+    latencies = []
+    parse_times = []
+    size = 0
+    for _ in range(n):
+        start = perf_counter()
+        r = pp._extract_file(io.BytesIO(text.encode('utf8')), PID,
+                             **profile.params)
+        latencies.append(perf_counter() - start)
+        size = len(r.content)
+        start = perf_counter()
+        profile.parse(r.content)
+        parse_times.append(perf_counter() - start)
+    return {'profile': profile.name, 'bytes': size,
+            'p50': float(np.percentile(latencies, 50)),
+            'parse': float(np.mean(parse_times))}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concepts', type=int, default=200)
+    parser.add_argument('--terms', type=int, default=200)
+    parser.add_argument('--thesaurus-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    with MockServer(n_concepts=args.concepts, n_terms=args.terms,
+                    thesaurus_size=args.thesaurus_size) as server:
+        pp = PoolParty(server.url, auth_data=AUTH)
+        text = server.document_text(0)
+        results = [bench_profile(pp, text, profile, args.requests)
+                   for profile in PROFILES.values()]
+
+    print('{:<16} {:>10} {:>12} {:>12}'.format('profile', 'KiB',
+                                               'p50 ms', 'parse ms'))
+    for res in results:
+        print('{:<16} {:>10.1f} {:>12.2f} {:>12.3f}'.format(
+            res['profile'], res['bytes'] / 1024, res['p50'] * 1000,
+            res['parse'] * 1000))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
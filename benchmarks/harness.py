@@ -0,0 +1,127 @@
+"""
+Helpers to measure throughput, latency percentiles and memory of a call
+executed sequentially or from a thread pool. The clients are blocking and
+there is no async client, so there is no asyncio mode.
+"""
+import json
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import numpy as np
+
+
+MODES = ('sequential', 'threaded')
+
+
+class Result:
+    def __init__(self, name, mode, wall, latencies, peak_mem=None):
+        self.name = name
+        self.mode = mode
+        self.wall = wall
+        self.latencies = np.asarray(latencies)
+        self.peak_mem = peak_mem
+
+    @property
+    def throughput(self):
+        return len(self.latencies) / self.wall if self.wall else float('inf')
+
+    def percentile(self, q):
+        return float(np.percentile(self.latencies, q)) if len(self.latencies) else 0.
+
+    def as_dict(self):
+        return {
+            'name': self.name,
+            'mode': self.mode,
+            'n': len(self.latencies),
+            'wall': self.wall,
+            'throughput': self.throughput,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'peak_mem': self.peak_mem,
+        }
+
+
+def _timed(fn, item, latencies):
+    start = perf_counter()
+    fn(item)
+    latencies.append(perf_counter() - start)
+
+
+def run_sequential(fn, items, workers=None):
+    latencies = []
+    for item in items:
+        _timed(fn, item, latencies)
+    return latencies
+
+
+def run_threaded(fn, items, workers=8):
+    latencies = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for f in [executor.submit(_timed, fn, item, latencies) for item in items]:
+            f.result()
+    return latencies
+
+
+_runners = {
+    'sequential': run_sequential,
+    'threaded': run_threaded,
+}
+
+
+def measure(name, mode, fn, items, workers=8, memory=False):
+    """
+    Call `fn(item)` for every item in `items` using `mode` and return a
+    `Result`. If `memory` is True the peak of traced allocations is recorded
+    (tracing slows the run down, so latencies are not comparable then).
+    """
+    items = list(items)
+    if memory:
+        tracemalloc.start()
+    start = perf_counter()
+    latencies = _runners[mode](fn, items, workers=workers)
+    wall = perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return Result(name, mode, wall, latencies, peak)
+
+
+def format_table(results):
+    header = '{:<22} {:<10} {:>6} {:>10} {:>9} {:>9} {:>9} {:>10}'.format(
+        'benchmark', 'mode', 'n', 'req/s', 'p50 ms', 'p90 ms', 'p99 ms',
+        'peak KiB')
+    lines = [header, '-' * len(header)]
+    for res in results:
+        d = res.as_dict()
+        lines.append(
+            '{:<22} {:<10} {:>6} {:>10.1f} {:>9.2f} {:>9.2f} {:>9.2f} {:>10}'.format(
+                d['name'], d['mode'], d['n'], d['throughput'],
+                d['p50'] * 1000, d['p90'] * 1000, d['p99'] * 1000,
+                '-' if d['peak_mem'] is None else d['peak_mem'] // 1024))
+    return '\n'.join(lines)
+
+
+def save(results, path):
+    with open(path, 'w') as f:
+        json.dump([r.as_dict() for r in results], f, indent=2)
+
+
+def compare(results, baseline_path, tolerance=0.2):
+    """
+    Compare throughput with a saved baseline. Return a list of messages for
+    the benchmarks that got slower by more than `tolerance`.
+    """
+    with open(baseline_path) as f:
+        baseline = {(x['name'], x['mode']): x for x in json.load(f)}
+    regressions = []
+    for res in results:
+        old = baseline.get((res.name, res.mode))
+        if old is None:
+            continue
+        if res.throughput < old['throughput'] * (1 - tolerance):
+            regressions.append('{} ({}): {:.1f} req/s, baseline {:.1f}'.format(
+                res.name, res.mode, res.throughput, old['throughput']))
+    return regressions
@@ -1,5 +1,74 @@
-from pp_api.pp_calls import *
-from pp_api.sparql_calls import *
-from pp_api.gs_calls import *
-from pp_api.extractor_utils import *
-import pp_api.utils
+"""
+Wrappers around the PoolParty and GraphSearch APIs.
+
+Submodules are imported lazily on first attribute access, so that
+`import pp_api` stays cheap: requests is loaded with the clients, numpy and
+rdflib only with `sparql_calls`, and nif only by `PoolParty.format_nif`.
+"""
+import importlib
+import sys
+
+_exports = {
+    'PoolParty': 'pp_calls',
+    'GraphSearch': 'gs_calls',
+    'FacetMapper': 'gs_calls',
+    'sort_by_date': 'gs_calls',
+    'add_custom_fields_from_the': 'gs_calls',
+    'get_corpus_analysis_graphs': 'sparql_calls',
+    'get_corpus_zscores': 'sparql_calls',
+    'get_pp_terms': 'sparql_calls',
+    'all_data_q': 'sparql_calls',
+    'q_get_doc_text_by_doc_id': 'sparql_calls',
+    'query_sparql_endpoint': 'sparql_calls',
+    'get_ridfs': 'sparql_calls',
+    'query_cpt_cooc_scores': 'sparql_calls',
+    'query_terms2cpts_cooc_scores': 'sparql_calls',
+    'ppextract2matches': 'extractor_utils',
+    'remove_overlaps': 'extractor_utils',
+    'TaxonomyBatch': 'bulk',
+    'TaxonomyBuilder': 'rdf_import',
+    'LabelResolver': 'labels',
+    'LabelCache': 'labels',
+    'JobRunner': 'jobs',
+    'CheckpointStore': 'jobs',
+    'ExtractionResult': 'extraction',
+    'DeadLetterSink': 'extraction',
+    'ServerPool': 'balancer',
+    'ExtractionPipeline': 'postprocess',
+    'SuggestIndex': 'suggest',
+    'LabelAnnotator': 'annotator',
+    'HierarchyIndex': 'hierarchy',
+}
+_submodules = {'pp_calls', 'gs_calls', 'sparql_calls', 'extractor_utils',
+               'utils', 'metrics', 'bulk', 'rdf_import', 'nif_writer',
+               'columnar', 'cooc', 'labels',
+               'jobs', 'extraction', 'balancer', 'postprocess',
+               'profiles', 'suggest', 'annotator', 'hierarchy', 'corpus'}
+
+# module names bound by `from pp_api import *` when the package imported
+# its submodules eagerly
+_star_modules = ['pp_api', 'pp_calls', 'gs_calls', 'sparql_calls',
+                 'extractor_utils', 'utils', 'u']
+
+__all__ = list(_exports) + _star_modules
+
+
+def __getattr__(name):
+    if name in _exports:
+        module = importlib.import_module('pp_api.' + _exports[name])
+        value = getattr(module, name)
+    elif name in _submodules:
+        value = importlib.import_module('pp_api.' + name)
+    elif name == 'u':
+        value = importlib.import_module('pp_api.utils')
+    elif name == 'pp_api':
+        value = sys.modules[__name__]
+    else:
+        raise AttributeError("module 'pp_api' has no attribute '{}'".format(name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_exports) | _submodules |
+                  set(_star_modules))
@@ -0,0 +1,236 @@
+"""
+Offline concept annotation of short texts by dictionary matching of the
+thesaurus labels (Aho-Corasick automaton over normalized text).
+
+The result has the structure of `PoolParty.get_cpts_from_response`, with
+inclusive end positions like the extractor, so it can be passed to
+`ppextract2matches`, `nif_writer` or `GraphSearch.create_with_freqs`.
+"""
+import logging
+import unicodedata
+from collections import deque
+
+module_logger = logging.getLogger(__name__)
+
+ATTRIBUTES = ['prefLabel', 'frequencyInDocument', 'uri',
+              'transitiveBroaderConcepts', 'transitiveBroaderTopConcepts',
+              'relatedConcepts']
+
+
+def _fold(c):
+    """Normalized form of one character: case-folded, without accents."""
+    c = unicodedata.normalize('NFKD', c)
+    return ''.join(x for x in c if not unicodedata.combining(x)).casefold()
+
+
+def normalize_with_offsets(text):
+    """
+    Normalize `text` like `suggest.normalize` (without stripping), keeping
+    for every normalized character the index of the original character it
+    comes from.
+
+    :return: (normalized text, list of offsets)
+    """
+    chars = []
+    offsets = []
+    space = False
+    for i, c in enumerate(text):
+        if c.isspace():
+            if not space:
+                chars.append(' ')
+                offsets.append(i)
+            space = True
+            continue
+        space = False
+        for x in _fold(c):
+            chars.append(x)
+            offsets.append(i)
+    return ''.join(chars), offsets
+
+
+class LabelAnnotator:
+    """
+    Finds all occurrences of the pref- and altLabels of the concepts in a
+    text, at word boundaries and ignoring case, accents and whitespace
+    differences.
+
+    >>> annotator = LabelAnnotator.from_project(pp, pid)
+    >>> cpts = annotator.annotate('Apple pie recipes')
+
+    :param min_length: labels shorter than this (normalized) are ignored
+    """
+
+    def __init__(self, min_length=2):
+        self.min_length = min_length
+        self.concepts = dict()  # uri -> prefLabel
+        self._labels = []  # pattern id -> (uri, normalized length)
+        self._patterns = dict()  # uri -> [(state, pattern id)]
+        self._goto = [dict()]  # state -> {char: state}
+        self._own = [[]]  # state -> patterns ending in the state
+        self._fail = [0]
+        self._out = [[]]  # state -> patterns ending in the state or its
+        # failure states
+        self._built = True
+
+    def __len__(self):
+        return len(self.concepts)
+
+    def add(self, uri, pref_label, alt_labels=()):
+        """
+        Add the labels of a concept, replacing those it had; call `build`
+        (or annotate) after.
+        """
+        if uri in self.concepts:
+            self.remove([uri])
+        self.concepts[uri] = pref_label
+        patterns = self._patterns[uri] = []
+        for label in {pref_label, *alt_labels}:
+            if not label:
+                continue
+            norm = ' '.join(normalize_with_offsets(label)[0].split())
+            if len(norm) < self.min_length:
+                continue
+            state = 0
+            for c in norm:
+                nxt = self._goto[state].get(c)
+                if nxt is None:
+                    nxt = self._goto[state][c] = len(self._goto)
+                    self._goto.append(dict())
+                    self._own.append([])
+                state = nxt
+            pattern = len(self._labels)
+            self._labels.append((uri, len(norm)))
+            self._own[state].append(pattern)
+            patterns.append((state, pattern))
+        self._built = False
+
+    def remove(self, uris):
+        """
+        Remove concepts and their labels. The states of the automaton are
+        kept, so that they are reused if the labels are added again.
+        """
+        for uri in uris:
+            self.concepts.pop(uri, None)
+            for state, pattern in self._patterns.pop(uri, ()):
+                self._own[state].remove(pattern)
+                self._labels[pattern] = None
+        self._built = False
+
+    def update(self, concepts):
+        """
+        :param concepts: concept dicts with 'uri', 'prefLabel' and optionally
+            'altLabels'
+        """
+        for cpt in concepts:
+            self.add(cpt['uri'], cpt.get('prefLabel'), cpt.get('altLabels') or ())
+
+    def build(self):
+        """Compute the failure links and outputs of the automaton."""
+        goto, own = self._goto, self._own
+        fail = [0] * len(goto)
+        out = [list(own[0])] + [None] * (len(goto) - 1)
+        queue = deque()
+        for state in goto[0].values():
+            out[state] = list(own[state])
+            queue.append(state)
+        while queue:
+            state = queue.popleft()
+            for c, nxt in goto[state].items():
+                f = fail[state]
+                while f and c not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(c, 0)
+                out[nxt] = own[nxt] + out[fail[nxt]]
+                queue.append(nxt)
+        self._fail = fail
+        self._out = out
+        self._built = True
+
+    def find(self, text):
+        """
+        Yield (start, end, uri) of all label occurrences, with `end`
+        inclusive, in the order they end.
+        """
+        if not self._built:
+            self.build()
+        norm, offsets = normalize_with_offsets(text)
+        goto, fail, out, labels = self._goto, self._fail, self._out, self._labels
+        state = 0
+        for i, c in enumerate(norm):
+            while state and c not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(c, 0)
+            if not out[state]:
+                continue
+            after = i + 1 < len(norm) and norm[i + 1].isalnum()
+            if after:
+                continue
+            for pattern in out[state]:
+                uri, length = labels[pattern]
+                start = i - length + 1
+                if start > 0 and norm[start - 1].isalnum():
+                    continue
+                yield offsets[start], offsets[i], uri
+
+    def annotate(self, text, filter_nested=True):
+        """
+        :param filter_nested: drop occurrences within a longer occurrence
+            (like the extractor parameter filterNestedConcepts)
+        :return: list of concepts as returned by
+            `PoolParty.get_cpts_from_response`, ordered by frequency
+        """
+        spans = set(self.find(text))
+        if filter_nested:
+            intervals = sorted({(start, end) for start, end, _ in spans},
+                               key=lambda x: (x[0], -x[1]))
+            kept = set()
+            max_end = -1
+            for start, end in intervals:
+                if end <= max_end:
+                    continue
+                kept.add((start, end))
+                max_end = end
+            spans = [x for x in spans if x[:2] in kept]
+        cpts = dict()
+        for start, end, uri in sorted(spans):
+            cpt = cpts.get(uri)
+            if cpt is None:
+                cpt = cpts[uri] = {attr: [] for attr in ATTRIBUTES}
+                cpt.update(uri=uri, prefLabel=self.concepts[uri],
+                           frequencyInDocument=0, matchings=[])
+                cpt['_texts'] = dict()
+            matched = text[start:end + 1]
+            matching = cpt['_texts'].get(matched)
+            if matching is None:
+                matching = cpt['_texts'][matched] = {
+                    'text': matched, 'frequency': 0, 'positions': []}
+                cpt['matchings'].append(matching)
+            matching['frequency'] += 1
+            matching['positions'].append((start, end))
+            cpt['frequencyInDocument'] += 1
+        for cpt in cpts.values():
+            del cpt['_texts']
+        return sorted(cpts.values(), key=lambda x: -x['frequencyInDocument'])
+
+    def extract(self, text, pp=None, pid=None, max_length=500, lang='en',
+                **kwargs):
+        """
+        Annotate short texts locally and send long ones (more than
+        `max_length` characters) to the extractor of `pp`.
+
+        :return: list of concepts as returned by
+            `PoolParty.get_cpts_from_response`
+        """
+        if pp is None or len(text) <= max_length:
+            return self.annotate(text)
+        return pp.get_cpts_from_response(pp.extract(text, pid, lang=lang,
+                                                    **kwargs))
+
+    @classmethod
+    def from_project(cls, pp, pid, lang=None, **kwargs):
+        """Annotator for all concepts of a project, see `get_all_concepts`."""
+        annotator = cls(**kwargs)
+        annotator.update(pp.get_all_concepts(pid, properties='all',
+                                             language=lang))
+        annotator.build()
+        return annotator
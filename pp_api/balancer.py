@@ -0,0 +1,185 @@
+"""
+Client-side load balancing of extract calls over several PoolParty servers.
+"""
+import contextlib
+import logging
+import random
+import threading
+import time
+
+import requests
+
+module_logger = logging.getLogger(__name__)
+
+STRATEGIES = ('least_outstanding', 'latency')
+
+
+def is_server_failure(e):
+    """
+    True if the exception of a call means that the server is unavailable or
+    overloaded (connection errors, timeouts, 5xx and 429 answers), rather
+    than that the request or the input was wrong.
+    """
+    if isinstance(e, (requests.ConnectionError, requests.Timeout)):
+        return True
+    if isinstance(e, requests.HTTPError):
+        status = getattr(e.response, 'status_code', None)
+        return status is not None and (status >= 500 or status == 429)
+    return False
+
+
+class Node:
+    """
+    State of one server of a `ServerPool`.
+
+    outstanding: calls in flight
+    latency: exponentially weighted moving average of the call latency
+    failures: consecutive failed calls
+    down_until: time (`time.monotonic`) until which the node is not used,
+        None if it is healthy
+    """
+
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.outstanding = 0
+        self.latency = None
+        self.failures = 0
+        self.down_until = None
+        self.probing = False
+        self.calls = 0
+        self.errors = 0
+
+    @property
+    def healthy(self):
+        return self.down_until is None
+
+    def as_dict(self):
+        return {'url': self.url, 'healthy': self.healthy,
+                'outstanding': self.outstanding, 'latency': self.latency,
+                'failures': self.failures, 'calls': self.calls,
+                'errors': self.errors}
+
+
+class ServerPool:
+    """
+    Chooses the server for every call:
+
+    - 'least_outstanding': the node with the fewest calls in flight, ties
+      broken by latency;
+    - 'latency': the node with the lowest expected wait, i.e. the moving
+      average latency times (calls in flight + 1).
+
+    A node is marked unhealthy after `max_failures` consecutive failures and
+    is not used for `cooldown` seconds. After that, a single call is let
+    through as a probe: if it succeeds the node is healthy again, otherwise
+    the cooldown starts over. If all nodes are down, the one that has been
+    down the longest is used.
+
+    :param servers: list of server URLs
+    :param strategy: 'least_outstanding' or 'latency'
+    :param max_failures: consecutive failures before a node is marked down
+    :param cooldown: seconds before a down node is probed again
+    :param alpha: weight of the last call in the moving average latency
+    """
+
+    def __init__(self, servers, strategy='least_outstanding', max_failures=3,
+                 cooldown=30., alpha=0.2):
+        if isinstance(servers, str):
+            servers = [servers]
+        if not servers:
+            raise ValueError('No servers given')
+        if strategy not in STRATEGIES:
+            raise ValueError('Unknown strategy: {}'.format(strategy))
+        self.nodes = [Node(url) for url in servers]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.alpha = alpha
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def urls(self):
+        return [node.url for node in self.nodes]
+
+    def _cost(self, node):
+        # nodes without measurements yet are tried first
+        latency = node.latency if node.latency is not None else 0.
+        if self.strategy == 'latency':
+            return (latency * (node.outstanding + 1), node.outstanding)
+        return (node.outstanding, latency)
+
+    def acquire(self):
+        """Choose a node for a call; pass it to `release` afterwards."""
+        now = time.monotonic()
+        with self._lock:
+            ready = [n for n in self.nodes if not n.healthy and not n.probing
+                     and n.down_until <= now]
+            healthy = [n for n in self.nodes if n.healthy]
+            if ready:
+                node = ready[0]
+                node.probing = True
+            elif healthy:
+                best = min(self._cost(n) for n in healthy)
+                node = random.choice([n for n in healthy
+                                      if self._cost(n) == best])
+            else:
+                node = min(self.nodes, key=lambda n: n.down_until)
+            node.outstanding += 1
+            node.calls += 1
+            return node
+
+    def release(self, node, latency, ok=True):
+        """
+        :param latency: seconds the call took
+        :param ok: False if the call failed because of the node (connection
+            error, timeout, 5xx answer), None if it failed for another
+            reason, which says nothing about the node
+        """
+        with self._lock:
+            node.outstanding -= 1
+            node.probing = False
+            if ok is None:
+                return
+            if ok:
+                if node.latency is None:
+                    node.latency = latency
+                else:
+                    node.latency += self.alpha * (latency - node.latency)
+                if not node.healthy:
+                    module_logger.info('Server {} is back'.format(node.url))
+                node.failures = 0
+                node.down_until = None
+                return
+            node.errors += 1
+            node.failures += 1
+            if node.failures >= self.max_failures or not node.healthy:
+                if node.healthy:
+                    module_logger.warning(
+                        'Server {} failed {} times in a row, not using it for '
+                        '{}s'.format(node.url, node.failures, self.cooldown))
+                node.down_until = time.monotonic() + self.cooldown
+
+    @contextlib.contextmanager
+    def lease(self, is_failure=is_server_failure):
+        """
+        Context manager choosing a node and releasing it at the end of the
+        block. Exceptions count as failures of the node if
+        `is_failure(exception)` is True; other exceptions leave the health
+        and latency of the node unchanged.
+        """
+        node = self.acquire()
+        start = time.perf_counter()
+        try:
+            yield node
+        except Exception as e:
+            ok = False if is_failure(e) else None
+            self.release(node, time.perf_counter() - start, ok=ok)
+            raise
+        self.release(node, time.perf_counter() - start, ok=True)
+
+    def snapshot(self):
+        with self._lock:
+            return [node.as_dict() for node in self.nodes]
@@ -0,0 +1,199 @@
+"""
+Bulk writes of concepts, labels, relations and custom attributes to a
+PoolParty thesaurus.
+"""
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+module_logger = logging.getLogger(__name__)
+
+ItemResult = namedtuple('ItemResult', ['kind', 'key', 'ok', 'value', 'error'])
+ItemResult.__doc__ = """
+Outcome of one write of a `TaxonomyBatch`.
+
+kind: 'concept', 'label', 'relation' or 'custom_attribute'
+key: key of the concept, or the position of the item within its kind
+ok: True if the write succeeded
+value: URI of the created concept (None for other kinds)
+error: error message if the write failed
+"""
+
+
+def uri_from_response(ans):
+    """URI of a concept from the JSON answer of createConcept."""
+    if isinstance(ans, dict):
+        return ans.get('uri') or ans.get('id')
+    return str(ans)
+
+
+class TaxonomyBatch:
+    """
+    Collects thesaurus writes and executes them with `run()`:
+
+    - the concept schemes are fetched once, for concepts without a parent;
+    - concepts are created level by level, so that parents from the batch
+      are created before their children;
+    - writes of the same level, and all labels, relations and custom
+      attributes, are sent concurrently by at most `max_workers` threads.
+
+    Concepts, parents, label and relation ends can be given either as URIs
+    of existing resources or as keys of concepts added to this batch.
+
+    >>> batch = TaxonomyBatch(pp, pid)
+    >>> batch.add_concept('fruit', 'Fruit')
+    >>> batch.add_concept('apple', 'Apple', parent='fruit')
+    >>> batch.add_label('apple', 'Malus', lang='en')
+    >>> results = batch.run()
+    """
+
+    def __init__(self, pp, pid, max_workers=8):
+        self.pp = pp
+        self.pid = pid
+        self.max_workers = max_workers
+        self.concepts = dict()  # key -> (pref_label, parent, suffix)
+        self.labels = []
+        self.relations = []
+        self.custom_attributes = []
+        self.uris = dict()  # key -> URI of the created concept
+
+    def __len__(self):
+        return (len(self.concepts) + len(self.labels) + len(self.relations) +
+                len(self.custom_attributes))
+
+    def add_concept(self, key, pref_label, parent=None, suffix=None):
+        """
+        :param key: identifier of the concept within the batch
+        :param pref_label: preferred label in the default language
+        :param parent: key or URI of the parent concept (scheme); if None,
+            the first scheme of the project
+        :param suffix: last URI component, when URI creation is manual
+        """
+        if key in self.concepts:
+            raise ValueError('Duplicate concept key: {}'.format(key))
+        self.concepts[key] = (pref_label, parent, suffix)
+
+    def add_label(self, concept, label_value, label_type='skos:altLabel',
+                  lang=None):
+        self.labels.append((concept, label_value, label_type, lang))
+
+    def add_relation(self, source, target, relation_type='skos:narrower'):
+        self.relations.append((source, target, relation_type))
+
+    def add_custom_attribute(self, resource, property, value, language=None,
+                             datatype=None):
+        self.custom_attributes.append(
+            (resource, property, value, language, datatype))
+
+    def levels(self):
+        """
+        Group the concept keys by their depth within the batch.
+
+        :return: (list of lists of keys, dict of key -> error for concepts
+            whose parents form a cycle)
+        """
+        depths = dict()
+        cyclic = dict()
+        for key in self.concepts:
+            chain = []
+            node = key
+            while (node in self.concepts and node not in depths
+                   and node not in cyclic and node not in chain):
+                chain.append(node)
+                node = self.concepts[node][1]
+            if node in chain or node in cyclic:
+                for x in chain:
+                    cyclic[x] = 'Cycle in parents of {}'.format(x)
+                continue
+            depth = depths[node] + 1 if node in depths else 0
+            for x in reversed(chain):
+                depths[x] = depth
+                depth += 1
+        levels = [[] for _ in range(max(depths.values(), default=-1) + 1)]
+        for key, depth in depths.items():
+            levels[depth].append(key)
+        return levels, cyclic
+
+    def _resolve(self, ref):
+        """URI for a key of this batch or an URI."""
+        if ref in self.concepts:
+            if ref not in self.uris:
+                raise ValueError('Concept {} was not created'.format(ref))
+            return self.uris[ref]
+        return ref
+
+    def _create_concept(self, key, default_parent):
+        pref_label, parent, suffix = self.concepts[key]
+        parent = self._resolve(parent) if parent is not None else default_parent
+        ans = self.pp.add_new_concept(self.pid, pref_label, parent=parent,
+                                      suffix=suffix)
+        return uri_from_response(ans)
+
+    def _add_label(self, concept, label_value, label_type, lang):
+        self.pp.add_label(self.pid, self._resolve(concept), label_value,
+                          label_type=label_type, lang=lang)
+
+    def _add_relation(self, source, target, relation_type):
+        self.pp.add_relation(self.pid, self._resolve(source),
+                             self._resolve(target), relation_type=relation_type)
+
+    def _add_custom_attribute(self, resource, property, value, language,
+                              datatype):
+        self.pp.add_custom_attribute(self.pid, self._resolve(resource),
+                                     property, value, language=language,
+                                     datatype=datatype)
+
+    @staticmethod
+    def _call(kind, key, fn, *args):
+        try:
+            return ItemResult(kind, key, True, fn(*args), None)
+        except Exception as e:
+            module_logger.error('Bulk {} {} failed: {}'.format(kind, key, e))
+            return ItemResult(kind, key, False, None, str(e))
+
+    def run(self):
+        """
+        Execute all collected writes.
+
+        :return: list of `ItemResult`: concepts in creation order, then
+            labels, relations and custom attributes in the order they were
+            added
+        """
+        results = []
+        levels, cyclic = self.levels()
+        for key, error in cyclic.items():
+            results.append(ItemResult('concept', key, False, None, error))
+        default_parent = None
+        if any(parent is None for _, parent, _ in self.concepts.values()):
+            default_parent = self.pp.get_schemes(self.pid)[0]['uri']
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for level in levels:
+                futures = []
+                for key in level:
+                    parent = self.concepts[key][1]
+                    if parent in self.concepts and parent not in self.uris:
+                        results.append(ItemResult(
+                            'concept', key, False, None,
+                            'Parent {} was not created'.format(parent)))
+                        continue
+                    futures.append(executor.submit(
+                        self._call, 'concept', key, self._create_concept, key,
+                        default_parent))
+                for f in futures:
+                    res = f.result()
+                    if res.ok:
+                        self.uris[res.key] = res.value
+                    results.append(res)
+
+            futures = []
+            for kind, items, fn in [
+                    ('label', self.labels, self._add_label),
+                    ('relation', self.relations, self._add_relation),
+                    ('custom_attribute', self.custom_attributes,
+                     self._add_custom_attribute)]:
+                for i, item in enumerate(items):
+                    futures.append(executor.submit(
+                        self._call, kind, i, fn, *item))
+            results += [f.result() for f in futures]
+        return results
@@ -0,0 +1,298 @@
+"""
+Columnar representation of large lists of JSON records, such as the corpus
+frequency and term statistics results.
+
+Instead of one dict per record, string fields are stored as int32 codes into
+an interned string table and numeric fields as NumPy arrays.
+"""
+from array import array
+
+import numpy as np
+
+# columns of the corpus results, so that empty results have them too
+CONCEPT_SCHEMA = {'uri': str, 'prefLabel': str, 'frequency': int,
+                  'score': float}
+TERM_SCHEMA = {'textValue': str, 'frequency': int, 'score': float}
+
+
+class StringTable:
+    """
+    Interned strings, addressed by integer codes.
+
+    The strings are kept UTF-8 encoded in one buffer. While the table is
+    built, a dict is used to de-duplicate them; `freeze()` drops it and
+    lookups by value then use a sorted array of hashes.
+    """
+
+    def __init__(self, strings=()):
+        self._data = bytearray()
+        self._offsets = array('q', [0])
+        self._codes = dict()
+        self._hashes = None
+        self._order = None
+        for s in strings:
+            self.add(s)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, code):
+        offsets = self._offsets
+        return self._data[offsets[code]:offsets[code + 1]].decode('utf8')
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def to_array(self):
+        """Object array of the strings, indexed by code."""
+        ans = np.empty(len(self), dtype=object)
+        ans[:] = list(self)
+        return ans
+
+    def add(self, s):
+        code = self._codes.get(s)
+        if code is None:
+            code = self._codes[s] = len(self)
+            self._data += s.encode('utf8')
+            self._offsets.append(len(self._data))
+        return code
+
+    def freeze(self):
+        """Drop the de-duplication dict; no strings can be added after."""
+        self._codes = None
+
+    def code(self, s):
+        """Code of `s`, -1 if it is not in the table."""
+        if self._codes is not None:
+            return self._codes.get(s, -1)
+        if self._hashes is None:
+            hashes = np.fromiter((hash(x) for x in self), dtype=np.int64,
+                                 count=len(self))
+            self._order = np.argsort(hashes, kind='stable')
+            self._hashes = hashes[self._order]
+        h = hash(s)
+        i = np.searchsorted(self._hashes, h)
+        while i < len(self._hashes) and self._hashes[i] == h:
+            code = int(self._order[i])
+            if self[code] == s:
+                return code
+            i += 1
+        return -1
+
+
+class _Column:
+    """Column under construction."""
+
+    def __init__(self, n_missing, kind):
+        """
+        :param kind: str, int or float; int columns become float columns
+            when a value is not an int
+        """
+        self.is_string = kind is str
+        if self.is_string:
+            self.table = StringTable()
+            self.values = array('i', [-1] * n_missing)
+        else:
+            self.all_int = kind is int
+            self.values = array('d', [np.nan] * n_missing)
+
+    def append(self, value):
+        if self.is_string:
+            self.values.append(-1 if value is None else self.table.add(str(value)))
+        elif value is None or isinstance(value, str):
+            self.all_int = False
+            self.values.append(np.nan)
+        else:
+            if self.all_int and not isinstance(value, (int, bool)):
+                self.all_int = False
+            self.values.append(value)
+
+    def finish(self):
+        if self.is_string:
+            self.table.freeze()
+            return self.table, np.frombuffer(self.values, dtype=np.int32).copy()
+        values = np.frombuffer(self.values, dtype=np.float64).copy()
+        if self.all_int:
+            values = values.astype(np.int64)
+        return None, values
+
+
+class ColumnarTable:
+    """
+    Table with string columns (`StringTable` + int32 codes, -1 for missing)
+    and numeric columns (int64 or float64 arrays, NaN for missing).
+
+    :param key: name of the column identifying the rows (e.g. 'uri')
+    :param strings: dict {name: (StringTable, codes)}
+    :param numeric: dict {name: array}
+    """
+
+    def __init__(self, key, strings, numeric):
+        self.key = key
+        self.strings = strings
+        self.numeric = numeric
+        if strings:
+            self._len = len(next(iter(strings.values()))[1])
+        else:
+            self._len = len(next(iter(numeric.values()), []))
+        self._key_index = None
+
+    @classmethod
+    def from_records(cls, records, key=None, schema=None):
+        """
+        Build a table from an iterable of flat dicts, consuming it one record
+        at a time. Fields with list or dict values are skipped.
+
+        :param key: key column; 'uri' if the records have it, otherwise
+            'textValue'
+        :param schema: dict {name: str, int or float} of columns created
+            even if no record has them, e.g. `CONCEPT_SCHEMA`; other
+            columns are inferred from the records
+        """
+        columns = {name: _Column(0, kind)
+                   for name, kind in (schema or dict()).items()}
+        n = 0
+        for rec in records:
+            if key is None:
+                key = 'uri' if 'uri' in rec else 'textValue'
+            for name, value in rec.items():
+                column = columns.get(name)
+                if column is None:
+                    if isinstance(value, (list, dict)) or value is None:
+                        continue
+                    column = columns[name] = _Column(
+                        n, str if isinstance(value, str) else int)
+                if isinstance(value, (list, dict)):
+                    value = None
+                column.append(value)
+            n += 1
+            for column in columns.values():
+                if len(column.values) < n:
+                    column.append(None)
+        key = key or 'uri'
+        if key not in columns:
+            columns[key] = _Column(n, str)
+        strings = dict()
+        numeric = dict()
+        for name, column in columns.items():
+            table, values = column.finish()
+            if table is None:
+                numeric[name] = values
+            else:
+                strings[name] = (table, values)
+        return cls(key, strings, numeric)
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def columns(self):
+        return list(self.strings) + list(self.numeric)
+
+    def column(self, name):
+        """NumPy array for a numeric column, list of str for a string one."""
+        if name in self.numeric:
+            return self.numeric[name]
+        table, codes = self.strings[name]
+        return [table[c] if c >= 0 else None for c in codes]
+
+    @property
+    def keys(self):
+        return self.column(self.key)
+
+    def row(self, i):
+        ans = dict()
+        for name, (table, codes) in self.strings.items():
+            if codes[i] >= 0:
+                ans[name] = table[codes[i]]
+        for name, values in self.numeric.items():
+            ans[name] = values[i].item()
+        return ans
+
+    def to_records(self):
+        return [self.row(i) for i in range(len(self))]
+
+    def take(self, indices):
+        """New table with the rows at `indices`, sharing the string tables."""
+        indices = np.asarray(indices, dtype=np.intp)
+        return ColumnarTable(
+            self.key,
+            {name: (table, codes[indices])
+             for name, (table, codes) in self.strings.items()},
+            {name: values[indices] for name, values in self.numeric.items()},
+        )
+
+    def top_k(self, column, k):
+        """The `k` rows with the highest values of `column`, sorted."""
+        values = self.numeric[column]
+        k = min(k, len(values))
+        if k <= 0:
+            return self.take([])
+        idx = np.argpartition(-values, k - 1)[:k]
+        idx = idx[np.argsort(-values[idx], kind='stable')]
+        return self.take(idx)
+
+    def where(self, column, min=None, max=None):
+        """Rows with `min <= column <= max`."""
+        values = self.numeric[column]
+        mask = np.ones(len(values), dtype=bool)
+        if min is not None:
+            mask &= values >= min
+        if max is not None:
+            mask &= values <= max
+        return self.take(np.flatnonzero(mask))
+
+    def index_of(self, key_value):
+        """
+        Row index of a key value, -1 if it is not in the table. For a
+        repeated key, the first row is returned, as by `join`.
+        """
+        if self._key_index is None:
+            table, codes = self.strings[self.key]
+            index = np.full(len(table), -1, dtype=np.int64)
+            rows = np.flatnonzero(codes >= 0)
+            present, first = np.unique(codes[rows], return_index=True)
+            index[present] = rows[first]
+            self._key_index = index
+        table, codes = self.strings[self.key]
+        code = table.code(key_value)
+        return int(self._key_index[code]) if code >= 0 else -1
+
+    def join(self, other):
+        """
+        Inner join with `other` on the key columns. If a key is repeated in
+        `other`, its first row is used.
+
+        :return: (indices into self, indices into other) of matching rows
+        """
+        table, codes = self.strings[self.key]
+        other_table, other_codes = other.strings[other.key]
+        left = np.flatnonzero(codes >= 0)
+        right = np.flatnonzero(other_codes >= 0)
+        if not len(left) or not len(right):
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty
+        keys = table.to_array()[codes[left]]
+        other_keys = other_table.to_array()[other_codes[right]]
+        order = np.argsort(other_keys, kind='stable')
+        other_keys = other_keys[order]
+        pos = np.searchsorted(other_keys, keys)
+        pos[pos == len(other_keys)] = 0
+        match = other_keys[pos] == keys
+        return left[match], right[order[pos[match]]]
+
+    def merge(self, other, suffix='_other'):
+        """
+        Inner join with `other` on the key columns, as a new table. Columns
+        of `other` whose names clash get `suffix` appended.
+        """
+        left, right = self.join(other)
+        merged = self.take(left)
+        joined = other.take(right)
+        for name, column in joined.strings.items():
+            if name == other.key:
+                continue
+            merged.strings[name + suffix if name in merged.strings else name] = column
+        for name, values in joined.numeric.items():
+            merged.numeric[name + suffix if name in merged.numeric else name] = values
+        return merged
@@ -0,0 +1,123 @@
+"""
+Term co-occurrence networks of a corpus, fetched in bulk.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+module_logger = logging.getLogger(__name__)
+
+
+class CoocGraph:
+    """
+    Undirected weighted graph of terms, stored as a sparse edge list.
+
+    :param terms: list of terms; the position of a term is its node index
+    :param rows: int array, first node of every edge (rows < cols)
+    :param cols: int array, second node of every edge
+    :param weights: float array, weight of every edge
+    """
+
+    def __init__(self, terms, rows, cols, weights):
+        self.terms = terms
+        self.index = {term: i for i, term in enumerate(terms)}
+        self.rows = rows
+        self.cols = cols
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.terms)
+
+    @property
+    def n_edges(self):
+        return len(self.weights)
+
+    def neighbors(self, term):
+        """dict {neighbor term: weight}"""
+        i = self.index[term]
+        ans = {self.terms[j]: w for j, w in
+               zip(self.cols[self.rows == i].tolist(),
+                   self.weights[self.rows == i].tolist())}
+        ans.update({self.terms[j]: w for j, w in
+                    zip(self.rows[self.cols == i].tolist(),
+                        self.weights[self.cols == i].tolist())})
+        return ans
+
+    def to_dense(self):
+        """Symmetric adjacency matrix as a NumPy array."""
+        m = np.zeros((len(self), len(self)))
+        m[self.rows, self.cols] = self.weights
+        m[self.cols, self.rows] = self.weights
+        return m
+
+    def to_scipy(self):
+        """Symmetric adjacency matrix as a `scipy.sparse.csr_matrix`."""
+        try:
+            from scipy import sparse
+        except ImportError:
+            raise ImportError('scipy is needed for sparse adjacency matrices, '
+                              'install it with: pip install scipy')
+        n = len(self)
+        return sparse.coo_matrix(
+            (np.concatenate([self.weights, self.weights]),
+             (np.concatenate([self.rows, self.cols]),
+              np.concatenate([self.cols, self.rows]))),
+            shape=(n, n)
+        ).tocsr()
+
+
+def build_cooc_graph(pp, terms, corpus_id, pid, max_workers=8,
+                     restrict=True, term_field='textValue',
+                     score_field='score', combine=max):
+    """
+    Fetch the co-occurrences of all `terms` concurrently and merge them into
+    one graph. A pair reported from both of its ends is kept once, with the
+    scores merged by `combine`.
+
+    :param pp: `PoolParty` instance
+    :param terms: list of terms
+    :param max_workers: max number of concurrent `get_term_coocs` calls
+    :param restrict: if True, only edges between `terms` are kept, otherwise
+        co-occurring terms are added as new nodes
+    :param term_field: field of the co-occurring term in the API results
+    :param score_field: field of the score in the API results
+    :return: `CoocGraph`
+    """
+    requested = list(dict.fromkeys(terms))
+    terms = list(requested)
+    index = {term: i for i, term in enumerate(terms)}
+
+    def fetch(term):
+        return pp.get_term_coocs(term, corpus_id, pid)
+
+    edges = dict()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for term, coocs in zip(requested, executor.map(fetch, requested)):
+            i = index[term]
+            for cooc in coocs:
+                other = cooc.get(term_field)
+                if other is None or other == term:
+                    continue
+                j = index.get(other)
+                if j is None:
+                    if restrict:
+                        continue
+                    j = index[other] = len(terms)
+                    terms.append(other)
+                key = (i, j) if i < j else (j, i)
+                score = float(cooc.get(score_field, 1.))
+                edges[key] = combine(edges[key], score) if key in edges else score
+
+    rows = np.fromiter((k[0] for k in edges), dtype=np.int64, count=len(edges))
+    cols = np.fromiter((k[1] for k in edges), dtype=np.int64, count=len(edges))
+    weights = np.fromiter(edges.values(), dtype=np.float64, count=len(edges))
+    return CoocGraph(terms, rows, cols, weights)
+
+
+def top_terms(pp, corpus_id, pid, n=100, score_field='score'):
+    """The `n` terms of the corpus with the highest `score_field`."""
+    table = pp.get_allterms_scores(corpus_id, pid, columnar=True)
+    if not len(table):
+        return []
+    return table.top_k(score_field, n).keys
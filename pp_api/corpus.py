@@ -0,0 +1,29 @@
+"""
+Documents of a corpus as yielded by `PoolParty.iter_corpus_documents`.
+"""
+
+
+class CorpusDocument(dict):
+    """
+    Document dict ('id', 'title', ...) whose text is fetched with
+    `PoolParty.get_document_terms` when doc['content'] is first read.
+    `doc.get('content')` does not fetch it.
+    """
+
+    def __init__(self, doc, pp, corpus_id, pid):
+        super().__init__(doc)
+        self._pp = pp
+        self._corpus_id = corpus_id
+        self._pid = pid
+
+    def __missing__(self, key):
+        if key != 'content':
+            raise KeyError(key)
+        details = self._pp.get_document_terms(self['id'], self._corpus_id,
+                                              self._pid)
+        self['content'] = details.get('content')
+        return self['content']
+
+    @property
+    def content(self):
+        return self['content']
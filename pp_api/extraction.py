@@ -0,0 +1,158 @@
+"""
+Structured outcomes of extraction calls and collection of failed inputs.
+"""
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+
+module_logger = logging.getLogger(__name__)
+
+
+class ExtractionResult(namedtuple('ExtractionResult', [
+        'key', 'status', 'response', 'latency', 'attempts', 'error'])):
+    """
+    Outcome of `PoolParty.extract_result`.
+
+    key: identifier of the input
+    status: `ExtractionResult.OK` or `ExtractionResult.FAILED`
+    response: response object of the extract call, None if it failed
+    latency: seconds spent, including retries
+    attempts: number of calls made
+    error: error message if the extraction failed
+    """
+    __slots__ = ()
+    OK = 'ok'
+    FAILED = 'failed'
+
+    @property
+    def ok(self):
+        return self.status == self.OK
+
+    def cpts(self):
+        """
+        Concepts as returned by `PoolParty.get_cpts_from_response`. Raises
+        a RuntimeError for failed extractions, so that they are not mistaken
+        for texts without concepts.
+        """
+        from pp_api.pp_calls import PoolParty
+
+        self.raise_for_error()
+        return PoolParty.get_cpts_from_response(self.response)
+
+    def raise_for_error(self):
+        if not self.ok:
+            raise RuntimeError('Extraction of {} failed after {} attempts: '
+                               '{}'.format(self.key, self.attempts, self.error))
+
+
+class DeadLetterSink:
+    """
+    Collects the inputs of failed extractions for a later replay, in memory
+    or appended to a JSON lines file.
+
+    Entries are dicts with the keys 'key', 'text', 'file' (path of the input
+    file, if it was one), 'pid', 'lang', 'params', 'error' and 'attempts'.
+
+    :param path: JSON lines file; entries are kept in memory if None
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+    def __iter__(self):
+        if self.path is None:
+            return iter(list(self.entries))
+        try:
+            with open(self.path, encoding='utf8') as f:
+                return iter([json.loads(line) for line in f if line.strip()])
+        except FileNotFoundError:
+            return iter([])
+
+    def add(self, result, text=None, file=None, pid=None, lang=None,
+            params=None):
+        """
+        Record a failed `ExtractionResult` with its input. File objects are
+        recorded by their name, if they have one.
+        """
+        if file is not None and not isinstance(file, str):
+            file = getattr(file, 'name', None)
+            if not isinstance(file, str):
+                file = None
+        entry = {'key': result.key, 'text': text, 'file': file, 'pid': pid,
+                 'lang': lang, 'params': params or dict(),
+                 'error': result.error, 'attempts': result.attempts}
+        self._append(entry)
+
+    def _append(self, entry):
+        with self._lock:
+            if self.path is None:
+                self.entries.append(entry)
+            else:
+                with open(self.path, 'a', encoding='utf8') as f:
+                    f.write(json.dumps(entry) + '\n')
+
+    def clear(self):
+        with self._lock:
+            self.entries = []
+            if self.path is not None:
+                open(self.path, 'w').close()
+
+    def _drop(self, n, extra):
+        """Remove the first `n` entries and append `extra`, atomically."""
+        with self._lock:
+            if self.path is None:
+                self.entries = self.entries[n:] + extra
+                return
+            try:
+                with open(self.path, encoding='utf8') as f:
+                    lines = [line for line in f if line.strip()]
+            except FileNotFoundError:
+                lines = []
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf8') as f:
+                f.writelines(lines[n:])
+                f.writelines(json.dumps(entry) + '\n' for entry in extra)
+            os.replace(tmp, self.path)
+
+    def replay(self, pp, dead_letter=None, **kwargs):
+        """
+        Extract all collected inputs again with `pp`. Inputs failing again
+        go to `dead_letter` (this sink if None). The replayed entries are
+        removed when the replay ends; if it is interrupted, the entries not
+        replayed yet stay in the sink.
+
+        :param kwargs: passed to `PoolParty.extract_result`
+        :return: list of `ExtractionResult`
+        """
+        entries = list(self)
+        # failures are added to this sink only after the replayed entries
+        # are removed, so that they are not dropped with them
+        retry = DeadLetterSink() if dead_letter is None else dead_letter
+        keep = []
+        done = 0
+        results = []
+        try:
+            for entry in entries:
+                if entry['text'] is None and entry['file'] is None:
+                    module_logger.warning('Input of {} was not recorded, it '
+                                          'cannot be replayed'.format(
+                                              entry['key']))
+                    keep.append(entry)
+                else:
+                    params = dict(entry['params'], **kwargs)
+                    results.append(pp.extract_result(
+                        entry['text'], entry['pid'], file=entry['file'],
+                        lang=entry['lang'], key=entry['key'],
+                        dead_letter=retry, **params))
+                done += 1
+        finally:
+            self._drop(done, keep + (retry.entries if dead_letter is None
+                                     else []))
+        return results
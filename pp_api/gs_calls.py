@@ -1,4 +1,6 @@
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from requests.exceptions import HTTPError
 
@@ -9,15 +11,115 @@ from pp_api import pp_calls
 module_logger = logging.getLogger(__name__)
 
 
+class FacetMapper:
+    """
+    Cache of concept URI -> GraphSearch facet field ('dyn_flt_' + last URI
+    component). Use `GraphSearch.facet_mapper_for(pid)` to share one mapping
+    between all documents annotated with the same thesaurus.
+    """
+    prefix = 'dyn_flt_'
+
+    def __init__(self, uris=()):
+        self.fields = dict()
+        self.preload(uris)
+
+    def preload(self, uris):
+        prefix = self.prefix
+        self.fields.update((uri, prefix + uri.rsplit('/', 1)[-1])
+                           for uri in uris)
+
+    def field(self, uri):
+        try:
+            return self.fields[uri]
+        except KeyError:
+            field = self.fields[uri] = self.prefix + uri.rsplit('/', 1)[-1]
+            return field
+
+    def facets(self, cpts):
+        """
+        Facets of a document from its extracted concepts.
+
+        :param cpts: concepts as returned by `PoolParty.get_cpts_from_response`
+        :return: dict {'dyn_flt_<id>': [frequency], ...,
+                       'dyn_uri_all_concepts': [uri, ...]}
+        """
+        fields = self.fields
+        field = self.field
+        uris = [x['uri'] for x in cpts]
+        facets = {
+            (fields.get(uri) or field(uri)): [x['frequencyInDocument']]
+            for uri, x in zip(uris, cpts)
+        }
+        facets['dyn_uri_all_concepts'] = uris
+        return facets
+
+
+def _result(future):
+    if isinstance(future, Exception):
+        return future
+    try:
+        return future.result()
+    except Exception as e:
+        return e
+
+
 class GraphSearch:
     timeout = None
 
-    def __init__(self, server, auth_data=None, session=None, timeout=None):
+    def __init__(self, server, auth_data=None, session=None, timeout=None,
+                 max_retries=None, pool_connections=None, pool_maxsize=None,
+                 pool_block=None, keep_alive=None, metrics=None,
+                 coalesce=False, compress_requests=None,
+                 json_dumps=None, facet_mapper=None):
+        """
+        :param server: GraphSearch server URL
+        :param auth_data: (user, password); read from the environment if None
+        :param session: existing session to use, may be shared with other
+            `PoolParty` or `GraphSearch` instances
+        :param timeout: default timeout of the calls
+        :param max_retries: retry failed (5xx) calls with backoff
+        :param pool_connections: see `utils.get_session`
+        :param pool_maxsize: see `utils.get_session`
+        :param pool_block: see `utils.get_session`
+        :param keep_alive: see `utils.get_session`
+        :param metrics: `metrics.Metrics` instance to record the calls in
+        :param coalesce: if True (or a `utils.SingleFlight` to share),
+            identical concurrent read calls share one HTTP request
+        :param compress_requests: True, 'gzip' or 'deflate' to compress
+            request bodies, see `utils.CompressingAdapter`
+        :param json_dumps: function serializing the content payloads to
+            bytes, e.g. `utils.fast_json_dumps`; `utils.json_dumps` if None
+        :param facet_mapper: default `FacetMapper` of `create_with_freqs`
+        """
         self.server = server
-        session = u.get_session(session, auth_data)
+        session = u.get_session(
+            session, auth_data,
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block, max_retries=max_retries,
+            keep_alive=keep_alive, servers=(self.server,),
+            compress_requests=compress_requests
+        )
         self.auth_data = auth_data
         self.session = session
         self.timeout = timeout
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self.session)
+        if coalesce is True:
+            coalesce = u.SingleFlight()
+        self.single_flight = coalesce or None
+        self.json_dumps = json_dumps or u.json_dumps
+        self.facet_mapper = facet_mapper or FacetMapper()
+        self._facet_mappers = dict()  # pid -> FacetMapper
+        self._facet_lock = threading.Lock()
+
+    def facet_mapper_for(self, pid):
+        """`FacetMapper` of the thesaurus `pid`, kept by this instance."""
+        with self._facet_lock:
+            mapper = self._facet_mappers.get(pid)
+            if mapper is None:
+                mapper = self._facet_mappers[pid] = FacetMapper()
+            return mapper
 
     def delete(self, search_space_id, id_=None, source=None):
         if id_ is not None:
@@ -76,26 +178,23 @@ class GraphSearch:
                         search_filters=id_filter)
         return r.json()['total'] > 0
 
-    def _create(self, id_, title, author, date, search_space_id,
-                text=None, update=False,
-                text_limit=True, **kwargs):
+    @staticmethod
+    def content_payload(id_, title, author, date, search_space_id,
+                        text=None, text_limit=True, **kwargs):
         """
+        JSON data of a create or update call.
 
         :param id_: should be a URL starting from protocol (e.g. http://)
         :param title:
         :param author:
         :param date: datetime object
         :param kwargs: any additional fields in key=value format. Fields should exist in GS.
-        :return:
+        :return: dict
         """
-        if text_limit and len(text) > 12048:
-            text = text[:12000]
+        if text_limit and text is not None and len(text) > 12048:
             module_logger.warning('Text was too long ({} chars), has been '
                                   'shortened tp 12000 chars'.format(len(text)))
-        if not update:
-            suffix = '/GraphSearch/api/content/create'
-        else:
-            suffix = '/GraphSearch/api/content/update'
+            text = text[:12000]
         data = {
             'identifier': id_,
             'title': title,
@@ -108,10 +207,20 @@ class GraphSearch:
         for k, v in kwargs.items():
             if k is not None and v is not None and v != [None]:
                 data[k] = v
+        return data
+
+    def _post_content(self, data, update=False, body=None):
+        if not update:
+            suffix = '/GraphSearch/api/content/create'
+        else:
+            suffix = '/GraphSearch/api/content/update'
+        if body is None:
+            body = self.json_dumps(data)
         dest_url = self.server + suffix
         r = self.session.post(
             dest_url,
-            json=data,
+            data=body,
+            headers={'Content-Type': 'application/json'},
             timeout=self.timeout
         )
         try:
@@ -124,28 +233,82 @@ class GraphSearch:
             raise e
         return r
 
-    def create_with_freqs(self, id_, title, author, date, cpts, search_space_id,
-                          image_url=None,
-                          text=None, update=False,
-                          **kwargs):
-        cpt_uris = [x['uri'] for x in cpts]
-        cpt_freqs = {
-            x['uri'].split("/")[-1]: x['frequencyInDocument'] for x in cpts
-        }
-        cpt_facets = {
-            ('dyn_flt_' + suffix): [freq] for suffix, freq in cpt_freqs.items()
-        }
-        cpt_facets.update({
-            'dyn_uri_all_concepts': cpt_uris
-        })
-        return self._create(
+    def _create(self, id_, title, author, date, search_space_id,
+                text=None, update=False,
+                text_limit=True, **kwargs):
+        """
+
+        :param id_: should be a URL starting from protocol (e.g. http://)
+        :param title:
+        :param author:
+        :param date: datetime object
+        :param kwargs: any additional fields in key=value format. Fields should exist in GS.
+        :return:
+        """
+        data = self.content_payload(
             id_=id_, title=title, author=author, date=date,
-            text=text, facets=cpt_facets,
-            update=update, search_space_id=search_space_id,
+            search_space_id=search_space_id, text=text, text_limit=text_limit,
+            **kwargs
+        )
+        return self._post_content(data, update=update)
+
+    def payload_with_freqs(self, id_, title, author, date, cpts,
+                           search_space_id, image_url=None, text=None,
+                           facet_mapper=None, **kwargs):
+        """
+        JSON data of `create_with_freqs`.
+
+        :param facet_mapper: `FacetMapper` to use, `self.facet_mapper` if None
+        """
+        facet_mapper = facet_mapper or self.facet_mapper
+        return self.content_payload(
+            id_=id_, title=title, author=author, date=date,
+            search_space_id=search_space_id, text=text,
+            facets=facet_mapper.facets(cpts),
             dyn_txt_imageUrl=[image_url],
             **kwargs
         )
 
+    def create_with_freqs(self, id_, title, author, date, cpts, search_space_id,
+                          image_url=None,
+                          text=None, update=False, facet_mapper=None,
+                          **kwargs):
+        data = self.payload_with_freqs(
+            id_=id_, title=title, author=author, date=date, cpts=cpts,
+            search_space_id=search_space_id, image_url=image_url, text=text,
+            facet_mapper=facet_mapper, **kwargs
+        )
+        return self._post_content(data, update=update)
+
+    def create_many_with_freqs(self, docs, update=False, max_workers=4,
+                               facet_mapper=None):
+        """
+        Create (or update) many documents with concept frequencies.
+
+        The payloads are built and serialized with `self.json_dumps` in the
+        calling thread while up to `max_workers` requests are in flight.
+
+        :param docs: iterable of dicts with the arguments of
+            `create_with_freqs` (id_, title, author, date, cpts,
+            search_space_id, ...)
+        :return: list with the response, or the raised exception, per document
+        """
+        results = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            for doc in docs:
+                try:
+                    data = self.payload_with_freqs(facet_mapper=facet_mapper,
+                                                   **doc)
+                    futures.append(executor.submit(
+                        self._post_content, data, update, self.json_dumps(data)))
+                except Exception as e:
+                    futures.append(e)
+                if len(futures) >= 2 * max_workers:
+                    results.append(_result(futures.pop(0)))
+            results += [_result(f) for f in futures]
+        return results
+
     def extract_and_create(self, pid, id_, title, author, date, text,
                            search_space_id,
                            image_url=None,
@@ -164,7 +327,9 @@ class GraphSearch:
         :param text:
         :return:
         """
-        pp = pp_calls.PoolParty(server=self.server, auth_data=self.auth_data)
+        pp = pp_calls.PoolParty(server=self.server, auth_data=self.auth_data,
+                                session=self.session, timeout=self.timeout,
+                                metrics=self.metrics)
         if text_to_extract is None:
             text_to_extract = text
         r = pp.extract(
@@ -175,6 +340,7 @@ class GraphSearch:
             id_=id_, title=title, author=author,
             date=date, text=text, cpts=cpts, update=update,
             search_space_id=search_space_id, image_url=image_url,
+            facet_mapper=self.facet_mapper_for(pid),
             language=lang,
             **kwargs
         )
@@ -183,6 +349,7 @@ class GraphSearch:
     def extract_and_update(self, *args, **kwargs):
         return self.extract_and_create(*args, update=True, **kwargs)
 
+    @u.coalesced
     def search(self, search_space_id,
                search_filters=None, locale='en', count=10000,
                **kwargs):
@@ -278,6 +445,7 @@ class GraphSearch:
         ]
         return search_filters
 
+    @u.coalesced
     def get_fields(self):
         suffix = '/GraphSearch/admin/config/fields'
         dest_url = self.server + suffix
@@ -300,8 +468,9 @@ class GraphSearch:
             'field': field,
             'label': label
         }
+        dest_url = self.server + suffix
         r = self.session.post(
-            self.server + suffix,
+            dest_url,
             params=data,
             timeout=self.timeout
             # data=data
@@ -309,8 +478,10 @@ class GraphSearch:
         try:
             r.raise_for_status()
         except HTTPError as e:
-            print(r.request.__dict__)
-            print(r.text)
+            msg = 'JSON data of the failed POST request: {}\n'.format(data)
+            msg += 'URL of the failed POST request: {}\n'.format(dest_url)
+            msg += 'Response text: {}'.format(r.text)
+            module_logger.error(msg)
             raise e
         return r
 
@@ -337,6 +508,67 @@ class GraphSearch:
             raise e
         return r
 
+    def sync_fields(self, space_id, wanted, prefix='dyn_flt_',
+                    remove_extra=False, max_workers=8):
+        """
+        Make the registered custom fields match `wanted`: fields that are
+        missing are added and, if `remove_extra` is True, registered fields
+        starting with `prefix` that are not wanted are removed. Only the
+        difference is sent, with at most `max_workers` calls in flight.
+
+        :param space_id: search space id
+        :param wanted: dict {field: label}
+        :return: dict with lists 'added', 'removed' and 'failed'
+            ((field, exception) pairs)
+        """
+        r = self.get_fields()
+        r.raise_for_status()
+        existing = {x['field'] for x in r.json()['searchFields']}
+        to_add = [f for f in wanted if f not in existing]
+        to_remove = []
+        if remove_extra:
+            to_remove = [f for f in existing
+                         if f.startswith(prefix) and f not in wanted]
+
+        ans = {'added': [], 'removed': [], 'failed': []}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                (field, 'added', executor.submit(
+                    self.add_field, space_id, field, wanted[field]))
+                for field in to_add
+            ] + [
+                (field, 'removed', executor.submit(
+                    self.remove_field, space_id, field))
+                for field in to_remove
+            ]
+            for field, key, f in futures:
+                res = _result(f)
+                if isinstance(res, Exception):
+                    ans['failed'].append((field, res))
+                else:
+                    ans[key].append(field)
+        return ans
+
+    def sync_fields_from_pp(self, pp, pid, space_id, lang=None,
+                            remove_extra=False, max_workers=8,
+                            facet_mapper=None):
+        """
+        `sync_fields` with a field for every concept of the thesaurus `pid`,
+        labelled with its prefLabel, or its URI if it has no prefLabel in
+        `lang`.
+
+        :param pp: `PoolParty` instance
+        :param lang: language of the labels, project default if None
+        """
+        facet_mapper = facet_mapper or self.facet_mapper_for(pid)
+        wanted = {facet_mapper.field(cpt['uri']):
+                  cpt.get('prefLabel') or cpt['uri']
+                  for cpt in pp.get_all_concepts(pid, language=lang)}
+        return self.sync_fields(space_id, wanted,
+                                prefix=facet_mapper.prefix,
+                                remove_extra=remove_extra,
+                                max_workers=max_workers)
+
 
 def sort_by_date(gs_results):
     ans = sorted(
@@ -346,25 +578,13 @@ def sort_by_date(gs_results):
     return ans
 
 
-def add_custom_fields_from_the(search_space_id, pid, pp, gs, the_path):
-    # TODO: debug
-    from thesaurus.thesaurus import Thesaurus
-
-    the = Thesaurus.get_the_pp(
-        the_path=the_path, pp=pp, pid=pid
-    )
-    all_cpts = the.get_all_concepts_and_pref_labels(lang='en')
-    fields = [x['field'] for x in gs.get_fields().json()['searchFields']]
-    for uri, pl in all_cpts.items():
-        field_str = "dyn_flt_" + uri.split("/")[-1]
-        if field_str in fields:
-            continue
-        else:
-            r = gs.add_field(
-                space_id=search_space_id,
-                field=field_str,
-                label=pl
-            )
+def add_custom_fields_from_the(search_space_id, pid, pp, gs, the_path=None):
+    """
+    Register a `dyn_flt_*` field for every concept of the thesaurus `pid`
+    that does not have one yet. `the_path` is not used any more, the
+    concepts are read from PoolParty directly.
+    """
+    return gs.sync_fields_from_pp(pp, pid, search_space_id)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,236 @@
+"""
+Local index of the skos:broader hierarchy of a project, for subsumption
+checks and descendant enumeration without server calls.
+"""
+import datetime
+import logging
+import threading
+
+module_logger = logging.getLogger(__name__)
+
+# fields of the history items that may name a changed concept
+HISTORY_FIELDS = ('affectedResource', 'objectValue')
+
+
+def changed_uris(history):
+    """URIs of the resources named by the items of `get_history`."""
+    uris = set()
+    for item in history:
+        for field in HISTORY_FIELDS:
+            value = item.get(field)
+            if isinstance(value, str) and value.startswith('http'):
+                uris.add(value)
+    return uris
+
+
+class HierarchyIndex:
+    """
+    Broader/narrower hierarchy with the ancestors of every concept
+    precomputed as a bitset (a Python int with one bit per concept), so
+    polyhierarchies are supported.
+
+    >>> index = HierarchyIndex.from_project(pp, pid)
+    >>> index.is_under(uri, top_uri)
+    True
+    >>> index.descendants(top_uri)
+
+    `is_under` is a single bit test; `descendants` walks only the subtree.
+    `refresh(pp, pid)` applies the changes reported by `get_history` since
+    the last build or refresh.
+    """
+
+    def __init__(self):
+        self._bits = dict()  # uri -> bit
+        self._uris = dict()  # bit -> uri
+        self._broaders = dict()  # uri -> set of broader uris
+        self._narrowers = dict()  # uri -> set of narrower uris
+        self._ancestors = dict()  # uri -> bitset of the ancestors
+        self._next_bit = 0  # bits of removed concepts are not reused
+        self._lock = threading.RLock()
+        self.updated = None  # time of the last build or refresh
+
+    def __len__(self):
+        return len(self._broaders)
+
+    def __contains__(self, uri):
+        return uri in self._broaders
+
+    def _bit(self, uri):
+        bit = self._bits.get(uri)
+        if bit is None:
+            bit = self._bits[uri] = self._next_bit
+            self._uris[bit] = uri
+            self._next_bit += 1
+        return bit
+
+    def _set_broaders(self, uri, broaders):
+        for b in self._broaders.get(uri, ()):
+            self._narrowers.get(b, set()).discard(uri)
+        self._broaders[uri] = set(broaders)
+        self._narrowers.setdefault(uri, set())
+        for b in broaders:
+            self._narrowers.setdefault(b, set()).add(uri)
+            self._bit(b)
+        self._bit(uri)
+
+    def _compute(self, uris):
+        """Recompute the ancestors of `uris`; the others must be current."""
+        pending = set(uris)
+        for uri in uris:
+            self._ancestors.pop(uri, None)
+        for uri in uris:
+            if uri in self._ancestors:
+                continue
+            # depth-first, computing the broaders before their narrowers
+            stack = [(uri, iter(self._broaders.get(uri, ())))]
+            visiting = {uri}
+            while stack:
+                current, broaders = stack[-1]
+                for b in broaders:
+                    if b in visiting:
+                        module_logger.warning(
+                            'Cycle in the hierarchy: {} is broader than '
+                            '{}'.format(current, b))
+                        continue
+                    if b in pending and b not in self._ancestors:
+                        visiting.add(b)
+                        stack.append((b, iter(self._broaders.get(b, ()))))
+                        break
+                else:
+                    stack.pop()
+                    visiting.discard(current)
+                    ancestors = 0
+                    for b in self._broaders.get(current, ()):
+                        ancestors |= (1 << self._bits[b]) | \
+                            self._ancestors.get(b, 0)
+                    self._ancestors[current] = ancestors
+
+    def update(self, concepts):
+        """
+        Add or replace concepts and recompute the ancestors of them and of
+        their descendants.
+
+        :param concepts: concept dicts with 'uri' and 'broaders' (list of
+            URIs), as returned by `get_childconcepts` or `get_concepts` with
+            the property skos:broader
+        """
+        with self._lock:
+            changed = set()
+            for cpt in concepts:
+                self._set_broaders(cpt['uri'], cpt.get('broaders') or ())
+                changed.add(cpt['uri'])
+            self._compute(self._with_descendants(changed))
+
+    def remove(self, uris):
+        """
+        Remove concepts; their narrowers lose them as broaders. Once more
+        than half of the bits belong to removed concepts, the bits are
+        reassigned (see `compact`).
+        """
+        with self._lock:
+            affected = self._with_descendants(uris) - set(uris)
+            for uri in uris:
+                for b in self._broaders.pop(uri, ()):
+                    self._narrowers.get(b, set()).discard(uri)
+                for n in self._narrowers.pop(uri, ()):
+                    self._broaders.get(n, set()).discard(uri)
+                self._ancestors.pop(uri, None)
+                bit = self._bits.pop(uri, None)
+                if bit is not None:
+                    del self._uris[bit]
+            self._compute(affected)
+            if self._next_bit > 2 * len(self._bits):
+                self.compact()
+
+    def compact(self):
+        """
+        Number the bits of the concepts (and of the broaders that are not
+        concepts themselves) from 0 again and recompute all ancestors.
+        """
+        with self._lock:
+            live = set(self._broaders)
+            for broaders in self._broaders.values():
+                live.update(broaders)
+            self._narrowers = {uri: narrowers
+                               for uri, narrowers in self._narrowers.items()
+                               if uri in live}
+            self._bits = dict()
+            self._uris = dict()
+            self._next_bit = 0
+            for uri in sorted(live, key=str):
+                self._bit(uri)
+            self._compute(list(self._broaders))
+
+    def _with_descendants(self, uris):
+        ans = set(uris)
+        stack = list(uris)
+        while stack:
+            for n in self._narrowers.get(stack.pop(), ()):
+                if n not in ans:
+                    ans.add(n)
+                    stack.append(n)
+        return ans
+
+    def is_under(self, uri, ancestor):
+        """True if `ancestor` is a (transitive) broader concept of `uri`."""
+        bit = self._bits.get(ancestor)
+        if bit is None:
+            return False
+        return bool(self._ancestors.get(uri, 0) >> bit & 1)
+
+    def ancestors(self, uri):
+        """Set of the transitive broader concepts of `uri`."""
+        ancestors = self._ancestors.get(uri, 0)
+        ans = set()
+        while ancestors:
+            low = ancestors & -ancestors
+            ans.add(self._uris[low.bit_length() - 1])
+            ancestors ^= low
+        return ans
+
+    def broaders(self, uri):
+        return set(self._broaders.get(uri, ()))
+
+    def narrowers(self, uri):
+        return set(self._narrowers.get(uri, ()))
+
+    def descendants(self, uri):
+        """Set of the transitive narrower concepts of `uri`."""
+        with self._lock:
+            return self._with_descendants([uri]) - {uri}
+
+    def top_concepts(self):
+        return {uri for uri, broaders in self._broaders.items() if not broaders}
+
+    def refresh(self, pp, pid, since=None):
+        """
+        Fetch the concepts changed since `since` (default: the last build
+        or refresh) according to `get_history` and update or remove them.
+
+        :return: set of the changed URIs
+        """
+        since = since or self.updated
+        if since is None:
+            raise ValueError('No time of the last update, pass `since`')
+        now = datetime.datetime.now()
+        uris = changed_uris(pp.get_history(pid, from_=since))
+        if uris:
+            concepts = pp.get_concepts(list(uris), pid,
+                                       properties=['skos:broader'])
+            found = {cpt['uri'] for cpt in concepts}
+            with self._lock:
+                self.update(concepts)
+                self.remove([x for x in uris
+                             if x not in found and x in self._broaders])
+        self.updated = now
+        module_logger.debug('Refreshed {} concepts of the hierarchy'.format(
+            len(uris)))
+        return uris
+
+    @classmethod
+    def from_project(cls, pp, pid):
+        """Index of all concepts of a project, see `get_all_concepts`."""
+        index = cls()
+        index.updated = datetime.datetime.now()
+        index.update(pp.get_all_concepts(pid, properties=['skos:broader']))
+        return index
@@ -0,0 +1,310 @@
+"""
+Resumable bulk jobs (extraction, GraphSearch indexing) with per-item
+checkpoints in a local SQLite database.
+"""
+import json
+import logging
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+module_logger = logging.getLogger(__name__)
+
+DONE = 'done'
+FAILED = 'failed'
+
+
+class CheckpointStore:
+    """
+    Per-item progress of jobs, stored in SQLite. Every item is committed
+    when it finishes, so that a job can be resumed after a crash.
+
+    :param path: database file; ':memory:' for a store without persistence
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS items ('
+            ' job TEXT NOT NULL, key TEXT NOT NULL, status TEXT NOT NULL,'
+            ' attempts INTEGER NOT NULL, error TEXT, result TEXT,'
+            ' updated REAL NOT NULL, PRIMARY KEY (job, key))'
+        )
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _record(self, job, key, status, attempts, error=None, result=None):
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO items VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job, str(key), status, attempts, error, result, time.time()))
+            self._db.commit()
+
+    def mark_done(self, job, key, attempts=1, result=None):
+        """:param result: JSON-serializable result to keep, or None"""
+        if result is not None:
+            result = json.dumps(result)
+        self._record(job, key, DONE, attempts, result=result)
+
+    def mark_failed(self, job, key, error, attempts=1):
+        self._record(job, key, FAILED, attempts, error=str(error))
+
+    def keys(self, job, status=None):
+        """Set of the keys of `job` with `status` (any status if None)."""
+        query = 'SELECT key FROM items WHERE job = ?'
+        params = (job,)
+        if status is not None:
+            query += ' AND status = ?'
+            params += (status,)
+        with self._lock:
+            return {row[0] for row in self._db.execute(query, params)}
+
+    def get(self, job, key):
+        """dict with status, attempts, error and result of an item, or None"""
+        with self._lock:
+            row = self._db.execute(
+                'SELECT status, attempts, error, result FROM items '
+                'WHERE job = ? AND key = ?', (job, str(key))).fetchone()
+        if row is None:
+            return None
+        status, attempts, error, result = row
+        return {'status': status, 'attempts': attempts, 'error': error,
+                'result': json.loads(result) if result is not None else None}
+
+    def failed(self, job):
+        """dict {key: error} of the failed items of `job`"""
+        with self._lock:
+            return dict(self._db.execute(
+                'SELECT key, error FROM items WHERE job = ? AND status = ?',
+                (job, FAILED)))
+
+    def counts(self, job):
+        """dict {status: number of items} of `job`"""
+        with self._lock:
+            return dict(self._db.execute(
+                'SELECT status, COUNT(*) FROM items WHERE job = ? '
+                'GROUP BY status', (job,)))
+
+    def reset(self, job):
+        """Forget the progress of `job`."""
+        with self._lock:
+            self._db.execute('DELETE FROM items WHERE job = ?', (job,))
+            self._db.commit()
+
+
+class Progress:
+    """
+    Progress of one `JobRunner.run`.
+
+    total: number of items to process in this run, None if unknown
+    done, failed: items finished in this run
+    skipped: items already done in an earlier run
+    retries: attempts after the first one
+    """
+
+    def __init__(self, total=None):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.retries = 0
+        self.start = time.perf_counter()
+
+    @property
+    def finished(self):
+        return self.done + self.failed
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    @property
+    def throughput(self):
+        """Finished items per second."""
+        elapsed = self.elapsed
+        return self.finished / elapsed if elapsed > 0 else 0.
+
+    @property
+    def eta(self):
+        """Estimated seconds until the run is finished, None if unknown."""
+        if self.total is None or not self.throughput:
+            return None
+        return max(self.total - self.finished, 0) / self.throughput
+
+    def as_dict(self):
+        return {'total': self.total, 'done': self.done, 'failed': self.failed,
+                'skipped': self.skipped, 'retries': self.retries,
+                'elapsed': self.elapsed, 'throughput': self.throughput,
+                'eta': self.eta}
+
+    def __str__(self):
+        total = '?' if self.total is None else self.total
+        eta = '?' if self.eta is None else '{:.0f}s'.format(self.eta)
+        return '{}/{} done, {} failed, {:.1f} items/s, ETA {}'.format(
+            self.done, total, self.failed, self.throughput, eta)
+
+
+class JobRunner:
+    """
+    Applies `task` to many items concurrently, checkpointing every item in
+    a `CheckpointStore`. Items done in an earlier run with the same `name`
+    are skipped; failing items are retried with exponential backoff and
+    recorded as failed after `max_attempts`.
+
+    >>> store = CheckpointStore('jobs.sqlite')
+    >>> runner = JobRunner('extract-2024', store, extraction_task(pp, pid))
+    >>> progress = runner.run((doc['id'], doc['text']) for doc in docs)
+
+    :param name: name of the job in the store
+    :param store: `CheckpointStore`
+    :param task: function of one item; its result is kept in the store if
+        `keep_results` is True
+    :param max_workers: max number of items processed concurrently
+    :param max_attempts: attempts per item
+    :param backoff: delay before the first retry in seconds, doubled for
+        every further retry (with jitter) up to `max_backoff`
+    :param report_every: log the progress every `report_every` items
+    :param on_progress: function called with the `Progress` after every item
+    :param retry_failed: if True, items that failed in an earlier run are
+        processed again
+    """
+
+    def __init__(self, name, store, task, max_workers=4, max_attempts=3,
+                 backoff=1., max_backoff=60., keep_results=False,
+                 report_every=100, on_progress=None, retry_failed=True):
+        self.name = name
+        self.store = store
+        self.task = task
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.keep_results = keep_results
+        self.report_every = report_every
+        self.on_progress = on_progress
+        self.retry_failed = retry_failed
+        self.progress = None
+        self._lock = threading.Lock()
+
+    def delay(self, attempt):
+        """Backoff before retry number `attempt` (1 for the first retry)."""
+        delay = min(self.backoff * 2 ** (attempt - 1), self.max_backoff)
+        return delay * random.uniform(.5, 1.)
+
+    def _process(self, key, item):
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = self.task(item)
+            except Exception as e:
+                if attempt >= self.max_attempts:
+                    module_logger.error('Job {}: item {} failed after {} '
+                                        'attempts: {}'.format(self.name, key,
+                                                              attempt, e))
+                    self.store.mark_failed(self.name, key, e, attempts=attempt)
+                    return False, attempt
+                module_logger.warning('Job {}: item {} failed ({}), '
+                                      'retrying'.format(self.name, key, e))
+                time.sleep(self.delay(attempt))
+                continue
+            self.store.mark_done(
+                self.name, key, attempts=attempt,
+                result=result if self.keep_results else None)
+            return True, attempt
+
+    def _finished(self, ok, attempts):
+        with self._lock:
+            progress = self.progress
+            if ok:
+                progress.done += 1
+            else:
+                progress.failed += 1
+            progress.retries += attempts - 1
+            if self.report_every and progress.finished % self.report_every == 0:
+                module_logger.info('Job {}: {}'.format(self.name, progress))
+        if self.on_progress is not None:
+            self.on_progress(progress)
+
+    def run(self, items):
+        """
+        Process `items`.
+
+        :param items: iterable of (key, item) pairs or a dict {key: item};
+            keys identify the items across runs
+        :return: `Progress` of the run
+        """
+        if isinstance(items, dict):
+            items = items.items()
+        skip = self.store.keys(self.name, status=DONE)
+        if not self.retry_failed:
+            skip |= self.store.keys(self.name, status=FAILED)
+        total = None
+        if hasattr(items, '__len__'):
+            total = len(items)
+        self.progress = progress = Progress(total=total)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = set()
+            for key, item in items:
+                if str(key) in skip:
+                    progress.skipped += 1
+                    if progress.total is not None:
+                        progress.total -= 1
+                    continue
+                if len(futures) >= self.max_workers:
+                    finished, futures = wait(futures,
+                                             return_when=FIRST_COMPLETED)
+                    for f in finished:
+                        self._finished(*f.result())
+                futures.add(executor.submit(self._process, key, item))
+            for f in futures:
+                self._finished(*f.result())
+        module_logger.info('Job {} finished: {}, {} skipped'.format(
+            self.name, progress, progress.skipped))
+        return progress
+
+
+def extraction_task(pp, pid, lang='en', **kwargs):
+    """
+    Task for `JobRunner` extracting the concepts of a text item with
+    `PoolParty.extract_result`. Failed calls raise, so that they are retried.
+    """
+    def task(text):
+        return pp.extract_result(text, pid, lang=lang, **kwargs).cpts()
+    return task
+
+
+def indexing_task(gs, pid, search_space_id, update=False, lang='en',
+                  **kwargs):
+    """
+    Task for `JobRunner` extracting the concepts of a document and creating
+    it in GraphSearch. Items are dicts with the keys 'id', 'title', 'author',
+    'date' and 'text', and optionally 'image_url' and 'text_to_extract'.
+    """
+    from pp_api import pp_calls
+
+    pp = pp_calls.PoolParty(server=gs.server, auth_data=gs.auth_data,
+                            session=gs.session, timeout=gs.timeout,
+                            metrics=gs.metrics)
+    extract = extraction_task(pp, pid, lang=lang, **kwargs)
+
+    def task(doc):
+        cpts = extract(doc.get('text_to_extract') or doc['text'])
+        gs.create_with_freqs(
+            id_=doc['id'], title=doc['title'], author=doc['author'],
+            date=doc['date'], text=doc['text'], cpts=cpts, update=update,
+            search_space_id=search_space_id, image_url=doc.get('image_url'),
+            facet_mapper=gs.facet_mapper_for(pid), language=lang
+        )
+        return len(cpts)
+    return task
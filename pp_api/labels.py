@@ -0,0 +1,177 @@
+"""
+Cached and batched lookups of concept prefLabels.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from pp_api import utils as u
+
+module_logger = logging.getLogger(__name__)
+
+_missing = object()
+
+
+class LabelCache:
+    """
+    Thread-safe LRU cache of prefLabels, keyed by (pid, lang, uri). Unknown
+    concepts are cached as None.
+
+    :param maxsize: max number of labels kept
+    :param metrics: `metrics.Metrics` instance to record hits and misses in
+    """
+
+    def __init__(self, maxsize=100000, metrics=None):
+        self.maxsize = maxsize
+        self.metrics = metrics
+        self._labels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def get(self, pid, lang, uri, default=None):
+        key = (pid, lang, uri)
+        with self._lock:
+            label = self._labels.get(key, _missing)
+            if label is not _missing:
+                self._labels.move_to_end(key)
+        if self.metrics is not None:
+            self.metrics.record_cache('labels', hit=label is not _missing)
+        return default if label is _missing else label
+
+    def set(self, pid, lang, uri, label):
+        key = (pid, lang, uri)
+        with self._lock:
+            self._labels[key] = label
+            self._labels.move_to_end(key)
+            while len(self._labels) > self.maxsize:
+                self._labels.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._labels.clear()
+
+
+class LabelResolver:
+    """
+    Collects prefLabel lookups from many callers (threads) for `window`
+    seconds and sends them to `PoolParty.get_pref_labels_by_uri` in chunks
+    of at most `max_batch` URIs, concurrently. Every caller gets back the
+    labels of its own URIs; labels already in the cache are returned
+    without a call.
+
+    >>> with LabelResolver(pp, pid, lang='de') as resolver:
+    ...     label = resolver.resolve(uri)
+
+    :param pp: `PoolParty` instance
+    :param pid: id of project
+    :param lang: language of the labels
+    :param window: seconds to wait for more lookups before a batch is sent
+    :param max_batch: max number of URIs per call
+    :param max_workers: max number of concurrent calls
+    :param cache: `LabelCache`, may be shared between resolvers
+    """
+
+    def __init__(self, pp, pid, lang='en', window=0.005, max_batch=100,
+                 max_workers=4, cache=None):
+        self.pp = pp
+        self.pid = pid
+        self.lang = lang
+        self.window = window
+        self.max_batch = max_batch
+        self.cache = cache if cache is not None else LabelCache(
+            metrics=getattr(pp, 'metrics', None))
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = threading.Lock()
+        self._pending = dict()  # uri -> Future
+        self._timer = None
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def submit(self, uri):
+        """
+        Queue the lookup of `uri`.
+
+        :return: `concurrent.futures.Future` of the label (None if the
+            concept is unknown)
+        :raises RuntimeError: if the resolver is closed
+        """
+        if self._closed:
+            raise RuntimeError('LabelResolver is closed')
+        label = self.cache.get(self.pid, self.lang, uri, default=_missing)
+        if label is not _missing:
+            future = Future()
+            future.set_result(label)
+            return future
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('LabelResolver is closed')
+            future = self._pending.get(uri)
+            if future is None:
+                future = self._pending[uri] = Future()
+                if len(self._pending) >= self.max_batch:
+                    self._flush_locked()
+                elif self._timer is None:
+                    self._timer = threading.Timer(self.window, self.flush)
+                    self._timer.daemon = True
+                    self._timer.start()
+        return future
+
+    def resolve(self, uri, timeout=None):
+        """Label of `uri`, waiting for the batch it is sent with."""
+        return self.submit(uri).result(timeout=timeout)
+
+    def resolve_many(self, uris, timeout=None):
+        """dict {uri: label} for all `uris`."""
+        futures = {uri: self.submit(uri) for uri in uris}
+        self.flush()
+        return {uri: f.result(timeout=timeout) for uri, f in futures.items()}
+
+    def flush(self):
+        """Send the pending lookups now."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        pending = self._pending
+        self._pending = dict()
+        if not pending:
+            return
+        for chunk in u.chunks_by_length(pending, max_items=self.max_batch):
+            self._executor.submit(
+                self._fetch, {uri: pending[uri] for uri in chunk})
+
+    def _fetch(self, futures):
+        try:
+            labels = self.pp.get_pref_labels_by_uri(
+                list(futures), self.pid, lang=self.lang)
+        except Exception as e:
+            module_logger.error('Label lookup of {} concepts failed: {}'.format(
+                len(futures), e))
+            for future in futures.values():
+                future.set_exception(e)
+            return
+        for uri, future in futures.items():
+            label = labels.get(uri)
+            self.cache.set(self.pid, self.lang, uri, label)
+            future.set_result(label)
+
+    def close(self):
+        """
+        Send the pending lookups and wait for all calls to finish. Lookups
+        cannot be submitted after.
+        """
+        with self._lock:
+            self._closed = True
+            self._flush_locked()
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,276 @@
+"""
+Request-level metrics for `PoolParty`, `GraphSearch` and `sparql_calls`.
+
+A `Metrics` instance collects per-endpoint latency histograms, bytes sent and
+received (on the wire and uncompressed), retry counts, status codes and
+cache hits. Pass it as `metrics=` to the clients; the numbers can be read
+with `snapshot()`, exported with `to_prometheus()` or forwarded as they
+happen through callbacks (e.g. to StatsD).
+"""
+import contextlib
+import re
+import threading
+from collections import Counter
+from time import time
+from urllib.parse import urlsplit
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.,
+                   30., 60.)
+
+_id_segments = [
+    (re.compile(r'/(thesaurus|projects|corpusmanagement|history)/[^/]+'),
+     r'/\1/{pid}'),
+    (re.compile(r'/documents/[^/]+'), r'/documents/{id}'),
+]
+
+
+def endpoint_name(url):
+    """
+    Name of the API endpoint of `url`: its path with project and document
+    ids replaced by placeholders, so that calls for different projects are
+    aggregated together.
+
+    >>> endpoint_name('https://pp.org/PoolParty/api/thesaurus/1DCE/getPaths?x=1')
+    '/PoolParty/api/thesaurus/{pid}/getPaths'
+    """
+    path = urlsplit(url).path or '/'
+    for pattern, repl in _id_segments:
+        path = pattern.sub(repl, path)
+    return path
+
+
+def _body_size(body):
+    if body is None:
+        return 0
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    return 0  # generators and file-like bodies are not measured
+
+
+class EndpointStats:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.latency_sum = 0.
+        self.latency_max = 0.
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.body_bytes_sent = 0
+        self.body_bytes_received = 0
+        self.retries = 0
+        self.errors = 0
+        self.status_codes = Counter()
+
+    def observe(self, latency):
+        self.count += 1
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        for i, bound in enumerate(self.buckets):
+            if latency <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    def as_dict(self):
+        cumulative = []
+        total = 0
+        for bound, n in zip(self.buckets, self.bucket_counts):
+            total += n
+            cumulative.append((bound, total))
+        return {
+            'count': self.count,
+            'latency_sum': self.latency_sum,
+            'latency_max': self.latency_max,
+            'latency_buckets': cumulative,
+            'bytes_sent': self.bytes_sent,
+            'bytes_received': self.bytes_received,
+            'body_bytes_sent': self.body_bytes_sent,
+            'body_bytes_received': self.body_bytes_received,
+            'retries': self.retries,
+            'errors': self.errors,
+            'status_codes': dict(self.status_codes),
+        }
+
+
+class Metrics:
+    """
+    Thread-safe collector of request metrics.
+
+    Callbacks registered with `add_callback` are called with an event dict
+    after every recorded request (`'type': 'request'`) and cache lookup
+    (`'type': 'cache'`).
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.callbacks = []
+        self._lock = threading.Lock()
+        self._endpoints = dict()
+        self._caches = dict()
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def _emit(self, event):
+        for callback in self.callbacks:
+            callback(event)
+
+    def record_request(self, endpoint, latency, bytes_sent=0,
+                       bytes_received=0, status=None, retries=0, error=None,
+                       body_bytes_sent=None, body_bytes_received=None):
+        """
+        Record one call of `endpoint`.
+
+        :param latency: seconds
+        :param bytes_sent: size of the request body on the wire
+        :param bytes_received: size of the response body on the wire
+        :param body_bytes_sent: size of the request body before compression;
+            `bytes_sent` if None
+        :param body_bytes_received: size of the decoded response body;
+            `bytes_received` if None
+        :param status: HTTP status code, or None if there was no response
+        :param error: exception class name if the call raised
+        """
+        with self._lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = EndpointStats(self.buckets)
+            stats.observe(latency)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+            stats.body_bytes_sent += (bytes_sent if body_bytes_sent is None
+                                      else body_bytes_sent)
+            stats.body_bytes_received += (
+                bytes_received if body_bytes_received is None
+                else body_bytes_received)
+            stats.retries += retries
+            if status is not None:
+                stats.status_codes[status] += 1
+            if error is not None or (status is not None and status >= 400):
+                stats.errors += 1
+                if error is not None:
+                    stats.status_codes[error] += 1
+        if self.callbacks:
+            self._emit({
+                'type': 'request', 'endpoint': endpoint, 'latency': latency,
+                'bytes_sent': bytes_sent, 'bytes_received': bytes_received,
+                'body_bytes_sent': body_bytes_sent,
+                'body_bytes_received': body_bytes_received,
+                'status': status, 'retries': retries, 'error': error
+            })
+
+    def record_cache(self, cache, hit):
+        with self._lock:
+            counts = self._caches.setdefault(cache, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+        if self.callbacks:
+            self._emit({'type': 'cache', 'cache': cache, 'hit': hit})
+
+    @contextlib.contextmanager
+    def timer(self, endpoint):
+        """
+        Time the enclosed block as a call of `endpoint`. Use for calls that
+        do not go through an instrumented session.
+        """
+        start = time()
+        try:
+            yield
+        except Exception as e:
+            self.record_request(endpoint, time() - start,
+                                error=type(e).__name__)
+            raise
+        self.record_request(endpoint, time() - start)
+
+    def on_response(self, r, *args, **kwargs):
+        """`requests` response hook."""
+        if not kwargs.get('stream'):
+            r.content  # read the body so that its size is known
+        raw = getattr(r, 'raw', None)
+        try:
+            bytes_received = raw.tell()
+        except Exception:
+            bytes_received = int(r.headers.get('Content-Length', 0))
+        if not bytes_received and r._content:
+            bytes_received = len(r._content)
+        body_bytes_received = None
+        if r._content:
+            body_bytes_received = len(r._content)
+        retries = getattr(raw, 'retries', None)
+        self.record_request(
+            endpoint_name(r.url),
+            r.elapsed.total_seconds(),
+            bytes_sent=_body_size(r.request.body),
+            bytes_received=bytes_received,
+            status=r.status_code,
+            retries=len(retries.history) if retries is not None else 0,
+            body_bytes_sent=getattr(r.request, 'body_size', None),
+            body_bytes_received=body_bytes_received,
+        )
+        return r
+
+    def instrument(self, session):
+        """Install the response hook on `session` (once)."""
+        hooks = session.hooks.setdefault('response', [])
+        if self.on_response not in hooks:
+            hooks.append(self.on_response)
+        return session
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'endpoints': {name: stats.as_dict()
+                              for name, stats in self._endpoints.items()},
+                'caches': {name: dict(counts)
+                           for name, counts in self._caches.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._caches.clear()
+
+    def to_prometheus(self, prefix='pp_api'):
+        """
+        Render the snapshot in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for name, stats in sorted(snapshot['endpoints'].items()):
+            label = 'endpoint="{}"'.format(name)
+            for bound, n in stats['latency_buckets']:
+                lines.append('{}_request_seconds_bucket{{{},le="{}"}} {}'.format(
+                    prefix, label, bound, n))
+            lines.append('{}_request_seconds_bucket{{{},le="+Inf"}} {}'.format(
+                prefix, label, stats['count']))
+            lines.append('{}_request_seconds_sum{{{}}} {}'.format(
+                prefix, label, stats['latency_sum']))
+            lines.append('{}_request_seconds_count{{{}}} {}'.format(
+                prefix, label, stats['count']))
+            for key in ['bytes_sent', 'bytes_received', 'body_bytes_sent',
+                        'body_bytes_received', 'retries', 'errors']:
+                lines.append('{}_request_{}_total{{{}}} {}'.format(
+                    prefix, key, label, stats[key]))
+            for code, n in sorted(stats['status_codes'].items(),
+                                  key=lambda x: str(x[0])):
+                lines.append('{}_request_status_total{{{},code="{}"}} {}'.format(
+                    prefix, label, code, n))
+        for name, counts in sorted(snapshot['caches'].items()):
+            for key in ['hits', 'misses']:
+                lines.append('{}_cache_{}_total{{cache="{}"}} {}'.format(
+                    prefix, key, name, counts[key]))
+        return '\n'.join(lines) + '\n'
+
+
+def timer(metrics, endpoint):
+    """`metrics.timer(endpoint)`, or a no-op if `metrics` is None."""
+    if metrics is None:
+        return contextlib.nullcontext()
+    return metrics.timer(endpoint)
+
+
+def hooks(metrics):
+    """`hooks` argument for `requests` calls outside of a client session."""
+    if metrics is None:
+        return None
+    return {'response': [metrics.on_response]}
@@ -0,0 +1,145 @@
+"""
+Streaming NIF 2.0 serialization of extraction results.
+
+Writes the context and phrase annotations directly as Turtle or N-Triples
+text, without building an rdflib graph or a `nif.NIFDocument`. The input is
+the list of concepts returned by `PoolParty.get_cpts_from_response`.
+"""
+NIF = 'http://persistence.uni-leipzig.org/nlp2rdf/ontologies/nif-core#'
+ITSRDF = 'http://www.w3.org/2005/11/its/rdf#'
+XSD = 'http://www.w3.org/2001/XMLSchema#'
+RDF_TYPE = 'http://www.w3.org/1999/02/22-rdf-syntax-ns#type'
+
+FORMATS = ('turtle', 'nt')
+
+TURTLE_PREFIXES = (
+    '@prefix nif: <{}> .\n'
+    '@prefix itsrdf: <{}> .\n'
+    '@prefix xsd: <{}> .\n\n'
+).format(NIF, ITSRDF, XSD)
+
+_escapes = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r'})
+
+
+def _literal(value):
+    return '"' + str(value).translate(_escapes) + '"'
+
+
+def _uri(uri):
+    return '<' + uri + '>'
+
+
+def _index(value, fmt):
+    if fmt == 'turtle':
+        return '"{}"^^xsd:nonNegativeInteger'.format(value)
+    return '"{}"^^<{}nonNegativeInteger>'.format(value, XSD)
+
+
+def spans(cpts):
+    """
+    Yield (begin, end, uri) for every matching of the concepts, with `end`
+    exclusive (the extractor reports inclusive end indices).
+    """
+    for cpt in cpts:
+        for match in cpt.get('matchings', ()):
+            for start, end in match['positions']:
+                yield start, end + 1, cpt['uri']
+
+
+def iter_nif(text, cpts, doc_uri, fmt='turtle'):
+    """
+    Yield the NIF serialization of one document in chunks of text.
+    Turtle chunks do not include the prefix declarations, see
+    `TURTLE_PREFIXES`.
+
+    :param text: the document text the positions refer to
+    :param cpts: concepts as returned by `PoolParty.get_cpts_from_response`
+    :param doc_uri: base URI of the document
+    :param fmt: 'turtle' or 'nt'
+    """
+    if fmt not in FORMATS:
+        raise ValueError('Unknown NIF format: {}'.format(fmt))
+    doc_uri = doc_uri.split('#')[0]
+    context = _uri('{}#char=0,{}'.format(doc_uri, len(text)))
+    if fmt == 'turtle':
+        yield ('{} a nif:Context, nif:RFC5147String ;\n'
+               '    nif:isString {} ;\n'
+               '    nif:beginIndex {} ;\n'
+               '    nif:endIndex {} .\n').format(
+            context, _literal(text), _index(0, fmt), _index(len(text), fmt))
+    else:
+        yield ''.join([
+            '{} <{}> <{}Context> .\n'.format(context, RDF_TYPE, NIF),
+            '{} <{}> <{}RFC5147String> .\n'.format(context, RDF_TYPE, NIF),
+            '{} <{}isString> {} .\n'.format(context, NIF, _literal(text)),
+            '{} <{}beginIndex> {} .\n'.format(context, NIF, _index(0, fmt)),
+            '{} <{}endIndex> {} .\n'.format(context, NIF,
+                                            _index(len(text), fmt)),
+        ])
+
+    # group the concepts by span, so that every phrase is written once
+    phrases = dict()
+    for begin, end, uri in spans(cpts):
+        uris = phrases.setdefault((begin, end), [])
+        if uri not in uris:
+            uris.append(uri)
+    for (begin, end), uris in sorted(phrases.items()):
+        phrase = _uri('{}#char={},{}'.format(doc_uri, begin, end))
+        anchor = _literal(text[begin:end])
+        if fmt == 'turtle':
+            yield ('{} a nif:Phrase, nif:RFC5147String ;\n'
+                   '    nif:referenceContext {} ;\n'
+                   '    nif:anchorOf {} ;\n'
+                   '    nif:beginIndex {} ;\n'
+                   '    nif:endIndex {} ;\n'
+                   '    itsrdf:taIdentRef {} .\n').format(
+                phrase, context, anchor, _index(begin, fmt),
+                _index(end, fmt), ', '.join(_uri(x) for x in uris))
+        else:
+            lines = [
+                '{} <{}> <{}Phrase> .\n'.format(phrase, RDF_TYPE, NIF),
+                '{} <{}> <{}RFC5147String> .\n'.format(phrase, RDF_TYPE, NIF),
+                '{} <{}referenceContext> {} .\n'.format(phrase, NIF, context),
+                '{} <{}anchorOf> {} .\n'.format(phrase, NIF, anchor),
+                '{} <{}beginIndex> {} .\n'.format(phrase, NIF,
+                                                  _index(begin, fmt)),
+                '{} <{}endIndex> {} .\n'.format(phrase, NIF, _index(end, fmt)),
+            ]
+            lines += ['{} <{}taIdentRef> {} .\n'.format(phrase, ITSRDF, _uri(x))
+                      for x in uris]
+            yield ''.join(lines)
+
+
+def write_nif(out, text, cpts, doc_uri, fmt='turtle'):
+    """
+    Write the NIF serialization of one document to the text file-like `out`.
+    """
+    if fmt == 'turtle':
+        out.write(TURTLE_PREFIXES)
+    for chunk in iter_nif(text, cpts, doc_uri, fmt=fmt):
+        out.write(chunk)
+
+
+def write_nif_batch(out, docs, fmt='turtle'):
+    """
+    Write many documents to one output stream. Turtle prefixes are written
+    once at the top.
+
+    :param out: text file-like object
+    :param docs: iterable of (doc_uri, text, cpts)
+    :return: number of documents written
+    """
+    if fmt == 'turtle':
+        out.write(TURTLE_PREFIXES)
+    n = 0
+    for doc_uri, text, cpts in docs:
+        for chunk in iter_nif(text, cpts, doc_uri, fmt=fmt):
+            out.write(chunk)
+        out.write('\n')
+        n += 1
+    return n
+
+
+def to_string(text, cpts, doc_uri, fmt='turtle'):
+    prefix = TURTLE_PREFIXES if fmt == 'turtle' else ''
+    return prefix + ''.join(iter_nif(text, cpts, doc_uri, fmt=fmt))
@@ -0,0 +1,165 @@
+"""
+Extraction with the CPU-bound post-processing in worker processes.
+
+The extract calls are made by threads; the raw response bodies are sent to
+a process pool, where the JSON is parsed (`PoolParty.get_cpts_from_json`),
+the matchings are flattened (`extractor_utils.ppextract2matches`) and the
+NIF is serialized (`nif_writer`). Only the requested outputs, with the
+requested concept fields, are sent back.
+"""
+import logging
+from collections import namedtuple
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor,
+                                FIRST_COMPLETED, wait)
+
+module_logger = logging.getLogger(__name__)
+
+STEPS = ('cpts', 'matches', 'nif')
+
+ProcessedDoc = namedtuple('ProcessedDoc',
+                          ['key', 'ok', 'error', 'cpts', 'matches', 'nif'])
+ProcessedDoc.__doc__ = """
+Outcome of the extraction and post-processing of one text.
+
+key: identifier of the text
+ok: False if the extraction or the post-processing failed
+error: error message if not ok
+cpts: concepts as returned by `PoolParty.get_cpts_from_response`, reduced to
+    the requested fields (None if not requested)
+matches: (start, end, tag, content) tuples of `ppextract2matches`
+nif: NIF serialization as str
+"""
+
+
+def process(key, body, text=None, steps=STEPS, fields=None, tag=None,
+            overlaps=True, doc_uri=None, nif_format='nt'):
+    """
+    Post-process the body of one extract answer. Runs in the worker
+    processes, but can also be called directly.
+
+    :param body: raw body (bytes) of the extract call
+    :param text: the extracted text, needed for 'nif'
+    :param steps: outputs to compute, out of `STEPS`
+    :param fields: concept fields to return in `cpts`; all if None
+    :param tag: passed to `ppextract2matches`
+    :param overlaps: passed to `ppextract2matches`
+    :param doc_uri: base URI of the NIF document; derived from `key` if None
+    :return: `ProcessedDoc`
+    """
+    from pp_api.pp_calls import PoolParty
+    from pp_api import extractor_utils, nif_writer
+
+    try:
+        cpts = PoolParty.get_cpts_from_json(body)
+        matches = nif = None
+        if 'matches' in steps:
+            matches = extractor_utils.ppextract2matches(cpts, tag=tag,
+                                                        overlaps=overlaps)
+        if 'nif' in steps:
+            if doc_uri is None:
+                doc_uri = 'http://example.doc/{}'.format(key)
+            nif = nif_writer.to_string(text, cpts, doc_uri, fmt=nif_format)
+        if 'cpts' not in steps:
+            cpts = None
+        elif fields is not None:
+            cpts = [{k: cpt[k] for k in fields if k in cpt} for cpt in cpts]
+    except Exception as e:
+        return ProcessedDoc(key, False, '{}: {}'.format(type(e).__name__, e),
+                            None, None, None)
+    return ProcessedDoc(key, True, None, cpts, matches, nif)
+
+
+class ExtractionPipeline:
+    """
+    Extracts many texts with `fetchers` threads and post-processes the
+    answers in `processes` worker processes.
+
+    >>> pipeline = ExtractionPipeline(pp, pid, steps=('matches',))
+    >>> for doc in pipeline.run(texts.items()):
+    ...     print(doc.key, len(doc.matches))
+
+    :param pp: `PoolParty` instance
+    :param pid: id of project
+    :param fetchers: max number of concurrent extract calls
+    :param processes: number of worker processes; `os.cpu_count()` if None,
+        0 to post-process in the fetching threads
+    :param max_pending: max number of answers waiting for post-processing,
+        to bound memory
+    :param lang: language of the texts
+    :param max_attempts: attempts of every extract call
+    :param dead_letter: `extraction.DeadLetterSink` for failed extractions
+    :param extract_kwargs: further parameters of the extract calls
+    :param process_kwargs: parameters of `process` (steps, fields, tag,
+        overlaps, nif_format)
+    """
+
+    def __init__(self, pp, pid, fetchers=8, processes=None, max_pending=None,
+                 lang='en', max_attempts=1, dead_letter=None,
+                 extract_kwargs=None, **process_kwargs):
+        self.pp = pp
+        self.pid = pid
+        self.fetchers = fetchers
+        self.processes = processes
+        self.max_pending = max_pending or 4 * fetchers
+        self.lang = lang
+        self.max_attempts = max_attempts
+        self.dead_letter = dead_letter
+        self.extract_kwargs = extract_kwargs or dict()
+        self.process_kwargs = process_kwargs
+
+    def _fetch(self, key, text):
+        res = self.pp.extract_result(
+            text, self.pid, lang=self.lang, key=key,
+            max_attempts=self.max_attempts, dead_letter=self.dead_letter,
+            **self.extract_kwargs)
+        return key, text, res
+
+    def run(self, items):
+        """
+        :param items: dict {key: text} or iterable of (key, text)
+        :return: generator of `ProcessedDoc`, in the order they finish
+        """
+        if isinstance(items, dict):
+            items = items.items()
+        items = iter(items)
+        workers = None
+        if self.processes != 0:
+            workers = ProcessPoolExecutor(max_workers=self.processes)
+        fetchers = ThreadPoolExecutor(max_workers=self.fetchers)
+        try:
+            fetching = set()
+            processing = set()
+            exhausted = False
+            while True:
+                while (not exhausted and len(fetching) < self.fetchers and
+                       len(fetching) + len(processing) < self.max_pending):
+                    item = next(items, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    fetching.add(fetchers.submit(self._fetch, *item))
+                if not fetching and not processing:
+                    break
+                done, _ = wait(fetching | processing,
+                               return_when=FIRST_COMPLETED)
+                for f in done:
+                    if f in processing:
+                        processing.discard(f)
+                        yield f.result()
+                        continue
+                    fetching.discard(f)
+                    key, text, res = f.result()
+                    if not res.ok:
+                        yield ProcessedDoc(key, False, res.error,
+                                           None, None, None)
+                        continue
+                    args = (key, res.response.content, text)
+                    if workers is None:
+                        yield process(*args, **self.process_kwargs)
+                    else:
+                        processing.add(workers.submit(
+                            process, *args, **self.process_kwargs))
+        finally:
+            fetchers.shutdown(wait=True)
+            if workers is not None:
+                workers.shutdown(wait=True)
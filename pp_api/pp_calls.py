@@ -1,27 +1,23 @@
+import io
+import json
 import os
+import tempfile
 import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
 import requests
 from requests.exceptions import HTTPError
-from requests.packages.urllib3.util.retry import Retry
-from requests.adapters import HTTPAdapter
-import tempfile
 import logging
 import traceback
-from time import time
+from time import time, sleep
 
 module_logger = logging.getLogger(__name__)
 
-imported_nif = False
-try:
-    from nif.annotation import NIFDocument
-    imported_nif = True
-except ImportError:
-    module_logger.warning("""Nif module can not be imported. To import use\n
-      pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n
-      """)
 
 from pp_api import utils as u
+from pp_api import metrics
+from pp_api import nif_writer
+from pp_api import balancer
 
 
 
@@ -29,16 +25,59 @@ from pp_api import utils as u
 class PoolParty:
     timeout = None
 
-    def __init__(self, server, auth_data=None, session=None, max_retries=None, timeout=None):
+    def __init__(self, server, auth_data=None, session=None, max_retries=None,
+                 timeout=None, pool_connections=None, pool_maxsize=None,
+                 pool_block=None, keep_alive=None, metrics=None,
+                 coalesce=False, balancing='least_outstanding',
+                 compress_requests=None):
+        """
+        :param server: PoolParty server URL, or a list of URLs (or a
+            `balancer.ServerPool`) of extractor nodes over which the extract
+            calls are spread
+        :param auth_data: (user, password); read from the environment if None
+        :param session: existing session to use, may be shared with other
+            `PoolParty` or `GraphSearch` instances
+        :param max_retries: retry failed (5xx) calls with backoff
+        :param timeout: default timeout of the calls
+        :param pool_connections: see `utils.get_session`
+        :param pool_maxsize: see `utils.get_session`
+        :param pool_block: see `utils.get_session`
+        :param keep_alive: see `utils.get_session`
+        :param metrics: `metrics.Metrics` instance to record the calls in
+        :param coalesce: if True (or a `utils.SingleFlight` to share),
+            identical concurrent read calls share one HTTP request
+        :param balancing: strategy of the `balancer.ServerPool` if several
+            servers are given, 'least_outstanding' or 'latency'
+        :param compress_requests: True, 'gzip' or 'deflate' to compress
+            request bodies, see `utils.CompressingAdapter`
+        """
         self.auth_data = auth_data
+        self.server_pool = None
+        if isinstance(server, balancer.ServerPool):
+            self.server_pool = server
+        elif not isinstance(server, str):
+            self.server_pool = balancer.ServerPool(server, strategy=balancing)
+        if self.server_pool is not None:
+            # the first server is used for the calls other than extraction
+            server = self.server_pool.urls[0]
         self.server = server
-        self.session = u.get_session(session, auth_data)
-        if max_retries is not None:
-            retries = Retry(total=max_retries,
-                            backoff_factor=0.3,
-                            status_forcelist=[500, 502, 503, 504])
-            self.session.mount(self.server, HTTPAdapter(max_retries=retries))
+        # a shared session is only reconfigured for these servers
+        servers = (tuple(self.server_pool.urls) if self.server_pool is not None
+                   else (self.server,))
+        self.session = u.get_session(
+            session, auth_data,
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+            pool_block=pool_block, max_retries=max_retries,
+            keep_alive=keep_alive, servers=servers,
+            compress_requests=compress_requests
+        )
         self.timeout = timeout
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self.session)
+        if coalesce is True:
+            coalesce = u.SingleFlight()
+        self.single_flight = coalesce or None
 
     def extract(self, text, pid, lang='en', **kwargs):
         """
@@ -52,20 +91,46 @@ class PoolParty:
         :param lang: language
         :return: response object
         """
-        tmp_file = tempfile.NamedTemporaryFile(delete=False, mode='w+b')
-        tmp_file.write(str(text).encode('utf8'))
-        tmp_file.seek(0)
-        return self.extract_from_file(tmp_file, pid, lang=lang, **kwargs)
+        text_file = io.BytesIO(str(text).encode('utf8'))
+        return self.extract_from_file(text_file, pid, lang=lang, **kwargs)
 
     def extract_from_file(self, file, pid, mb_time_factor=3, lang='en',
                           **kwargs):
         """
-        Make extract call using project determined by pid.
+        Make extract call using project determined by pid. Connection errors
+        and timeouts are logged and give None, see `extract_result` for a
+        structured outcome.
 
         :param text: text
         :param pid: id of project
         :return: response object
         """
+        try:
+            return self._extract_file(file, pid, mb_time_factor=mb_time_factor,
+                                      lang=lang, **kwargs)
+        except HTTPError:
+            raise
+        except Exception:
+            module_logger.error(traceback.format_exc())
+            return None
+
+    def _extract_file(self, file, pid, mb_time_factor=3, lang='en', **kwargs):
+        """
+        `extract_from_file` raising all errors. With several servers, the
+        call goes to the one chosen by `self.server_pool`.
+        """
+        # open the file first, so that a bad path is not taken for a failure
+        # of the server
+        if not hasattr(file, 'read'):
+            file = open(file, 'rb')
+        if self.server_pool is None:
+            return self._post_extract(self.server, file, pid, mb_time_factor,
+                                      lang, **kwargs)
+        with self.server_pool.lease() as node:
+            return self._post_extract(node.url, file, pid, mb_time_factor,
+                                      lang, **kwargs)
+
+    def _post_extract(self, server, file, pid, mb_time_factor, lang, **kwargs):
         data = {
             'numberOfConcepts': 100000,
             'numberOfTerms': 100000,
@@ -79,12 +144,9 @@ class PoolParty:
             'showMatchingDetails': True
         }
         data.update(kwargs)
-        target_url = self.server + '/extractor/api/extract'
+        target_url = server + '/extractor/api/extract'
         start = time()
         try:
-            if not hasattr(file, 'read'):
-                file = open(file, 'rb')
-            file_text = file.read()
             # Findout filesize
             file.seek(0, 2)  # Go to end of file
             f_size_mb = file.tell() / (1024 * 1024)
@@ -99,36 +161,140 @@ class PoolParty:
                 timeout=countedTimeout
             )
         except Exception as e:
-            module_logger.error(traceback.format_exc())
+            if self.metrics is not None:
+                self.metrics.record_request(
+                    metrics.endpoint_name(target_url), time() - start,
+                    error=type(e).__name__
+                )
+            raise
         finally:
             file.close()
         module_logger.debug('call took {:0.3f}'.format(time() - start))
-        if not 'r' in locals():
-            return None
         try:
             r.raise_for_status()
         except Exception as e:
             msg = 'JSON data of the failed POST request: {}\n'.format(data)
             msg += 'URL of the failed POST request: {}'.format(target_url)
             module_logger.error(msg)
-            response = r.json()
-            if "errorMessage" in response:
+            try:
+                response = r.json()
+            except ValueError:
+                # e.g. an HTML error page of a proxy
+                response = None
+            if isinstance(response, dict) and "errorMessage" in response:
                 extra = "API error message: {}\n".format(response["errorMessage"])
-                raise type(e)(str(e) + "\n" + extra)
+                raise type(e)(str(e) + "\n" + extra, response=r)
             else:
                 raise e
         return r
 
+    def extract_cpts(self, text, pid, profile='minimal', lang='en', **kwargs):
+        """
+        Extract concepts from `text` with an extraction profile: only the
+        parameters the profile needs are requested and only its fields are
+        parsed. Errors are raised.
+
+        :param profile: name of a profile in `profiles.PROFILES` ('minimal',
+            'positions', 'full-hierarchy', 'full') or an
+            `profiles.ExtractionProfile`
+        :param kwargs: further extract parameters, override the profile
+        :return: list of concepts with the fields of the profile
+        """
+        from pp_api import profiles
+
+        profile = profiles.get_profile(profile)
+        params = dict(profile.params, **kwargs)
+        r = self._extract_file(io.BytesIO(str(text).encode('utf8')), pid,
+                               lang=lang, **params)
+        return profile.parse(r.content)
+
+    def extract_result(self, text=None, pid=None, file=None, lang='en',
+                       max_attempts=1, backoff=1., key=None, dead_letter=None,
+                       **kwargs):
+        """
+        Extract from `text` (or `file`) and report the outcome instead of
+        raising or returning None.
+
+        :param max_attempts: attempts before the extraction is reported as
+            failed; the delay between them starts at `backoff` seconds and
+            doubles
+        :param key: identifier of the input, kept in the result
+        :param dead_letter: `extraction.DeadLetterSink` receiving failed
+            inputs for a later replay
+        :return: `extraction.ExtractionResult`
+        """
+        from pp_api.extraction import ExtractionResult
+
+        start = time()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if file is not None:
+                    if hasattr(file, 'seek'):
+                        file.seek(0)
+                        source = io.BytesIO(file.read())
+                    else:
+                        source = file
+                else:
+                    source = io.BytesIO(str(text).encode('utf8'))
+                r = self._extract_file(source, pid, lang=lang, **kwargs)
+            except Exception as e:
+                # client errors other than throttling will not go away
+                if attempt < max_attempts and balancer.is_server_failure(e):
+                    module_logger.warning('Extraction of {} failed ({}), '
+                                          'retrying'.format(key, e))
+                    sleep(backoff * 2 ** (attempt - 1))
+                    continue
+                module_logger.error('Extraction of {} failed: {}'.format(key, e))
+                result = ExtractionResult(key, ExtractionResult.FAILED, None,
+                                          time() - start, attempt,
+                                          '{}: {}'.format(type(e).__name__, e))
+                if dead_letter is not None:
+                    dead_letter.add(result, text=text, file=file, pid=pid,
+                                    lang=lang, params=kwargs)
+                return result
+            return ExtractionResult(key, ExtractionResult.OK, r,
+                                    time() - start, attempt, None)
+
+    def extract_many(self, items, pid, lang='en', max_workers=4,
+                     dead_letter=None, **kwargs):
+        """
+        Extract from many texts concurrently.
+
+        :param items: dict {key: text} or iterable of (key, text)
+        :param kwargs: passed to `extract_result`
+        :return: list of `extraction.ExtractionResult` in the order of `items`
+        """
+        if isinstance(items, dict):
+            items = items.items()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(self.extract_result, text, pid,
+                                       lang=lang, key=key,
+                                       dead_letter=dead_letter, **kwargs)
+                       for key, text in items]
+            return [f.result() for f in futures]
+
     @staticmethod
     def get_cpts_from_response(r):
+        if r is None:
+            return []
+        return PoolParty.get_cpts_from_json(r.json())
+
+    @staticmethod
+    def get_cpts_from_json(concept_container):
+        """
+        `get_cpts_from_response` for the decoded JSON answer (or the raw
+        body as bytes or str) of an extract call. Does not need a response
+        object, e.g. to be run in another process.
+        """
         attributes = ['prefLabel', 'frequencyInDocument', 'uri',
                       'transitiveBroaderConcepts', 'transitiveBroaderTopConcepts',
                       'relatedConcepts']
         # matchingLabels is checked and saved as well
         extr_cpts = []
-        if r is None:
-            return extr_cpts
-        concept_container = r.json()
+        if isinstance(concept_container, (bytes, str)):
+            concept_container = json.loads(concept_container)
 
         if not 'concepts' in concept_container:
             if not 'document' in concept_container:
@@ -250,7 +416,9 @@ class PoolParty:
         :param doc_uri:
         :return: NIFDocument
         """
-        if not imported_nif:            
+        try:
+            from nif.annotation import NIFDocument
+        except ImportError:
             raise ImportError("""
                           nif module needs to be imported to use this method\n
                           Please import with\n
@@ -263,53 +431,147 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
 
     def extract2nif(self, text_or_filename, pid, lang='en',
                     doc_uri="http://example.doc/" + str(uuid.uuid4()),
-                    **kwargs):
+                    out=None, nif_format='turtle', **kwargs):
+        """
+        Extract concepts from a text or a file and annotate it as NIF.
+
+        :param text_or_filename: text or path of a text file
+        :param pid: id of project
+        :param out: if given, a text file-like object the NIF is streamed to
+            with `nif_writer` (no rdflib graph is built)
+        :param nif_format: 'turtle' or 'nt', used with `out`
+        :return: NIFDocument, or `out` if it was given
+        """
         if os.path.isfile(text_or_filename):
-            with open(text_or_filename) as f:
-                text = f.read()
-            r = self.extract_from_file(text_or_filename, pid, lang=lang,
+            with open(text_or_filename, 'rb') as f:
+                content = f.read()
+            text = content.decode('utf8')
+            r = self.extract_from_file(io.BytesIO(content), pid, lang=lang,
                                        **kwargs)
         else:
             text = text_or_filename
             r = self.extract(text_or_filename, pid, lang=lang, **kwargs)
         cpts = self.get_cpts_from_response(r)
+        if out is not None:
+            nif_writer.write_nif(out, text, cpts, doc_uri, fmt=nif_format)
+            return out
         return self.format_nif(text, cpts, doc_uri=doc_uri)
 
-    def get_pref_labels(self, uris, pid):
+    @u.coalesced
+    def get_pref_labels(self, uris, pid, lang='en'):
         """
-        Get prefLabels (in English) of all concepts specified by uris.
+        Get prefLabels of all concepts specified by uris. Long lists are
+        requested in several calls, see `utils.chunks_by_length`.
 
         :param uris:
         :param pid: id of project
-        :return: response object
+        :param lang: language of the labels
+        :return: list of prefLabels
         """
-        data = {
-            'concepts': uris,
-            'projectId': pid,
-            'language': 'en',
-        }
+        return [x['prefLabel'] for x in self._get_concepts(uris, pid, lang)]
+
+    @u.coalesced
+    def get_pref_labels_by_uri(self, uris, pid, lang='en'):
+        """
+        Get prefLabels of all concepts specified by uris.
+
+        :return: dict {uri: prefLabel}; unknown concepts are missing
+        """
+        return {x['uri']: x.get('prefLabel')
+                for x in self._get_concepts(uris, pid, lang)}
+
+    def get_concepts(self, uris, pid, properties=None, lang='en'):
+        """
+        Concept details of all concepts specified by uris; unknown concepts
+        are missing from the result.
+
+        :param properties: None | "all" | list of properties (URIs) to fetch
+        :param lang: language of the labels
+        :return: list of concept dicts
+        """
+        return self._get_concepts(uris, pid, lang=lang, properties=properties)
+
+    def _get_concepts(self, uris, pid, lang='en', properties=None):
+        if isinstance(uris, str):
+            uris = [uris]
         target_url = self.server + '/PoolParty/api/thesaurus/{}/concepts'.format(pid)
-        r = self.session.get(
-            target_url,
-            params=data,
-            timeout=self.timeout
-        )
-        try:
+        ans = []
+        for chunk in u.chunks_by_length(uris):
+            data = {
+                'concepts': chunk,
+                'projectId': pid,
+                'language': lang,
+            }
+            if properties == "all":
+                data["properties"] = properties
+            elif properties:
+                data["properties"] = list(properties)
+            r = self.session.get(
+                target_url,
+                params=data,
+                timeout=self.timeout
+            )
+            try:
+                r.raise_for_status()
+            except Exception as e:
+                msg = 'JSON data of the failed POST request: {}\n'.format(data)
+                msg += 'URL of the failed POST request: {}'.format(target_url)
+                module_logger.error(msg)
+                raise e
+            ans += r.json()
+        return ans
+
+    def _iter_pages(self, suffix, data):
+        """
+        Yield the items of a paged corpus management result, one page
+        (GET with increasing 'startIndex') at a time, until a page is empty.
+        A page shorter than data['limit'] does not end the iteration, as
+        servers may cap the page size below the requested limit.
+
+        If the server ignores the paging parameters, i.e. it returns more
+        than data['limit'] items or the same first item again, the items are
+        yielded once and the iteration stops.
+        """
+        data = dict(data, startIndex=data.get('startIndex', 0))
+        limit = data.get('limit')
+        first = None
+        while True:
+            r = self.session.get(self.server + suffix, params=data,
+                                 timeout=self.timeout)
             r.raise_for_status()
-        except Exception as e:
-            msg = 'JSON data of the failed POST request: {}\n'.format(data)
-            msg += 'URL of the failed POST request: {}'.format(target_url)
-            module_logger.error(msg)
-            raise e
-        return [x['prefLabel'] for x in r.json()]
+            page = r.json()
+            if not len(page):
+                break
+            if first is not None and page[0] == first:
+                module_logger.warning('{} ignores startIndex, stopping after '
+                                      'the first page'.format(suffix))
+                break
+            first = page[0]
+            yield from page
+            if limit is not None and len(page) > limit:
+                module_logger.warning('{} ignores limit, got all {} items in '
+                                      'one page'.format(suffix, len(page)))
+                break
+            data['startIndex'] += len(page)
 
-    def get_cpt_corpus_freqs(self, corpus_id, pid):
+    @staticmethod
+    def _collect(items, columnar, key='uri'):
+        if columnar:
+            from pp_api import columnar as c
+            schema = c.CONCEPT_SCHEMA if key == 'uri' else c.TERM_SCHEMA
+            return c.ColumnarTable.from_records(items, key=key, schema=schema)
+        return list(items)
+
+    @u.coalesced
+    def get_cpt_corpus_freqs(self, corpus_id, pid, columnar=False):
         """
         Make call to PP to extract frequencies of concepts in a corpus.
 
         :param corpus_id: corpus id
         :param pid: id of project
-        :return: response object
+        :param columnar: return a `columnar.ColumnarTable` keyed by 'uri'
+            instead of a list of dicts
+        :return: list of dicts or ColumnarTable
         """
         data = {
             'corpusId': corpus_id,
@@ -318,16 +580,9 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         suffix = '/PoolParty/api/corpusmanagement/{pid}/results/concepts'.format(
             pid=pid
         )
-        results = []
-        while True:
-            r = self.session.get(self.server + suffix, params=data, timeout=self.timeout)
-            r.raise_for_status()
-            data['startIndex'] += 20
-            results += r.json()
-            if not len(r.json()):
-                break
-        return results
+        return self._collect(self._iter_pages(suffix, data), columnar)
 
+    @u.coalesced
     def get_cpt_path(self, cpt_uri, pid):
         """
         Make call to PP to extract path of concept.
@@ -336,7 +591,10 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         :param pid: id of project
         :return: list: [(uri, label)] of cpt scheme and broaders
         """
+        paths = self._get_cpt_paths_json(cpt_uri, pid)
+        return self._path_from_json(paths[0])
 
+    def _get_cpt_paths_json(self, cpt_uri, pid):
         cpt_uri = str(cpt_uri)
         data = {
             'concept': cpt_uri
@@ -353,12 +611,92 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
             msg += 'URL of the failed POST request: {}'.format(target_url)
             module_logger.error(msg)
             raise e
-        broaders = [(x['uri'], x['prefLabel']) for x in
-                    r.json()[0]['conceptPath']]
-        cpt_scheme = r.json()[0]['conceptScheme']
-        result = [(cpt_scheme['uri'], cpt_scheme['title'])] + broaders
+        return r.json()
+
+    @staticmethod
+    def _path_from_json(path, intern=None):
+        cpt_scheme = path['conceptScheme']
+        result = [(cpt_scheme['uri'], cpt_scheme['title'])]
+        result += [(x['uri'], x['prefLabel']) for x in path['conceptPath']]
+        if intern is not None:
+            result = [intern.setdefault(x, x) for x in result]
         return result
 
+    def get_cpt_paths(self, uris, pid, all_paths=False, max_workers=8):
+        """
+        Paths of many concepts, fetched concurrently.
+
+        The URIs are de-duplicated. Unless `all_paths` is True, the path of
+        a concept that was already seen as an ancestor on the path of
+        another concept is taken from that path instead of being requested;
+        for concepts with several broaders this is one of their paths. The
+        (uri, label) entries are shared between the paths.
+
+        :param uris: concept URIs
+        :param pid: id of project
+        :param all_paths: if True, return all paths of every concept
+        :param max_workers: max number of concurrent calls
+        :return: dict {uri: path} with paths as in `get_cpt_path`, or
+            {uri: [path, ...]} if `all_paths` is True. Concepts without a
+            path are mapped to None ([] if `all_paths` is True); concepts
+            whose call failed (e.g. unknown URIs) are logged and mapped to
+            None.
+        """
+        todo = list(dict.fromkeys(str(x) for x in uris))
+        intern = dict()
+        known = dict()  # uri -> path, also for ancestors
+        failed = set()  # also the concepts without a path
+
+        def remember(uri, path):
+            known[uri] = path
+            if all_paths:
+                return
+            # the conceptPath may or may not end with the concept itself,
+            # the paths of the ancestors follow the same convention
+            with_self = int(path[-1][0] == uri)
+            for i, (ancestor, _) in enumerate(path[1:len(path) - with_self]):
+                known.setdefault(ancestor, path[:i + 1 + with_self])
+
+        ans = dict()
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = dict()
+            queue = iter(todo)
+            while True:
+                # keep at most `max_workers` calls in flight, so that later
+                # concepts can be found in the paths of earlier ones
+                for uri in queue:
+                    if not all_paths and uri in known:
+                        continue
+                    futures[executor.submit(
+                        self._get_cpt_paths_json, uri, pid)] = uri
+                    if len(futures) >= max_workers:
+                        break
+                if not futures:
+                    break
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for f in done:
+                    uri = futures.pop(f)
+                    try:
+                        result = f.result()
+                    except requests.RequestException as e:
+                        module_logger.warning(
+                            'No paths of {}: {}'.format(uri, e))
+                        failed.add(uri)
+                        continue
+                    paths = [self._path_from_json(x, intern) for x in result]
+                    if all_paths:
+                        ans[uri] = paths
+                    elif paths:
+                        remember(uri, paths[0])
+                    else:
+                        failed.add(uri)
+        if all_paths:
+            return {uri: ans.get(uri) for uri in todo
+                    if uri in ans or uri in failed}
+        return {uri: known.get(uri) for uri in todo
+                if uri in known or uri in failed}
+
+    @u.coalesced
     def get_term_coocs(self, term_str, corpus_id, pid):
         suffix = '/PoolParty/api/corpusmanagement/' \
                  '{pid}/results/cooccurrence/term'.format(
@@ -387,6 +725,22 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
 
         return results
 
+    def get_term_cooc_graph(self, corpus_id, pid, terms=None, top_n=100,
+                            max_workers=8, **kwargs):
+        """
+        Co-occurrence network of `terms` (default: the `top_n` terms by
+        score of the corpus), see `cooc.build_cooc_graph`.
+
+        :return: `cooc.CoocGraph`
+        """
+        from pp_api import cooc
+
+        if terms is None:
+            terms = cooc.top_terms(self, corpus_id, pid, n=top_n)
+        return cooc.build_cooc_graph(self, terms, corpus_id, pid,
+                                     max_workers=max_workers, **kwargs)
+
+    @u.coalesced
     def get_projects(self):
         suffix = '/PoolParty/api/projects'
         r = self.session.get(self.server + suffix,timeout=self.timeout)
@@ -394,6 +748,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         result = r.json()
         return result
 
+    @u.coalesced
     def get_corpora(self, pid):
         suffix = '/PoolParty/api/corpusmanagement/{pid}/corpora'.format(pid=pid)
         r = self.session.get(self.server + suffix,timeout=self.timeout)
@@ -401,18 +756,53 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         result = r.json()['jsonCorpusList']
         return result
 
-    def get_corpus_documents(self, corpus_id, pid):
+    @u.coalesced
+    def get_corpus_documents(self, corpus_id, pid, include_content=True):
+        """
+        All documents of a corpus in one response; see
+        `iter_corpus_documents` for large corpora.
+        """
         suffix = '/PoolParty/api/corpusmanagement/{pid}/documents'.format(
             pid=pid)
         data = {
             'corpusId': corpus_id,
-            'includeContent': True
+            'includeContent': include_content
         }
         r = self.session.get(self.server + suffix, params=data,timeout=self.timeout)
         r.raise_for_status()
         result = r.json()
         return result
 
+    def iter_corpus_documents(self, corpus_id, pid, include_content=False,
+                              lazy_content=True, page_size=20):
+        """
+        Iterate over the documents of a corpus one page at a time, so that
+        memory does not grow with the size of the corpus.
+
+        :param corpus_id: corpus id
+        :param pid: id of project
+        :param include_content: fetch the texts with the pages
+        :param lazy_content: if the texts are not included, yield
+            `corpus.CorpusDocument` dicts that fetch the text of a document
+            with `get_document_terms` when doc['content'] is read
+        :param page_size: documents per request
+        :return: generator of document dicts ('id', 'title', ...)
+        """
+        from pp_api.corpus import CorpusDocument
+
+        suffix = '/PoolParty/api/corpusmanagement/{pid}/documents'.format(
+            pid=pid)
+        data = {
+            'corpusId': corpus_id,
+            'includeContent': include_content,
+            'limit': page_size
+        }
+        for doc in self._iter_pages(suffix, data):
+            if lazy_content and not include_content:
+                doc = CorpusDocument(doc, self, corpus_id, pid)
+            yield doc
+
+    @u.coalesced
     def get_document_terms(self, doc_id, corpus_id, pid):
         suffix = '/PoolParty/api/corpusmanagement/{pid}/documents/{docid}'.format(
             pid=pid, docid=doc_id
@@ -425,7 +815,15 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         result = r.json()
         return result
 
-    def get_allterms_scores(self, corpus_id, pid):
+    @u.coalesced
+    def get_allterms_scores(self, corpus_id, pid, columnar=False):
+        """
+        :param corpus_id: corpus id
+        :param pid: id of project
+        :param columnar: return a `columnar.ColumnarTable` keyed by
+            'textValue' instead of a list of dicts
+        :return: list of dicts or ColumnarTable
+        """
         suffix = '/PoolParty/api/corpusmanagement/{pid}/results/extractedterms'.format(
             pid=pid
         )
@@ -433,19 +831,18 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
             'corpusId': corpus_id,
             'startIndex': 0
         }
-        results = []
-        while True:
-            r = self.session.get(self.server + suffix,
-                                 params=data,
-                                 timeout=self.timeout)
-            r.raise_for_status()
-            data['startIndex'] += 20
-            results += r.json()
-            if not len(r.json()):
-                break
-        return results
+        return self._collect(self._iter_pages(suffix, data), columnar,
+                             key='textValue')
 
-    def get_terms_stats(self, corpus_id, pid):
+    @u.coalesced
+    def get_terms_stats(self, corpus_id, pid, columnar=False):
+        """
+        :param corpus_id: corpus id
+        :param pid: id of project
+        :param columnar: return a `columnar.ColumnarTable` keyed by
+            'textValue' instead of a list of dicts
+        :return: list of dicts or ColumnarTable
+        """
         suffix = '/PoolParty/api/corpusmanagement/{pid}/results/extractedterms'.format(
             pid=pid
         )
@@ -453,31 +850,134 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
             'corpusId': corpus_id,
             'startIndex': 0
         }
-        results = []
-        while True:
-            r = self.session.get(self.server + suffix,
-                                 params=data,
-                                 timeout=self.timeout)
-            r.raise_for_status()
-            data['startIndex'] += 20
-            results += r.json()
-            if not len(r.json()):
-                break
-        return results
+        return self._collect(self._iter_pages(suffix, data), columnar,
+                             key='textValue')
 
-    def export_project(self, pid):
+    @u.coalesced
+    def export_project(self, pid, rdf_format='N3', modules=('concepts',)):
+        """
+        :return: the export as bytes; see `export_project_to` for large
+            projects
+        """
         suffix = '/PoolParty/api/projects/{pid}/export'.format(
             pid=pid
         )
-        rdf_format = 'N3'
         data = {
             'format': rdf_format,
-            'exportModules': ['concepts']
+            'exportModules': list(modules)
         }
         r = self.session.get(self.server + suffix, params=data,timeout=self.timeout)
         r.raise_for_status()
         return r.content
 
+    def export_project_to(self, pid, out=None, rdf_format='N-Triples',
+                          modules=('concepts',), on_triple=None,
+                          chunk_size=2**16):
+        """
+        Stream the export of a project to `out` in chunks, without holding
+        it in memory.
+
+        :param pid: id of project
+        :param out: path or binary file-like object; None to only pass the
+            triples to `on_triple`. A path is written only if the export
+            succeeds: the data goes to a temporary file in the same
+            directory first, which then replaces the file.
+        :param rdf_format: serialization format, e.g. 'N-Triples', 'N3',
+            'Turtle' or 'RDF/XML'
+        :param modules: export modules
+        :param on_triple: function called with (subject, predicate, object)
+            of every triple as it arrives, see `rdf_import.parse_nt_line`;
+            N-Triples only
+        :param chunk_size: bytes read at a time
+        :return: number of bytes received
+        """
+        from pp_api.rdf_import import parse_nt_line
+
+        if on_triple is not None and rdf_format != 'N-Triples':
+            raise ValueError('Triples can only be parsed from N-Triples, not '
+                             '{}'.format(rdf_format))
+        if out is None and on_triple is None:
+            raise ValueError('Nothing to do: pass `out` or `on_triple`')
+        if isinstance(out, str):
+            # an existing file is only replaced by a complete export
+            fd, tmp = tempfile.mkstemp(
+                dir=os.path.dirname(os.path.abspath(out)),
+                prefix=os.path.basename(out) + '.', suffix='.part')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    size = self.export_project_to(
+                        pid, f, rdf_format=rdf_format, modules=modules,
+                        on_triple=on_triple, chunk_size=chunk_size)
+                os.replace(tmp, out)
+            except BaseException:
+                os.remove(tmp)
+                raise
+            return size
+        suffix = '/PoolParty/api/projects/{pid}/export'.format(
+            pid=pid
+        )
+        data = {
+            'format': rdf_format,
+            'exportModules': list(modules)
+        }
+        size = 0
+        rest = b''
+        with self.session.get(self.server + suffix, params=data,
+                              timeout=self.timeout, stream=True) as r:
+            try:
+                r.raise_for_status()
+            except Exception as e:
+                module_logger.error('Export of project {} failed'.format(pid))
+                raise e
+            for chunk in r.iter_content(chunk_size):
+                size += len(chunk)
+                if out is not None:
+                    out.write(chunk)
+                if on_triple is None:
+                    continue
+                lines = (rest + chunk).split(b'\n')
+                rest = lines.pop()
+                for line in lines:
+                    triple = parse_nt_line(line.decode('utf8'))
+                    if triple is not None:
+                        on_triple(*triple)
+        if on_triple is not None and rest:
+            triple = parse_nt_line(rest.decode('utf8'))
+            if triple is not None:
+                on_triple(*triple)
+        return size
+
+    def import_rdf(self, pid, file, rdf_format='N-Triples'):
+        """
+        Import RDF data into the project (API call: projects/{project}/import)
+
+        :param pid: id of project
+        :param file: path or binary file-like object with the serialized data
+        :param rdf_format: serialization format of the data
+        :return: response object
+        """
+        suffix = '/PoolParty/api/projects/{pid}/import'.format(
+            pid=pid
+        )
+        data = {
+            'format': rdf_format
+        }
+        target_url = self.server + suffix
+        if not hasattr(file, 'read'):
+            with open(file, 'rb') as f:
+                return self.import_rdf(pid, f, rdf_format=rdf_format)
+        r = self.session.post(target_url, data=data, files={'file': file},
+                              timeout=self.timeout)
+        try:
+            r.raise_for_status()
+        except Exception as e:
+            msg = 'JSON data of the failed POST request: {}\n'.format(data)
+            msg += 'URL of the failed POST request: {}'.format(target_url)
+            module_logger.error(msg)
+            raise e
+        return r
+
+    @u.coalesced
     def get_autocomplete(self, query_str, pid, lang='en'):
         suffix = '/extractor/api/suggest'
         data = {
@@ -494,6 +994,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
             ans = []
         return ans
 
+    @u.coalesced
     def get_onto(self, uri):
         suffix = '/PoolParty/api/schema/ontology'
         data = {
@@ -504,6 +1005,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         ans = r.json()
         return ans
 
+    @u.coalesced
     def get_history(self, pid, from_=None):
         """
 
@@ -523,6 +1025,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         r.raise_for_status()
         return r.json()
 
+    @u.coalesced
     def get_schemes(self, pid):
         suffix = '/PoolParty/api/thesaurus/{project}/schemes'.format(
             project=pid
@@ -553,7 +1056,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         if suffix:
             data["suffix"] = suffix
 
-        target_url = os.path.join(self.server, urlpath)
+        target_url = self.server + urlpath
         r = self.session.post(target_url, data=data, timeout=self.timeout)
         try:
             r.raise_for_status()
@@ -577,7 +1080,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
             'language': lang
         }
         target_url = self.server + suffix
-        r = self.session.post(target_url, data=data)
+        r = self.session.post(target_url, data=data, timeout=self.timeout)
         try:
             r.raise_for_status()
         except Exception as e:
@@ -620,6 +1123,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
             relation_type='skos:related'
         )
 
+    @u.coalesced
     def get_cpt_narrowers(self, pid, cpt_uri, transitive=True, lang=None):
         suffix = '/PoolParty/api/thesaurus/{project}/narrowers'.format(
             project=pid
@@ -636,6 +1140,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         ans = r.json()
         return ans
 
+    @u.coalesced
     def get_childconcepts(self, pid, parent,
                           properties=None, language=None, transitive=None, workflowStatus=None):
         """
@@ -670,11 +1175,34 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         if workflowStatus:
             data["workflowStates"] = True
 
-        r = self.session.get(self.server + suffix, params=data)
+        r = self.session.get(self.server + suffix, params=data,
+                             timeout=self.timeout)
         r.raise_for_status()
         result = r.json()
         return result
 
+    def get_all_concepts(self, pid, properties=None, language=None):
+        """
+        All concepts of the project: the transitive children of every
+        concept scheme, without duplicates.
+
+        :param pid: id of project
+        :param properties: see `get_childconcepts`
+        :param language: see `get_childconcepts`
+        :return: list of concept dicts (with at least 'uri' and 'prefLabel')
+        """
+        seen = set()
+        result = []
+        for scheme in self.get_schemes(pid):
+            for cpt in self.get_childconcepts(pid, scheme['uri'],
+                                              properties=properties,
+                                              language=language,
+                                              transitive=True):
+                if cpt['uri'] not in seen:
+                    seen.add(cpt['uri'])
+                    result.append(cpt)
+        return result
+
     def snapshot(self, pid, system=False, note=None):
         """
         Trigger a snapshot of the project specified by `pid`.
@@ -698,7 +1226,7 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         """The api addLiteral call. Was already implemented under another name..."""
 
         return self.add_label(pid, concept, label_value=label,
-                              label_type=property, language=language)
+                              label_type=property, lang=language)
 
     def add_custom_attribute(self, pid, resource, property, value, language=None, datatype=None):
 
@@ -715,7 +1243,8 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
         if datatype:
             data["datatype"] = datatype
 
-        r = self.session.post(self.server + urlpath, data=data)
+        r = self.session.post(self.server + urlpath, data=data,
+                              timeout=self.timeout)
         r.raise_for_status()
         return r
 
@@ -729,7 +1258,8 @@ pip install -e git+git://github.com/semantic-web-company/nif.git#egg=nif\n""")
             'property': property,
             'target': target,
         }
-        r = self.session.post(self.server + urlpath, data=data)
+        r = self.session.post(self.server + urlpath, data=data,
+                              timeout=self.timeout)
         r.raise_for_status()
         return r
 
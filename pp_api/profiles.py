@@ -0,0 +1,137 @@
+"""
+Extraction profiles: the smallest set of extract parameters for a use case,
+with a parser reading only what the profile requests.
+
+=================  ==========================================================
+profile            concept fields
+=================  ==========================================================
+'minimal'          uri, prefLabel, frequencyInDocument
+'positions'        minimal + matchings (matched texts and positions)
+'full-hierarchy'   minimal + transitiveBroaderConcepts,
+                   transitiveBroaderTopConcepts, relatedConcepts
+'full'             all of `PoolParty.get_cpts_from_response`, with the
+                   default parameters of `extract_from_file`
+=================  ==========================================================
+"""
+from pp_api import utils as u
+
+BASE_FIELDS = ('uri', 'prefLabel', 'frequencyInDocument')
+HIERARCHY_FIELDS = ('transitiveBroaderConcepts', 'transitiveBroaderTopConcepts',
+                    'relatedConcepts')
+
+
+def _concepts(container):
+    if isinstance(container, (bytes, str)):
+        container = u.fast_json_loads(container)
+    if 'concepts' not in container:
+        container = container.get('document', {})
+    return container.get('concepts', [])
+
+
+def parse_minimal(container):
+    return [{'uri': c['uri'], 'prefLabel': c.get('prefLabel'),
+             'frequencyInDocument': c.get('frequencyInDocument', 0)}
+            for c in _concepts(container)]
+
+
+def parse_positions(container):
+    ans = []
+    for c in _concepts(container):
+        ans.append({
+            'uri': c['uri'], 'prefLabel': c.get('prefLabel'),
+            'frequencyInDocument': c.get('frequencyInDocument', 0),
+            'matchings': [
+                {'text': m['matchedText'], 'frequency': m['frequency'],
+                 'positions': [(p['beginningIndex'], p['endIndex'])
+                               for p in m['positions']]}
+                for label in c.get('matchingLabels', ())
+                for m in label['matchedTexts']
+            ],
+        })
+    return ans
+
+
+def parse_hierarchy(container):
+    ans = []
+    for c in _concepts(container):
+        cpt = {'uri': c['uri'], 'prefLabel': c.get('prefLabel'),
+               'frequencyInDocument': c.get('frequencyInDocument', 0)}
+        for field in HIERARCHY_FIELDS:
+            cpt[field] = c.get(field, [])
+        ans.append(cpt)
+    return ans
+
+
+def parse_full(container):
+    from pp_api.pp_calls import PoolParty
+
+    if isinstance(container, (bytes, str)):
+        container = u.fast_json_loads(container)
+    return PoolParty.get_cpts_from_json(container)
+
+
+class ExtractionProfile:
+    """
+    :param name: name of the profile
+    :param params: extract parameters, override the defaults of
+        `PoolParty.extract_from_file`
+    :param fields: concept fields returned by `parse`
+    :param parse: function of the JSON answer (decoded or raw) returning
+        the list of concepts
+    """
+
+    def __init__(self, name, params, fields, parse):
+        self.name = name
+        self.params = params
+        self.fields = fields
+        self.parse = parse
+
+    def __repr__(self):
+        return 'ExtractionProfile({!r})'.format(self.name)
+
+
+_lean = {
+    'numberOfTerms': 0,
+    'useTransitiveBroaderConcepts': False,
+    'useRelatedConcepts': False,
+    'showMatchingDetails': False,
+    'showMatchingPosition': False,
+}
+
+# ordered from the cheapest to the most expensive
+PROFILES = {
+    'minimal': ExtractionProfile(
+        'minimal', dict(_lean), BASE_FIELDS, parse_minimal),
+    'positions': ExtractionProfile(
+        'positions',
+        dict(_lean, showMatchingDetails=True, showMatchingPosition=True),
+        BASE_FIELDS + ('matchings',), parse_positions),
+    'full-hierarchy': ExtractionProfile(
+        'full-hierarchy',
+        dict(_lean, useTransitiveBroaderConcepts=True, useRelatedConcepts=True),
+        BASE_FIELDS + HIERARCHY_FIELDS, parse_hierarchy),
+    'full': ExtractionProfile(
+        'full', dict(), BASE_FIELDS + HIERARCHY_FIELDS + ('matchings',),
+        parse_full),
+}
+
+
+def get_profile(profile):
+    """`ExtractionProfile` for a name or a profile."""
+    if isinstance(profile, ExtractionProfile):
+        return profile
+    try:
+        return PROFILES[profile]
+    except KeyError:
+        raise ValueError('Unknown extraction profile: {}, choose one of '
+                         '{}'.format(profile, ', '.join(PROFILES)))
+
+
+def cheapest(fields):
+    """The cheapest profile returning all concept `fields`."""
+    fields = set(fields)
+    for profile in PROFILES.values():
+        if fields <= set(profile.fields):
+            return profile
+    raise ValueError('No profile returns the fields: {}'.format(
+        ', '.join(sorted(fields - set(PROFILES['full'].fields)))))
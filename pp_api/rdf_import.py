@@ -0,0 +1,275 @@
+"""
+Offline construction of thesaurus content as RDF, for bulk imports, and
+parsing of N-Triples exports.
+"""
+import logging
+import re
+import tempfile
+from collections import namedtuple
+from urllib.parse import quote
+
+from requests.exceptions import HTTPError
+
+from pp_api import bulk
+
+module_logger = logging.getLogger(__name__)
+
+PREFIXES = {
+    'rdf': 'http://www.w3.org/1999/02/22-rdf-syntax-ns#',
+    'rdfs': 'http://www.w3.org/2000/01/rdf-schema#',
+    'skos': 'http://www.w3.org/2004/02/skos/core#',
+    'dcterms': 'http://purl.org/dc/terms/',
+    'owl': 'http://www.w3.org/2002/07/owl#',
+    'xsd': 'http://www.w3.org/2001/XMLSchema#',
+}
+INVERSE = {
+    'http://www.w3.org/2004/02/skos/core#narrower':
+        'http://www.w3.org/2004/02/skos/core#broader',
+    'http://www.w3.org/2004/02/skos/core#broader':
+        'http://www.w3.org/2004/02/skos/core#narrower',
+    'http://www.w3.org/2004/02/skos/core#related':
+        'http://www.w3.org/2004/02/skos/core#related',
+}
+# status codes meaning that the server has no usable import call
+IMPORT_UNSUPPORTED = (404, 405, 415, 501)
+
+_skos = PREFIXES['skos']
+_rdf_type = PREFIXES['rdf'] + 'type'
+
+
+def expand(name):
+    """Full URI of a prefixed name such as 'skos:altLabel'."""
+    prefix, sep, local = name.partition(':')
+    if sep and prefix in PREFIXES and not local.startswith('//'):
+        return PREFIXES[prefix] + local
+    return name
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+_iri_invalid = re.compile(r'[\x00-\x20<>"{}|^`\\]')
+
+
+def nt_uri(uri):
+    """
+    IRI in N-Triples syntax.
+
+    :raise ValueError: if `uri` contains characters not allowed in an IRI
+        (spaces, control characters or any of <>"{}|^`\\)
+    """
+    if _iri_invalid.search(uri):
+        raise ValueError('Invalid IRI: {!r}'.format(uri))
+    return '<' + uri + '>'
+
+
+def nt_literal(value, lang=None, datatype=None):
+    literal = '"' + _escape(value) + '"'
+    if lang:
+        return literal + '@' + lang
+    if datatype:
+        return literal + '^^' + nt_uri(expand(datatype))
+    return literal
+
+
+Literal = namedtuple('Literal', ['value', 'lang', 'datatype'])
+
+_nt_line = re.compile(
+    r'^\s*(<[^>]*>|_:\S+)\s+<([^>]*)>\s+'
+    r'(<[^>]*>|_:\S+|"((?:[^"\\]|\\.)*)"(?:@([A-Za-z0-9-]+)|\^\^<([^>]*)>)?)'
+    r'\s*\.\s*$')
+_nt_escape = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+_nt_escapes = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f',
+               '"': '"', "'": "'", '\\': '\\'}
+
+
+def _unescape(value):
+    def replace(match):
+        code = match.group(1)
+        if len(code) > 1:
+            return chr(int(code[1:], 16))
+        return _nt_escapes.get(code, code)
+
+    return _nt_escape.sub(replace, value) if '\\' in value else value
+
+
+def parse_nt_line(line):
+    """
+    Parse one line of an N-Triples document.
+
+    :return: (subject, predicate, object), with the URIs and blank nodes
+        ('_:b0') as str and the literal objects as `Literal`; None for
+        empty lines and comments
+    """
+    match = _nt_line.match(line)
+    if match is None:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            return None
+        raise ValueError('Invalid N-Triples line: {!r}'.format(line))
+    subject, predicate, obj, value, lang, datatype = match.groups()
+    if subject.startswith('<'):
+        subject = subject[1:-1]
+    if obj.startswith('<'):
+        obj = obj[1:-1]
+    elif value is not None:
+        obj = Literal(_unescape(value), lang, datatype)
+    return subject, predicate, obj
+
+
+class TaxonomyBuilder:
+    """
+    Collects concepts, labels, relations and custom attributes in memory and
+    serializes them to one N-Triples document. It has the same methods as
+    `bulk.TaxonomyBatch`, but concept URIs are minted locally from
+    `base_uri` and the concept key.
+
+    `submit()` sends the document with a single project import call and,
+    if the server does not support it, falls back to a `bulk.TaxonomyBatch`.
+
+    :param base_uri: namespace of the new concepts
+    :param scheme_uri: scheme for concepts without a parent; fetched from the
+        project on `submit()` if None
+    :param lang: language of the preferred labels
+    """
+
+    def __init__(self, base_uri, scheme_uri=None, lang='en'):
+        self.base_uri = base_uri
+        self.scheme_uri = scheme_uri
+        self.lang = lang
+        self.concepts = dict()  # key -> (uri, pref_label, parent)
+        self.labels = []
+        self.relations = []
+        self.custom_attributes = []
+
+    def __len__(self):
+        return (len(self.concepts) + len(self.labels) + len(self.relations) +
+                len(self.custom_attributes))
+
+    def add_concept(self, key, pref_label, parent=None, suffix=None):
+        """
+        :param key: identifier of the concept within the builder
+        :param pref_label: preferred label in `self.lang`
+        :param parent: key or URI of the parent concept (scheme); if None,
+            `self.scheme_uri`
+        :param suffix: last URI component; `key` if None
+        :return: URI of the concept
+        """
+        if key in self.concepts:
+            raise ValueError('Duplicate concept key: {}'.format(key))
+        uri = self.base_uri + quote(str(suffix if suffix is not None else key))
+        self.concepts[key] = (uri, pref_label, parent)
+        return uri
+
+    def add_label(self, concept, label_value, label_type='skos:altLabel',
+                  lang=None):
+        self.labels.append((concept, label_value, label_type, lang))
+
+    def add_relation(self, source, target, relation_type='skos:narrower'):
+        self.relations.append((source, target, relation_type))
+
+    def add_custom_attribute(self, resource, property, value, language=None,
+                             datatype=None):
+        self.custom_attributes.append(
+            (resource, property, value, language, datatype))
+
+    def uri(self, ref):
+        """URI for a key of this builder or an URI."""
+        if ref in self.concepts:
+            return self.concepts[ref][0]
+        return ref
+
+    def iter_ntriples(self):
+        """Yield the content as N-Triples lines (with trailing newline)."""
+        line = '{} {} {} .\n'
+        scheme = nt_uri(self.scheme_uri) if self.scheme_uri else None
+        for key, (uri, pref_label, parent) in self.concepts.items():
+            cpt = nt_uri(uri)
+            yield line.format(cpt, nt_uri(_rdf_type), nt_uri(_skos + 'Concept'))
+            yield line.format(cpt, nt_uri(_skos + 'prefLabel'),
+                              nt_literal(pref_label, lang=self.lang))
+            if scheme:
+                yield line.format(cpt, nt_uri(_skos + 'inScheme'), scheme)
+            if parent is None or parent == self.scheme_uri:
+                if scheme:
+                    yield line.format(cpt, nt_uri(_skos + 'topConceptOf'), scheme)
+                    yield line.format(scheme, nt_uri(_skos + 'hasTopConcept'), cpt)
+            else:
+                broader = nt_uri(self.uri(parent))
+                yield line.format(cpt, nt_uri(_skos + 'broader'), broader)
+                yield line.format(broader, nt_uri(_skos + 'narrower'), cpt)
+        for concept, value, label_type, lang in self.labels:
+            yield line.format(nt_uri(self.uri(concept)), nt_uri(expand(label_type)),
+                              nt_literal(value, lang=lang))
+        for source, target, relation_type in self.relations:
+            prop = expand(relation_type)
+            yield line.format(nt_uri(self.uri(source)), nt_uri(prop),
+                              nt_uri(self.uri(target)))
+            if prop in INVERSE:
+                yield line.format(nt_uri(self.uri(target)),
+                                  nt_uri(INVERSE[prop]),
+                                  nt_uri(self.uri(source)))
+        for resource, prop, value, language, datatype in self.custom_attributes:
+            yield line.format(nt_uri(self.uri(resource)), nt_uri(expand(prop)),
+                              nt_literal(value, lang=language, datatype=datatype))
+
+    def serialize(self, out=None, chunk_lines=10000):
+        """
+        Write the N-Triples document to the text file-like `out` in chunks,
+        or return it as a string if `out` is None.
+        """
+        if out is None:
+            return ''.join(self.iter_ntriples())
+        chunk = []
+        for triple in self.iter_ntriples():
+            chunk.append(triple)
+            if len(chunk) >= chunk_lines:
+                out.write(''.join(chunk))
+                chunk = []
+        out.write(''.join(chunk))
+
+    def to_batch(self, pp, pid, max_workers=8):
+        """
+        The same content as a `bulk.TaxonomyBatch`. The last components of
+        the concept URIs are passed as suffixes, the namespace is the one
+        configured in the project.
+        """
+        batch = bulk.TaxonomyBatch(pp, pid, max_workers=max_workers)
+        for key, (uri, pref_label, parent) in self.concepts.items():
+            if parent is None:
+                parent = self.scheme_uri
+            batch.add_concept(key, pref_label, parent=parent,
+                              suffix=uri[len(self.base_uri):])
+        batch.labels = list(self.labels)
+        batch.relations = list(self.relations)
+        batch.custom_attributes = list(self.custom_attributes)
+        return batch
+
+    def submit(self, pp, pid, fallback=True, max_workers=8):
+        """
+        Import the content into project `pid`. The document is spooled to a
+        temporary file and uploaded with `PoolParty.import_rdf`; if the
+        server has no import call and `fallback` is True, the content is
+        written with a `bulk.TaxonomyBatch` instead.
+
+        :return: list of `bulk.ItemResult` if the fallback was used,
+            otherwise the response of the import call
+        """
+        if self.scheme_uri is None:
+            self.scheme_uri = pp.get_schemes(pid)[0]['uri']
+        with tempfile.SpooledTemporaryFile(max_size=2 ** 24, mode='w+b') as f:
+            for triple in self.iter_ntriples():
+                f.write(triple.encode('utf8'))
+            f.seek(0)
+            try:
+                return pp.import_rdf(pid, f, rdf_format='N-Triples')
+            except HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if not fallback or status not in IMPORT_UNSUPPORTED:
+                    raise
+                module_logger.warning(
+                    'RDF import not supported ({}), falling back to per-call '
+                    'writes'.format(status))
+        return self.to_batch(pp, pid, max_workers=max_workers).run()
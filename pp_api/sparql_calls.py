@@ -1,6 +1,6 @@
 import requests
-import numpy as np
-import rdflib
+
+from pp_api import metrics as m
 
 
 def get_corpus_analysis_graphs(corpus_id):
@@ -11,14 +11,17 @@ def get_corpus_analysis_graphs(corpus_id):
     return corpusgraph_id, termsgraph_id, cpt_occur_graph_id, cooc_graph
 
 
-def get_corpus_zscores(term_uris, cooc_corpus_graph):
+def get_corpus_zscores(term_uris, cooc_corpus_graph, metrics=None):
     """
     Get zscores for term-term cooccurrences.
 
     :param term_uris: list: uris of 2 terms
     :param cooc_corpus_graph: graph of corpus coocs
+    :param metrics: `metrics.Metrics` instance to record the call in
     :return: float [0, 1]: similarity score := zscore/max(zscore)
     """
+    import numpy as np
+
     def similarity(term1_uri, term2_uri):
         if term1_uri == term2_uri:
             return 1
@@ -41,7 +44,7 @@ select ?uri1 ?uri2 ?score where {{
         'format': 'json',
     }
     r = requests.get('https://aligned-virtuoso.poolparty.biz/sparql',
-                     params=params)
+                     params=params, hooks=m.hooks(metrics))
     assert r.status_code == 200
     sim_matrix = dict()
     for binding in r.json()['results']['bindings']:
@@ -55,13 +58,14 @@ select ?uri1 ?uri2 ?score where {{
     return similarity
 
 
-def get_pp_terms(corpus_graph_terms, crs_threshold=5):
+def get_pp_terms(corpus_graph_terms, crs_threshold=5, metrics=None):
     """
     Load all terms with combinedRelevanceScore is greater than CRS_threshold
     from the graph corpus_graph_terms.
 
     :param corpus_graph_terms: uri of the graph
     :param crs_threshold: min combinedRelevanceScore of term to be returned
+    :param metrics: `metrics.Metrics` instance to record the call in
     :return:
     """
     params = {
@@ -75,7 +79,7 @@ select ?termUri ?name ?score where {{
         'format': 'json',
     }
     r = requests.get('https://aligned-virtuoso.poolparty.biz/sparql',
-                     params=params)
+                     params=params, hooks=m.hooks(metrics))
     top_terms_scores = dict()
     top_terms_uris = dict()
     for new_term in r.json()['results']['bindings']:
@@ -101,14 +105,17 @@ select distinct * where {{
 """
 
 
-def query_sparql_endpoint(sparql_endpoint, query=all_data_q):
-    graph = rdflib.ConjunctiveGraph('SPARQLStore')
-    rt = graph.open(sparql_endpoint)
-    rs = graph.query(query)
+def query_sparql_endpoint(sparql_endpoint, query=all_data_q, metrics=None):
+    import rdflib
+
+    with m.timer(metrics, m.endpoint_name(sparql_endpoint)):
+        graph = rdflib.ConjunctiveGraph('SPARQLStore')
+        rt = graph.open(sparql_endpoint)
+        rs = graph.query(query)
     return rs
 
 
-def get_ridfs(sparql_endpoint, termsgraph):
+def get_ridfs(sparql_endpoint, termsgraph, metrics=None):
     q_term_scores = """
     select distinct ?lemma ?ridf ?crs where {{
       GRAPH <{}> {{
@@ -118,14 +125,15 @@ def get_ridfs(sparql_endpoint, termsgraph):
       }}  
     }}
     """.format(termsgraph)
-    rs = query_sparql_endpoint(sparql_endpoint, q_term_scores)
+    rs = query_sparql_endpoint(sparql_endpoint, q_term_scores,
+                               metrics=metrics)
     results = dict()
     for r in rs:
         results[str(r[0])] = float(r[2])
     return results
 
 
-def query_cpt_cooc_scores(sparql_endpoint, cpt_cooc_graph):
+def query_cpt_cooc_scores(sparql_endpoint, cpt_cooc_graph, metrics=None):
     q_cooc_score = """
 select distinct ?cpt1 ?cpt2 ?score where {{
   GRAPH <{}> {{
@@ -135,7 +143,8 @@ select distinct ?cpt1 ?cpt2 ?score where {{
   }}
 }}
 """.format(cpt_cooc_graph)
-    rs = query_sparql_endpoint(sparql_endpoint, q_cooc_score)
+    rs = query_sparql_endpoint(sparql_endpoint, q_cooc_score,
+                               metrics=metrics)
     dist_mx = dict()
     for r in rs:
         cpt1 = str(r[0])
@@ -152,7 +161,8 @@ select distinct ?cpt1 ?cpt2 ?score where {{
     return dist_mx
 
 
-def query_terms2cpts_cooc_scores(sparql_endpoint, cpt_cooc_graph, terms_graph):
+def query_terms2cpts_cooc_scores(sparql_endpoint, cpt_cooc_graph, terms_graph,
+                                 metrics=None):
     q_cooc_cpt_score = """
     select distinct ?tv (group_concat(?cpt;separator="|") as ?cpts) (group_concat(?c_score;separator="|") as ?c_scores) where {{
       ?s <http://schema.semantic-web.at/ppcm/2013/5/hasConceptCooccurrence> ?co_cpt .
@@ -185,7 +195,7 @@ select distinct ?tv (group_concat(?cpt;separator="|") as ?cpts) (group_concat(?c
 }}
 """.format(cooc_graph=cpt_cooc_graph, terms_graph=terms_graph)
     cpt_rs = query_sparql_endpoint(
-        sparql_endpoint, query=q_cooc_cpt_score
+        sparql_endpoint, query=q_cooc_cpt_score, metrics=metrics
     )
     cooc_dict = dict()
     for r in cpt_rs:
@@ -0,0 +1,308 @@
+"""
+Local autocomplete over the labels of a thesaurus, answering like
+`PoolParty.get_autocomplete` without a server round trip.
+"""
+import bisect
+import heapq
+import logging
+import re
+import threading
+import unicodedata
+
+module_logger = logging.getLogger(__name__)
+
+# ranks of the kinds of matches, lower is better
+PREF_LABEL = 0
+ALT_LABEL = 1
+PREF_WORD = 2
+ALT_WORD = 3
+
+_skos = 'http://www.w3.org/2004/02/skos/core#'
+
+
+def normalize(text):
+    """Case-folded text without accents and with single spaces."""
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return ' '.join(text.casefold().split())
+
+
+def _upper(prefix):
+    """Smallest key after all keys starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _best(candidates, limit):
+    """The `limit` best (score, uri), one per uri."""
+    seen = set()
+    ans = []
+    for score, uri in sorted(candidates):
+        if uri in seen:
+            continue
+        seen.add(uri)
+        ans.append((score, uri))
+        if len(ans) == limit:
+            break
+    return ans
+
+
+class SuggestIndex:
+    """
+    Prefix index of the preferred and alternative labels of concepts, one
+    sorted array per language.
+
+    Every label is indexed by its normalized form and by the start of each of
+    its words. Suggestions are ranked: prefLabels matching from the start,
+    altLabels matching from the start, then prefLabels and altLabels matching
+    from a later word; shorter labels first within a rank. Each concept is
+    suggested once, with its prefLabel.
+
+    For prefixes matching more than `max_scan` index keys, the best `limit`
+    concepts are precomputed and kept up to date, so a lookup never scans
+    more than `max_scan` keys.
+
+    >>> index = SuggestIndex.from_project(pp, pid, languages=('en', 'de'))
+    >>> index.suggest('fru', lang='en')
+    [('Fruit', 'http://...'), ...]
+
+    :param limit: default max number of suggestions
+    :param cache_size: number of answers kept per language; cleared when the
+        index changes
+    :param max_scan: prefixes matching more keys get precomputed suggestions
+    """
+
+    def __init__(self, limit=10, cache_size=10000, max_scan=256):
+        self.limit = limit
+        self.cache_size = cache_size
+        self.max_scan = max_scan
+        self._entries = dict()  # lang -> sorted list of entries
+        self._concepts = dict()  # lang -> {uri: (pref_label, alt_labels)}
+        self._cache = dict()  # lang -> {(query, limit): suggestions}
+        # lang -> {prefix: best (score, uri)} for prefixes with many keys
+        self._top = dict()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return sum(len(x) for x in self._concepts.values())
+
+    @property
+    def languages(self):
+        return list(self._concepts)
+
+    @staticmethod
+    def _keys(pref_label, alt_labels):
+        """(key, rank, length, label) of all index keys of a concept."""
+        keys = set()
+        for label, full, word in [(pref_label, PREF_LABEL, PREF_WORD)] + [
+                (x, ALT_LABEL, ALT_WORD) for x in alt_labels]:
+            if not label:
+                continue
+            norm = normalize(label)
+            keys.add((norm, full, len(norm), label))
+            for match in re.finditer(r' (?=\S)', norm):
+                keys.add((norm[match.end():], word, len(norm), label))
+        return keys
+
+    def add(self, uri, pref_label, alt_labels=(), lang='en'):
+        """Add a concept, or replace its labels in `lang`."""
+        with self._lock:
+            self.remove(uri, lang=lang)
+            entries = self._entries.setdefault(lang, [])
+            tops = self._top.setdefault(lang, dict())
+            scores = dict()  # prefix -> best score of the concept
+            for key, rank, length, label in self._keys(pref_label, alt_labels):
+                bisect.insort(entries, (key, rank, length, label, uri))
+                score = (rank, length, label)
+                for i in range(len(key) + 1):
+                    prefix = key[:i]
+                    if prefix in tops and (prefix not in scores or
+                                           score < scores[prefix]):
+                        scores[prefix] = score
+            for prefix, score in scores.items():
+                top = tops[prefix]
+                bisect.insort(top, (score, uri))
+                del top[self.limit:]
+            self._concepts.setdefault(lang, dict())[uri] = (
+                pref_label, tuple(alt_labels))
+            self._cache.pop(lang, None)
+
+    def remove(self, uri, lang=None):
+        """Remove a concept from `lang`, or from all languages if None."""
+        with self._lock:
+            for lang in ([lang] if lang is not None else self.languages):
+                labels = self._concepts.get(lang, dict()).pop(uri, None)
+                if labels is None:
+                    continue
+                entries = self._entries[lang]
+                tops = self._top.get(lang, dict())
+                for key, rank, length, label in self._keys(*labels):
+                    entry = (key, rank, length, label, uri)
+                    i = bisect.bisect_left(entries, entry)
+                    if i < len(entries) and entries[i] == entry:
+                        del entries[i]
+                    # recomputed from the longer prefixes when needed
+                    for i in range(len(key) + 1):
+                        top = tops.get(key[:i])
+                        if top is not None and any(x[1] == uri for x in top):
+                            del tops[key[:i]]
+                self._cache.pop(lang, None)
+
+    def update(self, concepts, lang='en'):
+        """
+        Add or replace many concepts.
+
+        :param concepts: concept dicts with 'uri', 'prefLabel' and optionally
+            'altLabels' (list of str), as returned by `get_childconcepts`
+            with properties
+        """
+        with self._lock:
+            concepts = list(concepts)
+            if lang not in self._concepts and len(concepts) > 100:
+                return self._build(concepts, lang)
+            for cpt in concepts:
+                self.add(cpt['uri'], cpt.get('prefLabel'),
+                         cpt.get('altLabels') or (), lang=lang)
+
+    def _build(self, concepts, lang):
+        labels = {cpt['uri']: (cpt.get('prefLabel'),
+                               tuple(cpt.get('altLabels') or ()))
+                  for cpt in concepts}
+        entries = [(key, rank, length, label, uri)
+                   for uri, (pref, alts) in labels.items()
+                   for key, rank, length, label in self._keys(pref, alts)]
+        entries.sort()
+        self._entries[lang] = entries
+        self._concepts[lang] = labels
+        self._cache.pop(lang, None)
+        self._top[lang] = dict()
+        self._best(lang, '', 0, len(entries))
+
+    def _scan(self, entries, lo, hi, limit):
+        best = dict()  # uri -> (rank, length, label)
+        for i in range(lo, hi):
+            key, rank, length, label, uri = entries[i]
+            score = (rank, length, label)
+            if uri not in best or score < best[uri]:
+                best[uri] = score
+        return heapq.nsmallest(limit, ((s, uri) for uri, s in best.items()))
+
+    def _best(self, lang, prefix, lo, hi):
+        """
+        The best `self.limit` (score, uri) for the keys entries[lo:hi], which
+        start with `prefix`. Computed from the results of the longer
+        prefixes and kept if more than `max_scan` keys match.
+        """
+        tops = self._top.setdefault(lang, dict())
+        top = tops.get(prefix)
+        if top is not None:
+            return top
+        entries = self._entries[lang]
+        if hi - lo <= self.max_scan:
+            return self._scan(entries, lo, hi, self.limit)
+        depth = len(prefix)
+        candidates = []
+        i = lo
+        while i < hi and len(entries[i][0]) == depth:
+            key, rank, length, label, uri = entries[i]
+            candidates.append(((rank, length, label), uri))
+            i += 1
+        while i < hi:
+            child = entries[i][0][:depth + 1]
+            j = bisect.bisect_left(entries, (_upper(child),), i, hi)
+            candidates.extend(self._best(lang, child, i, j))
+            i = j
+        top = tops[prefix] = _best(candidates, self.limit)
+        return top
+
+    def suggest(self, query_str, lang='en', limit=None):
+        """
+        :return: list of (prefLabel, uri), best first
+        """
+        limit = limit or self.limit
+        query = normalize(query_str)
+        with self._lock:
+            cache = self._cache.setdefault(lang, dict())
+            ans = cache.get((query, limit))
+            if ans is not None:
+                return list(ans)
+            entries = self._entries.get(lang, [])
+            concepts = self._concepts.get(lang, dict())
+            lo = bisect.bisect_left(entries, (query,))
+            hi = len(entries)
+            if query:
+                hi = bisect.bisect_left(entries, (_upper(query),), lo)
+            if limit <= self.limit:
+                ranked = self._best(lang, query, lo, hi)[:limit]
+            else:
+                ranked = self._scan(entries, lo, hi, limit)
+            ans = [(concepts[uri][0], uri) for _, uri in ranked]
+            if len(cache) >= self.cache_size:
+                cache.clear()
+            cache[(query, limit)] = ans
+            return list(ans)
+
+    def refresh(self, pp, pid, uris, languages=None):
+        """
+        Fetch the labels of the concepts `uris` again (e.g. the concepts
+        changed since the last refresh) and update or remove them.
+        """
+        uris = list(uris)
+        for lang in languages or self.languages:
+            concepts = pp.get_concepts(uris, pid, properties=['skos:altLabel'],
+                                       lang=lang)
+            found = {cpt['uri'] for cpt in concepts}
+            with self._lock:
+                self.update(concepts, lang=lang)
+                for uri in uris:
+                    if uri not in found:
+                        self.remove(uri, lang=lang)
+
+    @classmethod
+    def from_project(cls, pp, pid, languages=('en',), **kwargs):
+        """Index of all concepts of a project, see `get_all_concepts`."""
+        index = cls(**kwargs)
+        for lang in languages:
+            index.update(pp.get_all_concepts(pid, properties='all',
+                                             language=lang), lang=lang)
+        return index
+
+    @classmethod
+    def from_ntriples(cls, lines, default_lang='en', **kwargs):
+        """
+        Index of the skos:prefLabel and skos:altLabel triples of an N-Triples
+        document, e.g. from
+        ``PoolParty.export_project(pid, rdf_format='N-Triples')``.
+
+        :param lines: str, bytes or iterable of lines
+        :raises ValueError: for lines that are not N-Triples, e.g. of an N3
+            export
+        """
+        from pp_api.rdf_import import Literal, parse_nt_line
+
+        if isinstance(lines, bytes):
+            lines = lines.decode('utf8')
+        if isinstance(lines, str):
+            lines = lines.splitlines()
+        labels = dict()  # lang -> {uri: {'uri', 'prefLabel', 'altLabels'}}
+        for line in lines:
+            triple = parse_nt_line(line)
+            if triple is None:
+                continue
+            uri, prop, value = triple
+            if (prop not in (_skos + 'prefLabel', _skos + 'altLabel') or
+                    not isinstance(value, Literal)):
+                continue
+            lang = value.lang or default_lang
+            cpt = labels.setdefault(lang, dict()).setdefault(
+                uri, {'uri': uri, 'prefLabel': None, 'altLabels': []})
+            if prop == _skos + 'prefLabel':
+                cpt['prefLabel'] = value.value
+            else:
+                cpt['altLabels'].append(value.value)
+        index = cls(**kwargs)
+        for lang, concepts in labels.items():
+            # concepts without prefLabel in a language are suggested in
+            # other languages only
+            index.update([x for x in concepts.values() if x['prefLabel']],
+                         lang=lang)
+        return index
@@ -0,0 +1,547 @@
+"""
+Local stand-in for the PoolParty and GraphSearch HTTP APIs.
+
+Serves deterministic synthetic data for the extractor, thesaurus, corpus
+management and GraphSearch endpoints used by `PoolParty` and `GraphSearch`,
+with configurable latency and payload size. Used by the offline tests and by
+the benchmarks in `benchmarks/`:
+
+    with MockServer(latency=0.01, n_concepts=200) as server:
+        pp = PoolParty(server.url, auth_data=('u', 'p'))
+"""
+import gzip
+import json
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+BASE_URI = 'http://mock.poolparty.biz/thesaurus/'
+SCHEME_URI = BASE_URI + 'scheme'
+
+
+class MockServer:
+    """
+    :param latency: seconds to sleep before answering every request
+    :param n_concepts: number of concepts returned by an extraction
+    :param n_terms: number of free terms returned by an extraction
+    :param matches_per_concept: positions reported for every extracted concept
+    :param thesaurus_size: number of concepts in the mock thesaurus
+    :param branching: number of children of every concept
+    :param corpus_size: number of documents in the mock corpus
+    :param doc_size: number of characters of every corpus document
+    :param page_size: page size of the corpus management results
+    :param supports_import: if False, the project import call answers 404
+    :param accepts_compressed: if False, requests with a compressed body are
+        answered with `compressed_refusal` (415 by default)
+    :param compress_responses: gzip the answers if the client accepts it
+    :param paged_documents: if False, the documents call ignores startIndex
+        and limit and returns the whole corpus
+
+    `failures` maps request paths to the number of following requests that
+    are answered with `failure_status` (503), e.g.
+    ``server.failures['/extractor/api/extract'] = 2``.
+    If `failure_page` is set, they are answered with 502 and this HTML body
+    instead, like by a proxy.
+    `history` is the list of items returned by the history call.
+    `unlabelled` holds the indices of the concepts without a prefLabel.
+    `pathless` holds the indices of the concepts getPaths returns no path
+    for.
+    If `gate` is a threading.Event, requests are counted in `calls` and
+    then wait for it to be set before they are answered.
+    """
+
+    def __init__(self, latency=0., n_concepts=50, n_terms=50,
+                 matches_per_concept=2, thesaurus_size=200, branching=5,
+                 corpus_size=100, doc_size=1000, page_size=20,
+                 supports_import=True, accepts_compressed=True,
+                 compress_responses=False, paged_documents=True):
+        self.latency = latency
+        self.n_concepts = n_concepts
+        self.n_terms = n_terms
+        self.matches_per_concept = matches_per_concept
+        self.thesaurus_size = thesaurus_size
+        self.branching = branching
+        self.corpus_size = corpus_size
+        self.doc_size = doc_size
+        self.page_size = page_size
+        self.supports_import = supports_import
+        self.accepts_compressed = accepts_compressed
+        self.compressed_refusal = 415
+        self.compress_responses = compress_responses
+        self.paged_documents = paged_documents
+        self.request_encodings = Counter()
+        self.imported = []
+        self.calls = Counter()
+        self.created = []
+        self.gs_fields = []
+        self.gs_documents = dict()
+        self.failures = Counter()
+        self.failure_page = None
+        self.failure_status = 503
+        self.history = []
+        self.unlabelled = set()
+        self.pathless = set()
+        self.gate = None
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    # life cycle
+
+    def start(self):
+        handler = type('Handler', (_Handler,), {'mock': self})
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.gate is not None:
+            self.gate.set()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._httpd.server_port)
+
+    # synthetic thesaurus
+
+    def uri(self, i):
+        return BASE_URI + str(i)
+
+    def index(self, uri):
+        try:
+            return int(uri[len(BASE_URI):])
+        except ValueError:
+            return None
+
+    def pref_label(self, i):
+        return 'concept {}'.format(i)
+
+    def alt_labels(self, i):
+        return ['alt {}'.format(i)]
+
+    def parent(self, i):
+        """Index of the broader concept, None for top concepts."""
+        return i // self.branching - 1 if i >= self.branching else None
+
+    def children(self, i):
+        """Children of concept `i`, or top concepts if `i` is None."""
+        first = 0 if i is None else (i + 1) * self.branching
+        return [x for x in range(first, first + self.branching)
+                if x < self.thesaurus_size]
+
+    def ancestors(self, i):
+        ans = []
+        i = self.parent(i)
+        while i is not None:
+            ans.append(i)
+            i = self.parent(i)
+        return ans
+
+    def descendants(self, i):
+        ans = []
+        stack = self.children(i)
+        while stack:
+            x = stack.pop()
+            ans.append(x)
+            stack.extend(self.children(x))
+        return sorted(ans)
+
+    def concept_json(self, i, properties=False):
+        cpt = {'uri': self.uri(i)}
+        if i not in self.unlabelled:
+            cpt['prefLabel'] = self.pref_label(i)
+        if properties:
+            cpt['altLabels'] = self.alt_labels(i)
+            parent = self.parent(i)
+            cpt['broaders'] = [self.uri(parent)] if parent is not None else []
+        return cpt
+
+    def document_text(self, i):
+        words = ' '.join(self.pref_label(x % self.thesaurus_size)
+                         for x in range(i, i + self.doc_size // 8))
+        return words[:self.doc_size]
+
+
+def _read_body(handler):
+    length = int(handler.headers.get('Content-Length') or 0)
+    return handler.rfile.read(length) if length else b''
+
+
+def _form(handler, body):
+    """Parse an urlencoded or multipart/form-data request body."""
+    encoding = handler.headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        body = gzip.decompress(body)
+    elif encoding == 'deflate':
+        body = zlib.decompress(body)
+    ctype = handler.headers.get('Content-Type', '')
+    if ctype.startswith('application/json'):
+        return json.loads(body.decode('utf8') or '{}')
+    if ctype.startswith('multipart/form-data'):
+        boundary = ctype.split('boundary=')[1].encode()
+        form = dict()
+        for part in body.split(b'--' + boundary)[1:-1]:
+            head, _, value = part.strip(b'\r\n').partition(b'\r\n\r\n')
+            name = re.search(rb'name="([^"]*)"', head).group(1).decode()
+            form[name] = value.decode('utf8', errors='replace')
+        return form
+    return {k: v[0] for k, v in parse_qs(body.decode('utf8')).items()}
+
+
+def _true(value):
+    return str(value).lower() == 'true'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    wbufsize = -1  # send headers and body in one write, flushed per request
+    mock = None
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, obj, status=200, content_type='application/json'):
+        if isinstance(obj, bytes):
+            body = obj
+        else:
+            body = json.dumps(obj).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if (self.mock.compress_responses and
+                'gzip' in self.headers.get('Accept-Encoding', '')):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method):
+        mock = self.mock
+        url = urlsplit(self.path)
+        path = url.path
+        query = parse_qs(url.query)
+        params = {k: v[0] for k, v in query.items()}
+        params['_all'] = query
+        body = _read_body(self)
+        encoding = self.headers.get('Content-Encoding')
+        with mock._lock:
+            mock.calls[path] += 1
+            mock.request_encodings[encoding] += 1
+        if mock.gate is not None:
+            mock.gate.wait()
+        if encoding and not mock.accepts_compressed:
+            return self._reply({'errorMessage': 'unsupported encoding'},
+                               status=mock.compressed_refusal)
+        form = _form(self, body) if method == 'POST' else dict()
+        with mock._lock:
+            fail = mock.failures[path] > 0
+            if fail:
+                mock.failures[path] -= 1
+        if mock.latency:
+            time.sleep(mock.latency)
+        if fail and mock.failure_page is not None:
+            return self._reply(mock.failure_page, status=502,
+                               content_type='text/html')
+        if fail:
+            return self._reply({'errorMessage': 'unavailable'},
+                               status=mock.failure_status)
+        for pattern, name in _routes:
+            match = pattern.fullmatch(path)
+            if match and name.startswith(method.lower() + '_'):
+                return getattr(self, name)(params, form, *match.groups())
+        self._reply({'errorMessage': 'not found: ' + path}, status=404)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    # extractor
+
+    def post_extract(self, params, form):
+        mock = self.mock
+        text = form.get('file', '')
+        n_concepts = min(mock.n_concepts, int(form.get('numberOfConcepts', 10 ** 6)))
+        n_terms = min(mock.n_terms, int(form.get('numberOfTerms', 10 ** 6)))
+        concepts = []
+        for i in range(n_concepts):
+            idx = i % mock.thesaurus_size
+            cpt = {
+                'uri': mock.uri(idx),
+                'prefLabel': mock.pref_label(idx),
+                'frequencyInDocument': mock.matches_per_concept,
+                'score': 100 - i % 100,
+            }
+            if _true(form.get('useTransitiveBroaderConcepts')):
+                cpt['transitiveBroaderConcepts'] = [
+                    mock.uri(x) for x in mock.ancestors(idx)]
+            if _true(form.get('useRelatedConcepts')):
+                cpt['relatedConcepts'] = [mock.uri((idx + 1) % mock.thesaurus_size)]
+            if _true(form.get('showMatchingDetails')):
+                label = mock.pref_label(idx)
+                positions = []
+                for k in range(mock.matches_per_concept):
+                    start = (i * mock.matches_per_concept + k) * (len(label) + 1)
+                    positions.append({'beginningIndex': start,
+                                      'endIndex': start + len(label) - 1})
+                cpt['matchingLabels'] = [{
+                    'language': form.get('language', 'en'),
+                    'matchedTexts': [{
+                        'matchedText': label,
+                        'frequency': mock.matches_per_concept,
+                        'positions': (positions
+                                      if _true(form.get('showMatchingPosition'))
+                                      else []),
+                    }]
+                }]
+            concepts.append(cpt)
+        terms = [{'textValue': 'term {}'.format(i),
+                  'frequencyInDocument': 1 + i % 3,
+                  'score': 100 - i % 100}
+                 for i in range(n_terms)]
+        self._reply({'title': '', 'text': text[:100],
+                     'concepts': concepts, 'freeTerms': terms})
+
+    def get_suggest(self, params, form):
+        mock = self.mock
+        query = params.get('searchString', '').lower()
+        ans = [mock.concept_json(i) for i in range(mock.thesaurus_size)
+               if mock.pref_label(i).startswith(query)][:10]
+        self._reply({'suggestedConcepts': ans})
+
+    # thesaurus
+
+    def get_concepts(self, params, form, pid):
+        mock = self.mock
+        uris = params['_all'].get('concepts', [])
+        properties = 'properties' in params
+        ans = [mock.concept_json(mock.index(uri), properties) for uri in uris
+               if mock.index(uri) is not None
+               and mock.index(uri) < mock.thesaurus_size]
+        self._reply(ans)
+
+    def get_paths(self, params, form, pid):
+        mock = self.mock
+        i = mock.index(params.get('concept', ''))
+        if i is None or i >= mock.thesaurus_size:
+            return self._reply({'errorMessage': 'unknown concept'}, status=404)
+        if i in mock.pathless:
+            return self._reply([])
+        path = [mock.concept_json(x) for x in reversed(mock.ancestors(i))]
+        path.append(mock.concept_json(i))
+        self._reply([{
+            'conceptScheme': {'uri': SCHEME_URI, 'title': 'Mock scheme'},
+            'conceptPath': path,
+        }])
+
+    def get_schemes(self, params, form, pid):
+        self._reply([{'uri': SCHEME_URI, 'title': 'Mock scheme'}])
+
+    def get_childconcepts(self, params, form, pid):
+        mock = self.mock
+        parent = params.get('parent', SCHEME_URI)
+        i = None if parent == SCHEME_URI else mock.index(parent)
+        if _true(params.get('transitive')):
+            ans = mock.descendants(i)
+        else:
+            ans = mock.children(i)
+        properties = 'properties' in params
+        self._reply([mock.concept_json(x, properties) for x in ans])
+
+    def get_narrowers(self, params, form, pid):
+        mock = self.mock
+        i = mock.index(params.get('concept', ''))
+        if _true(params.get('transitive')):
+            ans = mock.descendants(i)
+        else:
+            ans = mock.children(i)
+        self._reply([mock.concept_json(x, True) for x in ans])
+
+    def post_create_concept(self, params, form, pid):
+        mock = self.mock
+        with mock._lock:
+            mock.created.append(('concept', form))
+            uri = BASE_URI + 'new/' + form.get('suffix', str(len(mock.created)))
+        self._reply(uri)
+
+    def post_thesaurus_write(self, params, form, pid, call):
+        with self.mock._lock:
+            self.mock.created.append((call, form))
+        self._reply({})
+
+    def get_history(self, params, form, pid):
+        self._reply(self.mock.history)
+
+    def get_projects(self, params, form):
+        self._reply([{'id': 'mock', 'title': 'Mock project'}])
+
+    def get_export(self, params, form, pid):
+        mock = self.mock
+        lines = []
+        skos = 'http://www.w3.org/2004/02/skos/core#'
+        if params.get('format') == 'N-Triples':
+            for i in range(mock.thesaurus_size):
+                lines.append('<{}> <{}prefLabel> "{}"@en .'.format(
+                    mock.uri(i), skos, mock.pref_label(i)))
+                parent = mock.parent(i)
+                if parent is not None:
+                    lines.append('<{}> <{}broader> <{}> .'.format(
+                        mock.uri(i), skos, mock.uri(parent)))
+        else:
+            # N3 (and Turtle): prefixes and multi-line statements
+            lines.append('@prefix skos: <{}> .'.format(skos))
+            for i in range(mock.thesaurus_size):
+                parent = mock.parent(i)
+                end = ';' if parent is not None else '.'
+                lines.append('<{}> skos:prefLabel "{}"@en {}'.format(
+                    mock.uri(i), mock.pref_label(i), end))
+                if parent is not None:
+                    lines.append('    skos:broader <{}> .'.format(
+                        mock.uri(parent)))
+        self._reply(('\n'.join(lines) + '\n').encode('utf8'),
+                    content_type='text/plain')
+
+    def post_import(self, params, form, pid):
+        mock = self.mock
+        if not mock.supports_import:
+            return self._reply({'errorMessage': 'not found'}, status=404)
+        with mock._lock:
+            mock.imported.append((form.get('format'), form.get('file', '')))
+        self._reply({'success': True})
+
+    # corpus management
+
+    def _page(self, params, items):
+        start = int(params.get('startIndex', 0))
+        limit = int(params.get('limit', self.mock.page_size))
+        limit = min(limit, self.mock.page_size)
+        self._reply(items[start:start + limit])
+
+    def get_corpora(self, params, form, pid):
+        self._reply({'jsonCorpusList': [{'corpusId': 'corpus:mock',
+                                         'corpusName': 'Mock corpus'}]})
+
+    def get_corpus_concepts(self, params, form, pid):
+        mock = self.mock
+        items = [{'uri': mock.uri(i), 'prefLabel': mock.pref_label(i),
+                  'frequency': 1 + i % 7, 'score': 1. / (1 + i)}
+                 for i in range(mock.thesaurus_size)]
+        self._page(params, items)
+
+    def get_corpus_terms(self, params, form, pid):
+        mock = self.mock
+        items = [{'textValue': 'term {}'.format(i), 'frequency': 1 + i % 5,
+                  'score': 1. / (1 + i)}
+                 for i in range(mock.n_terms)]
+        self._page(params, items)
+
+    def get_term_coocs(self, params, form, pid):
+        mock = self.mock
+        term = params.get('term', '')
+        try:
+            k = int(term.split()[-1])
+        except (IndexError, ValueError):
+            k = 0
+        items = [{'textValue': 'term {}'.format((k + d) % mock.n_terms),
+                  'score': 1. / d}
+                 for d in range(1, min(mock.n_terms, 10))]
+        self._page(params, items)
+
+    def get_documents(self, params, form, pid):
+        mock = self.mock
+        include = _true(params.get('includeContent'))
+        docs = []
+        for i in range(mock.corpus_size):
+            doc = {'id': 'doc{}'.format(i), 'title': 'Document {}'.format(i)}
+            if include:
+                doc['content'] = mock.document_text(i)
+            docs.append(doc)
+        if 'startIndex' in params and mock.paged_documents:
+            return self._page(params, docs)
+        self._reply(docs)
+
+    def get_document(self, params, form, pid, doc_id):
+        mock = self.mock
+        i = int(doc_id[3:])
+        self._reply({'id': doc_id, 'content': mock.document_text(i),
+                     'extractedTerms': [{'textValue': 'term {}'.format(i)}]})
+
+    # GraphSearch
+
+    def post_gs_search(self, params, form):
+        mock = self.mock
+        count = int(form.get('count', 10))
+        docs = list(mock.gs_documents.values())[:count]
+        self._reply({'total': len(mock.gs_documents), 'results': docs})
+
+    def post_gs_content(self, params, form, call):
+        mock = self.mock
+        with mock._lock:
+            if call in ('create', 'update'):
+                mock.gs_documents[form['identifier']] = {
+                    'id': form['identifier'], 'title': form.get('title'),
+                    'date': form.get('date')}
+            else:
+                mock.gs_documents.pop(form.get('identifier'), None)
+        self._reply({'success': True})
+
+    def get_gs_fields(self, params, form):
+        self._reply({'searchFields': [{'field': f, 'label': l}
+                                      for f, l in self.mock.gs_fields]})
+
+    def post_gs_suggest(self, params, form, call):
+        mock = self.mock
+        with mock._lock:
+            if call == 'add':
+                mock.gs_fields.append((params['field'], params.get('label')))
+            else:
+                mock.gs_fields[:] = [x for x in mock.gs_fields
+                                     if x[0] != params['field']]
+        self._reply({'success': True})
+
+
+_pp = '/PoolParty/api/'
+_routes = [(re.compile(pattern), name) for pattern, name in [
+    ('/extractor/api/extract', 'post_extract'),
+    ('/extractor/api/suggest', 'get_suggest'),
+    (_pp + r'thesaurus/([^/]+)/concepts', 'get_concepts'),
+    (_pp + r'thesaurus/([^/]+)/getPaths', 'get_paths'),
+    (_pp + r'thesaurus/([^/]+)/schemes', 'get_schemes'),
+    (_pp + r'thesaurus/([^/]+)/childconcepts', 'get_childconcepts'),
+    (_pp + r'thesaurus/([^/]+)/narrowers', 'get_narrowers'),
+    (_pp + r'thesaurus/([^/]+)/createConcept', 'post_create_concept'),
+    (_pp + r'thesaurus/([^/]+)/(addLiteral|addRelation|addCustomAttribute'
+           r'|addCustomRelation)', 'post_thesaurus_write'),
+    (_pp + r'history/([^/]+)', 'get_history'),
+    (_pp + r'projects', 'get_projects'),
+    (_pp + r'projects/([^/]+)/export', 'get_export'),
+    (_pp + r'projects/([^/]+)/import', 'post_import'),
+    (_pp + r'corpusmanagement/([^/]+)/corpora', 'get_corpora'),
+    (_pp + r'corpusmanagement/([^/]+)/results/concepts', 'get_corpus_concepts'),
+    (_pp + r'corpusmanagement/([^/]+)/results/extractedterms',
+     'get_corpus_terms'),
+    (_pp + r'corpusmanagement/([^/]+)/results/cooccurrence/term',
+     'get_term_coocs'),
+    (_pp + r'corpusmanagement/([^/]+)/documents', 'get_documents'),
+    (_pp + r'corpusmanagement/([^/]+)/documents/([^/]+)', 'get_document'),
+    ('/GraphSearch/api/search', 'post_gs_search'),
+    ('/GraphSearch/api/content/(create|update|delete/id|delete/source)',
+     'post_gs_content'),
+    ('/GraphSearch/admin/config/fields', 'get_gs_fields'),
+    ('/GraphSearch/admin/suggest/(add|delete)', 'post_gs_suggest'),
+]]
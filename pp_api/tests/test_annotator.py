@@ -0,0 +1,111 @@
+import unittest
+
+from pp_api import PoolParty
+from pp_api.annotator import LabelAnnotator, normalize_with_offsets
+from pp_api.extractor_utils import ppextract2matches
+from pp_api.tests.mock_server import MockServer
+
+
+class TestLabelAnnotator(unittest.TestCase):
+    def setUp(self):
+        self.annotator = LabelAnnotator()
+        self.annotator.update([
+            {'uri': 'u:apple', 'prefLabel': 'Apple', 'altLabels': ['Malus']},
+            {'uri': 'u:pie', 'prefLabel': 'Apple pie'},
+            {'uri': 'u:cafe', 'prefLabel': 'Café'},
+            {'uri': 'u:he', 'prefLabel': 'he'},
+            {'uri': 'u:she', 'prefLabel': 'she'},
+            {'uri': 'u:hers', 'prefLabel': 'hers'},
+        ])
+
+    def spans(self, cpts):
+        return sorted((start, end, cpt['uri'])
+                      for cpt in cpts for m in cpt['matchings']
+                      for start, end in m['positions'])
+
+    def test_normalize_with_offsets(self):
+        norm, offsets = normalize_with_offsets('Ça  va')
+        self.assertEqual('ca va', norm)
+        self.assertEqual([0, 1, 2, 4, 5], offsets)
+
+    def test_positions(self):
+        text = 'An APPLE pie at the  cafe, and malus.'
+        cpts = self.annotator.annotate(text)
+        self.assertEqual([(3, 11, 'u:pie'), (21, 24, 'u:cafe'),
+                          (31, 35, 'u:apple')], self.spans(cpts))
+        for start, end, _ in self.spans(cpts):
+            self.assertEqual(text[start:end + 1].strip(), text[start:end + 1])
+        self.assertEqual('APPLE pie', text[3:12])
+
+    def test_nested_and_boundaries(self):
+        text = 'Apple pie; she said hers, ushers'
+        nested = self.annotator.annotate(text, filter_nested=False)
+        self.assertEqual([(0, 4, 'u:apple'), (0, 8, 'u:pie'),
+                          (11, 13, 'u:she'), (20, 23, 'u:hers')],
+                         self.spans(nested))
+        self.assertEqual([(0, 8, 'u:pie'), (11, 13, 'u:she'),
+                          (20, 23, 'u:hers')],
+                         self.spans(self.annotator.annotate(text)))
+
+    def test_structure(self):
+        text = 'apple, Apple and apple pie'
+        cpts = self.annotator.annotate(text)
+        self.assertEqual('u:apple', cpts[0]['uri'])
+        self.assertEqual(2, cpts[0]['frequencyInDocument'])
+        self.assertEqual({'apple': 1, 'Apple': 1},
+                         {m['text']: m['frequency']
+                          for m in cpts[0]['matchings']})
+        matches = ppextract2matches(cpts, overlaps=False)
+        self.assertEqual([(0, 4, 'Apple', 'apple'), (7, 11, 'Apple', 'Apple'),
+                          (17, 25, 'Apple pie', 'apple pie')], matches)
+
+    def test_incremental(self):
+        self.assertEqual([], self.annotator.annotate('pear'))
+        self.annotator.add('u:pear', 'Pear')
+        self.assertEqual([(0, 3, 'u:pear')],
+                         self.spans(self.annotator.annotate('pear')))
+
+    def test_relabel_and_remove(self):
+        self.annotator.add('u:apple', 'Pomme')
+        self.assertEqual([(0, 4, 'u:apple')],
+                         self.spans(self.annotator.annotate('pomme')))
+        self.assertEqual([], self.annotator.annotate('apple malus'))
+        self.assertEqual('Pomme',
+                         self.annotator.annotate('pomme')[0]['prefLabel'])
+        self.annotator.remove(['u:apple', 'u:pie'])
+        self.assertEqual([], self.annotator.annotate('pomme apple pie'))
+        self.assertEqual(4, len(self.annotator))
+        self.annotator.add('u:apple', 'Apple')
+        self.assertEqual([(0, 4, 'u:apple')],
+                         self.spans(self.annotator.annotate('apple')))
+
+
+
+class TestFromProject(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(thesaurus_size=200).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_from_project(self):
+        annotator = LabelAnnotator.from_project(self.pp, 'mock')
+        self.assertEqual(200, len(annotator))
+        cpts = annotator.annotate('Concept 12 and alt 120, not concept 1200')
+        self.assertEqual({self.server.uri(12), self.server.uri(120)},
+                         {cpt['uri'] for cpt in cpts})
+
+    def test_hybrid(self):
+        annotator = LabelAnnotator.from_project(self.pp, 'mock')
+        annotator.extract('concept 3', self.pp, 'mock', max_length=20)
+        self.assertEqual(0, self.server.calls['/extractor/api/extract'])
+        cpts = annotator.extract('concept 3 ' * 5, self.pp, 'mock',
+                                 max_length=20)
+        self.assertEqual(1, self.server.calls['/extractor/api/extract'])
+        self.assertEqual(self.pp.get_cpts_from_response(
+            self.pp.extract('concept 3 ' * 5, 'mock')), cpts)
+
+
+if __name__ == '__main__':
+    unittest.main()
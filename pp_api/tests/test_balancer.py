@@ -0,0 +1,107 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from pp_api import PoolParty
+from pp_api.balancer import ServerPool, is_server_failure
+from pp_api.tests.mock_server import MockServer
+
+EXTRACT = '/extractor/api/extract'
+
+
+class TestServerPool(unittest.TestCase):
+    def test_least_outstanding(self):
+        pool = ServerPool(['http://a', 'http://b', 'http://c'])
+        nodes = [pool.acquire() for _ in range(3)]
+        self.assertEqual(3, len({n.url for n in nodes}))
+        pool.release(nodes[1], 0.1)
+        self.assertIs(nodes[1], pool.acquire())
+
+    def test_latency(self):
+        pool = ServerPool(['http://a', 'http://b'], strategy='latency')
+        for node, latency in zip(pool.nodes, [0.1, 1.]):
+            node.outstanding += 1
+            pool.release(node, latency)
+        # a is busy but still faster
+        a = pool.acquire()
+        self.assertEqual('http://a', a.url)
+        self.assertEqual('http://a', pool.acquire().url)
+
+    def test_health(self):
+        pool = ServerPool(['http://a', 'http://b'], max_failures=2, cooldown=60)
+        a = pool.nodes[0]
+        for _ in range(2):
+            a.outstanding += 1
+            pool.release(a, 0.1, ok=False)
+        self.assertFalse(a.healthy)
+        self.assertTrue(all(pool.acquire().url == 'http://b' for _ in range(5)))
+        # after the cooldown one probe goes to a
+        a.down_until = 0
+        self.assertIs(a, pool.acquire())
+        self.assertEqual('http://b', pool.acquire().url)
+        pool.release(a, 0.1, ok=True)
+        self.assertTrue(a.healthy)
+
+
+class TestBalancedExtraction(unittest.TestCase):
+    def setUp(self):
+        self.servers = [MockServer(n_concepts=2, latency=0.01).start()
+                        for _ in range(3)]
+
+    def tearDown(self):
+        for server in self.servers:
+            server.stop()
+
+    def test_spread(self):
+        pp = PoolParty([s.url for s in self.servers],
+                       auth_data=('user', 'password'))
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(executor.map(
+                lambda i: pp.extract_result('text {}'.format(i), 'mock'),
+                range(30)))
+        self.assertTrue(all(r.ok for r in results))
+        counts = [s.calls[EXTRACT] for s in self.servers]
+        self.assertEqual(30, sum(counts))
+        self.assertTrue(all(c >= 5 for c in counts), counts)
+        # other calls go to the first server
+        pp.get_projects()
+        self.assertEqual(1, sum(self.servers[0].calls.values()) - counts[0])
+
+    def test_failover(self):
+        self.servers[1].failures[EXTRACT] = 10 ** 6
+        pool = ServerPool([s.url for s in self.servers], max_failures=1)
+        pp = PoolParty(pool, auth_data=('user', 'password'))
+        results = [pp.extract_result('text', 'mock', max_attempts=2,
+                                     backoff=0.001) for _ in range(10)]
+        self.assertTrue(all(r.ok for r in results))
+        self.assertFalse(pool.nodes[1].healthy)
+        self.assertEqual(1, self.servers[1].calls[EXTRACT])
+
+    def test_client_error(self):
+        pool = ServerPool([s.url for s in self.servers], max_failures=1)
+        pp = PoolParty(pool, auth_data=('user', 'password'))
+        with self.assertLogs('pp_api.pp_calls', 'ERROR'):
+            result = pp.extract_result(file='/no/such/file.txt', pid='mock',
+                                       max_attempts=3, backoff=0.001)
+        self.assertFalse(result.ok)
+        self.assertEqual(1, result.attempts)
+        self.assertIn('FileNotFoundError', result.error)
+        self.assertTrue(all(node.healthy and node.failures == 0
+                            for node in pool.nodes))
+        self.assertEqual(0, sum(s.calls[EXTRACT] for s in self.servers))
+
+    def test_is_server_failure(self):
+        self.assertTrue(is_server_failure(requests.ConnectionError()))
+        self.assertTrue(is_server_failure(requests.Timeout()))
+        for status, failure in [(503, True), (429, True), (404, False)]:
+            r = requests.Response()
+            r.status_code = status
+            self.assertEqual(failure,
+                             is_server_failure(requests.HTTPError(response=r)))
+        for e in [FileNotFoundError(), ValueError(), TypeError()]:
+            self.assertFalse(is_server_failure(e))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+from pp_api import PoolParty, TaxonomyBatch
+from pp_api.tests.mock_server import MockServer, SCHEME_URI
+
+
+class TestTaxonomyBatch(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_parents_before_children(self):
+        batch = TaxonomyBatch(self.pp, 'mock', max_workers=4)
+        batch.add_concept('apple', 'Apple', parent='fruit', suffix='apple')
+        batch.add_concept('fruit', 'Fruit', suffix='fruit')
+        batch.add_concept('pear', 'Pear', parent='fruit', suffix='pear')
+        batch.add_concept('ext', 'External', parent=self.server.uri(3),
+                          suffix='ext')
+        batch.add_label('apple', 'Malus', lang='en')
+        batch.add_relation('apple', 'pear', relation_type='skos:related')
+        batch.add_custom_attribute('pear', 'http://x.org/color', 'green')
+        results = batch.run()
+
+        self.assertTrue(all(r.ok for r in results), results)
+        self.assertEqual(1, self.server.calls[
+            '/PoolParty/api/thesaurus/mock/schemes'])
+        created = [form for call, form in self.server.created
+                   if call == 'concept']
+        order = [form['suffix'] for form in created]
+        self.assertLess(order.index('fruit'), order.index('apple'))
+        self.assertLess(order.index('fruit'), order.index('pear'))
+        parents = {form['suffix']: form['parent'] for form in created}
+        self.assertEqual(SCHEME_URI, parents['fruit'])
+        self.assertEqual(batch.uris['fruit'], parents['apple'])
+        self.assertEqual(self.server.uri(3), parents['ext'])
+        writes = [call for call, form in self.server.created]
+        self.assertEqual(1, writes.count('addLiteral'))
+        self.assertEqual(1, writes.count('addRelation'))
+        self.assertEqual(1, writes.count('addCustomAttribute'))
+
+    def test_cycles_are_reported(self):
+        batch = TaxonomyBatch(self.pp, 'mock')
+        batch.add_concept('a', 'A', parent='b')
+        batch.add_concept('b', 'B', parent='a')
+        batch.add_label('a', 'alt A')
+        results = batch.run()
+        self.assertEqual(3, len(results))
+        self.assertFalse(any(r.ok for r in results))
+        self.assertEqual(0, len(self.server.created))
+
+
+if __name__ == '__main__':
+    unittest.main()
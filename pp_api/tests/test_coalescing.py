@@ -0,0 +1,128 @@
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pp_api import PoolParty, GraphSearch, metrics, utils as u
+from pp_api.tests.mock_server import MockServer
+
+PATHS = '/PoolParty/api/thesaurus/mock/getPaths'
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('Condition not reached in time')
+        time.sleep(0.001)
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_shared_result(self):
+        flight = u.SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fn():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'result'
+
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            leader = executor.submit(flight.do, 'key', fn)
+            started.wait()
+            followers = [executor.submit(flight.do, 'key', fn) for _ in range(4)]
+            wait_until(lambda: flight.waiting() == 4)
+            release.set()
+        self.assertEqual(('result', False), leader.result())
+        self.assertEqual(1, len(calls))
+        self.assertTrue(all(f.result() == ('result', True) for f in followers))
+
+    def test_shared_exception(self):
+        flight = u.SingleFlight()
+
+        def fn():
+            raise ValueError('boom')
+
+        with self.assertRaises(ValueError):
+            flight.do('key', fn)
+        # the failed call is forgotten, the next one is executed again
+        self.assertEqual((1, False), flight.do('key', lambda: 1))
+
+
+class TestCoalescedCalls(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer().start()
+        # requests are held until all callers are in flight
+        self.server.gate = threading.Event()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _concurrent(self, fn, ready, n=8):
+        """
+        Call `fn` from `n` threads starting together; the server answers
+        once `ready()` is true.
+        """
+        barrier = threading.Barrier(n)
+
+        def call(_):
+            barrier.wait()
+            return fn()
+
+        with ThreadPoolExecutor(max_workers=n) as executor:
+            futures = [executor.submit(call, i) for i in range(n)]
+            wait_until(ready)
+            self.server.gate.set()
+            return [f.result() for f in futures]
+
+    def test_pp_identical_reads(self):
+        m = metrics.Metrics()
+        pp = PoolParty(self.server.url, auth_data=('user', 'password'),
+                       coalesce=True, metrics=m)
+        uri = self.server.uri(3)
+        results = self._concurrent(
+            lambda: pp.get_cpt_path(uri, 'mock'),
+            ready=lambda: (self.server.calls[PATHS] == 1 and
+                           pp.single_flight.waiting() == 7))
+        self.assertTrue(all(r == results[0] for r in results))
+        self.assertEqual(1, self.server.calls[PATHS])
+        cache = m.snapshot()['caches']['single_flight']
+        self.assertEqual(7, cache['hits'])
+        self.assertEqual(1, cache['misses'])
+
+    def test_different_args_not_coalesced(self):
+        pp = PoolParty(self.server.url, auth_data=('user', 'password'),
+                       coalesce=True)
+        uris = [self.server.uri(i) for i in range(4)]
+        self._concurrent(lambda: pp.get_cpt_path(uris.pop(), 'mock'),
+                         ready=lambda: self.server.calls[PATHS] == 4, n=4)
+        self.assertEqual(4, self.server.calls[PATHS])
+
+    def test_disabled_by_default(self):
+        pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+        self.assertIsNone(pp.single_flight)
+        uri = self.server.uri(3)
+        self._concurrent(lambda: pp.get_cpt_path(uri, 'mock'),
+                         ready=lambda: self.server.calls[PATHS] == 3, n=3)
+        self.assertEqual(3, self.server.calls[PATHS])
+
+    def test_gs_identical_searches(self):
+        flight = u.SingleFlight()
+        gs = GraphSearch(self.server.url, auth_data=('user', 'password'),
+                         coalesce=flight)
+
+        def searches():
+            return sum(n for path, n in self.server.calls.items()
+                       if path.endswith('/search'))
+
+        self._concurrent(lambda: gs.search(search_space_id='space'),
+                         ready=lambda: searches() == 1 and flight.waiting() == 3,
+                         n=4)
+        self.assertEqual(1, searches())
+
+
+if __name__ == '__main__':
+    unittest.main()
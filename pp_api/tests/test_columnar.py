@@ -0,0 +1,88 @@
+import unittest
+
+import numpy as np
+
+from pp_api import PoolParty
+from pp_api.columnar import CONCEPT_SCHEMA, ColumnarTable
+from pp_api.tests.mock_server import MockServer
+
+
+RECORDS = [
+    {'uri': 'http://ex.org/1', 'prefLabel': 'one', 'frequency': 3, 'score': 0.5},
+    {'uri': 'http://ex.org/2', 'prefLabel': 'two', 'frequency': 9},
+    {'uri': 'http://ex.org/3', 'prefLabel': 'one', 'frequency': 1,
+     'score': 0.1, 'broaders': ['x']},
+]
+
+
+class TestColumnar(unittest.TestCase):
+    def test_from_records(self):
+        table = ColumnarTable.from_records(iter(RECORDS))
+        self.assertEqual(3, len(table))
+        self.assertEqual('uri', table.key)
+        self.assertEqual(np.int64, table.column('frequency').dtype)
+        self.assertTrue(np.isnan(table.column('score')[1]))
+        self.assertEqual(2, len(table.strings['prefLabel'][0]))
+        self.assertNotIn('broaders', table.columns)
+        self.assertEqual(RECORDS[0], table.row(0))
+
+    def test_queries(self):
+        table = ColumnarTable.from_records(RECORDS)
+        self.assertEqual(['http://ex.org/2', 'http://ex.org/1'],
+                         table.top_k('frequency', 2).keys)
+        self.assertEqual(['http://ex.org/1', 'http://ex.org/2'],
+                         table.where('frequency', min=2).keys)
+        self.assertEqual(1, table.index_of('http://ex.org/2'))
+        self.assertEqual(-1, table.index_of('http://ex.org/404'))
+        other = ColumnarTable.from_records([
+            {'uri': 'http://ex.org/3', 'frequency': 30},
+            {'uri': 'http://ex.org/1', 'frequency': 10},
+        ])
+        merged = table.merge(other)
+        self.assertEqual(['http://ex.org/1', 'http://ex.org/3'], merged.keys)
+        self.assertEqual([10, 30], list(merged.column('frequency_other')))
+
+    def test_empty(self):
+        table = ColumnarTable.from_records([], schema=CONCEPT_SCHEMA)
+        self.assertEqual(0, len(table))
+        self.assertEqual([], table.keys)
+        self.assertEqual(np.int64, table.column('frequency').dtype)
+        self.assertEqual(np.float64, table.column('score').dtype)
+        self.assertEqual(0, len(table.top_k('frequency', 5)))
+        self.assertEqual(0, len(table.where('score', min=0.5)))
+        self.assertEqual(0, len(table.merge(ColumnarTable.from_records(RECORDS))))
+        self.assertEqual([], ColumnarTable.from_records([]).keys)
+        with MockServer(thesaurus_size=0) as server:
+            pp = PoolParty(server.url, auth_data=('user', 'password'))
+            table = pp.get_cpt_corpus_freqs('corpus:mock', 'mock', columnar=True)
+            self.assertEqual(0, len(table.top_k('frequency', 10)))
+
+    def test_join(self):
+        table = ColumnarTable.from_records(RECORDS + [{'frequency': 4}])
+        other = ColumnarTable.from_records([
+            {'uri': 'http://ex.org/9'}, {'uri': 'http://ex.org/3'},
+            {'uri': 'http://ex.org/1'}, {'uri': 'http://ex.org/3'},
+        ])
+        left, right = table.join(other)
+        self.assertEqual([0, 2], list(left))
+        self.assertEqual([2, 1], list(right))
+        left, right = other.join(table)
+        self.assertEqual([1, 2, 3], list(left))
+        self.assertEqual([2, 0, 2], list(right))
+        # repeated keys: the first row, as in `join`
+        self.assertEqual(1, other.index_of('http://ex.org/3'))
+        self.assertEqual(-1, other.index_of('http://ex.org/4'))
+
+    def test_corpus_results(self):
+        with MockServer(n_terms=45) as server:
+            pp = PoolParty(server.url, auth_data=('user', 'password'))
+            records = pp.get_cpt_corpus_freqs('corpus:mock', 'mock')
+            table = pp.get_cpt_corpus_freqs('corpus:mock', 'mock', columnar=True)
+            self.assertEqual(records, table.to_records())
+            terms = pp.get_terms_stats('corpus:mock', 'mock', columnar=True)
+            self.assertEqual('textValue', terms.key)
+            self.assertEqual(45, len(terms))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+import datetime
+import unittest
+
+import requests
+
+from pp_api import PoolParty, GraphSearch, metrics, utils as u
+from pp_api.tests.mock_server import MockServer
+
+EXTRACT = '/extractor/api/extract'
+CREATE = '/GraphSearch/api/content/create'
+
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(n_concepts=20, compress_responses=True).start()
+        self.metrics = metrics.Metrics()
+        self.text = self.server.document_text(0) * 5
+
+    def tearDown(self):
+        self.server.stop()
+
+    def stats(self, endpoint):
+        return self.metrics.snapshot()['endpoints'][endpoint]
+
+    def create(self, gs):
+        return gs.create_with_freqs('http://mock.doc/1', 'title', 'author',
+                                    datetime.datetime(2020, 1, 1), [],
+                                    'space', text=self.text)
+
+    def test_compressed_json(self):
+        gs = GraphSearch(self.server.url, auth_data=('user', 'password'),
+                         compress_requests=True, metrics=self.metrics)
+        self.create(gs)
+        self.assertEqual(1, self.server.request_encodings['gzip'])
+        self.assertTrue(gs.in_gs('http://mock.doc/1', 'space'))
+        stats = self.stats(CREATE)
+        self.assertLess(stats['bytes_sent'], stats['body_bytes_sent'] / 2)
+
+    def test_multipart_not_compressed(self):
+        pp = PoolParty(self.server.url, auth_data=('user', 'password'),
+                       compress_requests=True, metrics=self.metrics)
+        plain = PoolParty(self.server.url, auth_data=('user', 'password'))
+        cpts = pp.get_cpts_from_response(pp.extract(self.text, 'mock'))
+        self.assertEqual(
+            plain.get_cpts_from_response(plain.extract(self.text, 'mock')), cpts)
+        self.assertEqual(0, self.server.request_encodings['gzip'])
+        stats = self.stats(EXTRACT)
+        self.assertLess(stats['bytes_received'], stats['body_bytes_received'])
+
+    def test_other_servers_not_compressed(self):
+        other = MockServer().start()
+        try:
+            pp = PoolParty(other.url, auth_data=('user', 'password'))
+            gs = GraphSearch(self.server.url, session=pp.session,
+                             compress_requests=True)
+            self.create(gs)
+            self.assertEqual(1, self.server.request_encodings['gzip'])
+            pp.session.post(other.url + '/GraphSearch/api/content/create',
+                            data=u.json_dumps({'identifier': 'x',
+                                               'text': self.text}),
+                            headers={'Content-Type': 'application/json'})
+            self.assertEqual(0, other.request_encodings['gzip'])
+        finally:
+            other.stop()
+
+    def test_small_bodies_and_deflate(self):
+        gs = GraphSearch(self.server.url, auth_data=('user', 'password'),
+                         compress_requests='deflate')
+        gs.session.post(self.server.url + CREATE,
+                        data=b'{"identifier": "x"}',
+                        headers={'Content-Type': 'application/json'})
+        self.assertEqual(0, self.server.request_encodings['deflate'])
+        gs.session.post(self.server.url + CREATE,
+                        data=b'{"identifier": "x", "text": "%s"}' %
+                        (b'y' * 4096),
+                        headers={'Content-Type': 'application/json'})
+        self.assertEqual(1, self.server.request_encodings['deflate'])
+
+    def test_fallback(self):
+        self.server.accepts_compressed = False
+        gs = GraphSearch(self.server.url, auth_data=('user', 'password'),
+                         compress_requests=True)
+        for _ in range(2):
+            self.create(gs)
+        # one refused compressed request, then plain ones
+        self.assertEqual(1, self.server.request_encodings['gzip'])
+        self.assertEqual(3, self.server.calls[CREATE])
+
+    def test_fallback_bad_request(self):
+        self.server.accepts_compressed = False
+        self.server.compressed_refusal = 400
+        gs = GraphSearch(self.server.url, auth_data=('user', 'password'),
+                         compress_requests=True)
+        for _ in range(2):
+            self.create(gs)
+        self.assertEqual(1, self.server.request_encodings['gzip'])
+        self.assertEqual(3, self.server.calls[CREATE])
+
+    def test_bad_request_keeps_compression(self):
+        # a 400 for the plain body as well is not a refusal of compression
+        self.server.failures[CREATE] = 2
+        self.server.failure_status = 400
+        gs = GraphSearch(self.server.url, auth_data=('user', 'password'),
+                         compress_requests=True)
+        with self.assertRaises(requests.HTTPError):
+            self.create(gs)
+        self.create(gs)
+        self.assertEqual(2, self.server.request_encodings['gzip'])
+
+    def test_accept_encoding(self):
+        session = u.get_session(None, ('user', 'password'))
+        self.assertIn('gzip', session.headers['Accept-Encoding'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from pp_api import PoolParty
+from pp_api.tests.mock_server import MockServer
+
+
+class TestCoocGraph(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(n_terms=30).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_top_terms(self):
+        graph = self.pp.get_term_cooc_graph('corpus:mock', 'mock', top_n=10,
+                                            max_workers=4)
+        self.assertEqual(['term {}'.format(i) for i in range(10)], graph.terms)
+        m = graph.to_dense()
+        self.assertTrue(np.array_equal(m, m.T))
+        # term 1 is reported by term 0 (score 1) and term 2 by both ends
+        self.assertEqual(1., m[0, 1])
+        self.assertEqual(1., m[1, 2])
+        self.assertEqual({'term 1': 1., 'term 2': .5},
+                         {k: v for k, v in graph.neighbors('term 0').items()
+                          if v >= .5})
+        self.assertTrue(np.all(graph.rows < graph.cols))
+        self.assertEqual(len(set(zip(graph.rows, graph.cols))), graph.n_edges)
+
+    def test_unrestricted(self):
+        graph = self.pp.get_term_cooc_graph('corpus:mock', 'mock',
+                                            terms=['term 0'], restrict=False)
+        self.assertEqual(10, len(graph))
+        self.assertEqual(9, graph.n_edges)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import unittest
+
+from pp_api import PoolParty
+from pp_api.corpus import CorpusDocument
+from pp_api.tests.mock_server import MockServer
+
+DOCUMENTS = '/PoolParty/api/corpusmanagement/mock/documents'
+
+
+class TestIterCorpusDocuments(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(corpus_size=100, page_size=20).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_pages(self):
+        docs = self.pp.iter_corpus_documents('corpus:mock', 'mock',
+                                             page_size=50)
+        first = next(docs)
+        self.assertEqual('doc0', first['id'])
+        self.assertEqual(1, self.server.calls[DOCUMENTS])
+        # the server returns pages of 20 although 50 were requested
+        ids = [first['id']] + [doc['id'] for doc in docs]
+        self.assertEqual(['doc{}'.format(i) for i in range(100)], ids)
+        # an empty page ends the iteration
+        self.assertEqual(6, self.server.calls[DOCUMENTS])
+        self.server.calls.clear()
+        self.assertEqual(100, len(list(self.pp.iter_corpus_documents(
+            'corpus:mock', 'mock', page_size=15))))
+        self.assertEqual(8, self.server.calls[DOCUMENTS])
+
+    def test_server_without_paging(self):
+        self.server.paged_documents = False
+        with self.assertLogs('pp_api.pp_calls', 'WARNING'):
+            docs = list(self.pp.iter_corpus_documents('corpus:mock', 'mock'))
+        self.assertEqual(100, len(docs))
+        self.assertEqual(1, self.server.calls[DOCUMENTS])
+        # a page of exactly `limit` items is repeated
+        self.server.calls.clear()
+        with self.assertLogs('pp_api.pp_calls', 'WARNING'):
+            docs = list(self.pp.iter_corpus_documents('corpus:mock', 'mock',
+                                                      page_size=100))
+        self.assertEqual(100, len(docs))
+        self.assertEqual(2, self.server.calls[DOCUMENTS])
+
+    def test_lazy_content(self):
+        expected = {doc['id']: doc['content'] for doc in
+                    self.pp.get_corpus_documents('corpus:mock', 'mock')}
+        docs = list(self.pp.iter_corpus_documents('corpus:mock', 'mock'))
+        self.assertIsInstance(docs[0], CorpusDocument)
+        self.assertNotIn('content', docs[3])
+        self.assertIsNone(docs[3].get('content'))
+        self.assertEqual(expected['doc3'], docs[3]['content'])
+        self.assertEqual(expected['doc3'], docs[3].content)
+        self.assertEqual(1, self.server.calls[DOCUMENTS + '/doc3'])
+        with self.assertRaises(KeyError):
+            docs[3]['missing']
+
+    def test_include_content(self):
+        expected = self.pp.get_corpus_documents('corpus:mock', 'mock')
+        docs = list(self.pp.iter_corpus_documents(
+            'corpus:mock', 'mock', include_content=True))
+        self.assertEqual(expected, docs)
+        self.assertNotIsInstance(docs[0], CorpusDocument)
+        metadata = list(self.pp.iter_corpus_documents(
+            'corpus:mock', 'mock', lazy_content=False))
+        self.assertEqual([{'id': x['id'], 'title': x['title']}
+                          for x in expected], metadata)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import io
+import os
+import tempfile
+import unittest
+
+import requests
+
+from pp_api import PoolParty
+from pp_api.rdf_import import Literal
+from pp_api.tests.mock_server import MockServer
+
+
+class TestExportProjectTo(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(thesaurus_size=300).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_to_file(self):
+        expected = self.pp.export_project('mock', rdf_format='N-Triples')
+        out = io.BytesIO()
+        size = self.pp.export_project_to('mock', out, chunk_size=100)
+        self.assertEqual(len(expected), size)
+        self.assertEqual(expected, out.getvalue())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.nt')
+            self.pp.export_project_to('mock', path)
+            with open(path, 'rb') as f:
+                self.assertEqual(expected, f.read())
+
+    def test_failed_export_keeps_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'export.nt')
+            self.pp.export_project_to('mock', path)
+            with open(path, 'rb') as f:
+                good = f.read()
+            self.server.failures['/PoolParty/api/projects/mock/export'] = 1
+            with self.assertRaises(requests.HTTPError):
+                self.pp.export_project_to('mock', path)
+
+            def fail(*triple):
+                raise RuntimeError('stop')
+
+            with self.assertRaises(RuntimeError):
+                self.pp.export_project_to('mock', path, on_triple=fail)
+            with open(path, 'rb') as f:
+                self.assertEqual(good, f.read())
+            self.assertEqual(['export.nt'], os.listdir(tmp))
+
+    def test_on_triple(self):
+        triples = []
+        # chunks smaller than a line
+        self.pp.export_project_to('mock', on_triple=lambda *x: triples.append(x),
+                                  chunk_size=7)
+        self.assertEqual(300 + 295, len(triples))
+        uri = self.server.uri
+        self.assertIn((uri(7), 'http://www.w3.org/2004/02/skos/core#prefLabel',
+                       Literal('concept 7', 'en', None)), triples)
+        self.assertIn((uri(7), 'http://www.w3.org/2004/02/skos/core#broader',
+                       uri(0)), triples)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.pp.export_project_to('mock', io.BytesIO(), rdf_format='N3',
+                                      on_triple=print)
+        with self.assertRaises(ValueError):
+            self.pp.export_project_to('mock')
+
+
+if __name__ == '__main__':
+    unittest.main()
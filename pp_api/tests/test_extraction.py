@@ -0,0 +1,109 @@
+import os
+import tempfile
+import unittest
+
+from requests.exceptions import HTTPError
+
+from pp_api import PoolParty
+from pp_api.extraction import DeadLetterSink, ExtractionResult
+from pp_api.tests.mock_server import MockServer
+
+EXTRACT = '/extractor/api/extract'
+
+
+class TestExtractionResult(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(n_concepts=3).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_ok(self):
+        res = self.pp.extract_result('some text', 'mock', key='a')
+        self.assertTrue(res.ok)
+        self.assertEqual(('a', 1, None), (res.key, res.attempts, res.error))
+        self.assertEqual(3, len(res.cpts()))
+
+    def test_retry(self):
+        self.server.failures[EXTRACT] = 2
+        res = self.pp.extract_result('some text', 'mock', max_attempts=3,
+                                     backoff=0.001)
+        self.assertTrue(res.ok)
+        self.assertEqual(3, res.attempts)
+
+    def test_failed_to_dead_letter(self):
+        self.server.failures[EXTRACT] = 2
+        sink = DeadLetterSink()
+        results = self.pp.extract_many({'a': 'text a', 'b': 'text b'}, 'mock',
+                                       max_workers=1, dead_letter=sink,
+                                       numberOfConcepts=2)
+        self.assertEqual([ExtractionResult.FAILED] * 2,
+                         [r.status for r in results])
+        self.assertIn('503', results[0].error)
+        with self.assertRaises(RuntimeError):
+            results[0].cpts()
+        self.assertEqual(['a', 'b'], [e['key'] for e in sink])
+
+        replayed = sink.replay(self.pp)
+        self.assertTrue(all(r.ok for r in replayed))
+        self.assertEqual(2, len(replayed[0].cpts()))
+        self.assertEqual(0, len(sink))
+
+    def test_interrupted_replay(self):
+        pp = self.pp
+
+        class Interrupted:
+            calls = 0
+
+            def extract_result(self, *args, **kwargs):
+                self.calls += 1
+                if self.calls == 3:
+                    raise KeyboardInterrupt
+                return pp.extract_result(*args, **kwargs)
+
+        with tempfile.TemporaryDirectory() as d:
+            sink = DeadLetterSink(os.path.join(d, 'failed.jsonl'))
+            for key in 'abcd':
+                sink.add(ExtractionResult(key, ExtractionResult.FAILED, None,
+                                          0., 1, 'error'),
+                         text='text ' + key, pid='mock')
+            # a fails again, b is extracted, c is interrupted
+            self.server.failures[EXTRACT] = 1
+            with self.assertRaises(KeyboardInterrupt):
+                sink.replay(Interrupted())
+            self.assertEqual(['c', 'd', 'a'], [e['key'] for e in sink])
+            self.assertEqual(3, len(sink.replay(self.pp)))
+            self.assertEqual(0, len(sink))
+
+    def test_html_error_page(self):
+        self.server.failure_page = b'<html><h1>502 Bad Gateway</h1></html>'
+        self.server.failures[EXTRACT] = 2
+        with self.assertRaises(HTTPError) as cm:
+            self.pp.extract('text', 'mock')
+        self.assertEqual(502, cm.exception.response.status_code)
+        sink = DeadLetterSink()
+        res = self.pp.extract_result('text', 'mock', dead_letter=sink)
+        self.assertIn('HTTPError: 502', res.error)
+        self.assertIn('502', list(sink)[0]['error'])
+
+    def test_dead_letter_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            sink = DeadLetterSink(os.path.join(d, 'failed.jsonl'))
+            pp = PoolParty('http://127.0.0.1:9', auth_data=('user', 'password'))
+            res = pp.extract_result('text', 'mock', key=1, dead_letter=sink)
+            self.assertFalse(res.ok)
+            self.assertIn('ConnectionError', res.error)
+            self.assertEqual([1], [e['key'] for e in DeadLetterSink(sink.path)])
+            self.assertEqual('text', list(sink)[0]['text'])
+
+    def test_extract_compatibility(self):
+        pp = PoolParty('http://127.0.0.1:9', auth_data=('user', 'password'))
+        self.assertIsNone(pp.extract('text', 'mock'))
+        self.server.failures[EXTRACT] = 1
+        with self.assertRaises(HTTPError):
+            self.pp.extract('text', 'mock')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import datetime
+import json
+import unittest
+
+from pp_api import GraphSearch, FacetMapper
+from pp_api import utils as u
+from pp_api.tests.mock_server import MockServer
+
+
+def old_facets(cpts):
+    cpt_uris = [x['uri'] for x in cpts]
+    cpt_freqs = {
+        x['uri'].split("/")[-1]: x['frequencyInDocument'] for x in cpts
+    }
+    cpt_facets = {
+        ('dyn_flt_' + suffix): [freq] for suffix, freq in cpt_freqs.items()
+    }
+    cpt_facets.update({
+        'dyn_uri_all_concepts': cpt_uris
+    })
+    return cpt_facets
+
+
+CPTS = [{'uri': 'http://ex.org/t/{}'.format(i), 'frequencyInDocument': i % 4}
+        for i in range(100)] + [{'uri': 'http://ex.org/other/3',
+                                 'frequencyInDocument': 7}]
+
+
+class TestFacets(unittest.TestCase):
+    def test_same_as_before(self):
+        mapper = FacetMapper(uris=[x['uri'] for x in CPTS[:10]])
+        self.assertEqual(old_facets(CPTS), mapper.facets(CPTS))
+        self.assertEqual(old_facets(CPTS), mapper.facets(CPTS))
+
+    def test_mapper_caches(self):
+        gs = GraphSearch('http://a', auth_data=('user', 'password'))
+        other = GraphSearch('http://a', auth_data=('user', 'password'))
+        self.assertIs(gs.facet_mapper_for('p'), gs.facet_mapper_for('p'))
+        self.assertIsNot(gs.facet_mapper_for('p'), other.facet_mapper_for('p'))
+        self.assertIsNot(gs.facet_mapper, other.facet_mapper)
+
+    def test_encoders(self):
+        data = {'facets': old_facets(CPTS), 'text': 'ü "x"'}
+        self.assertEqual(data, json.loads(u.json_dumps(data)))
+        self.assertEqual(data, json.loads(u.fast_json_dumps(data)))
+
+    def test_create_many(self):
+        with MockServer() as server:
+            gs = GraphSearch(server.url, auth_data=('user', 'password'),
+                             json_dumps=u.fast_json_dumps)
+            docs = [dict(id_='http://ex.org/doc/{}'.format(i), title='t',
+                         author='a', date=datetime.datetime(2020, 1, 1),
+                         cpts=CPTS, search_space_id='space', text='text')
+                    for i in range(20)]
+            docs[5]['date'] = None  # invalid
+            results = gs.create_many_with_freqs(docs, max_workers=3)
+            self.assertEqual(20, len(results))
+            self.assertIsInstance(results[5], AttributeError)
+            self.assertEqual(19, sum(getattr(r, 'status_code', 0) == 200
+                                     for r in results))
+            self.assertEqual(19, len(server.gs_documents))
+
+
+if __name__ == '__main__':
+    unittest.main()
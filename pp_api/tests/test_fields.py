@@ -0,0 +1,42 @@
+import unittest
+
+from pp_api import PoolParty, GraphSearch
+from pp_api.tests.mock_server import MockServer
+
+
+class TestSyncFields(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(thesaurus_size=60).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+        self.gs = GraphSearch(self.server.url, session=self.pp.session)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_sync_from_pp(self):
+        self.server.gs_fields[:] = [('dyn_flt_0', 'concept 0'),
+                                    ('dyn_flt_stale', 'old'),
+                                    ('dyn_txt_other', 'other')]
+        ans = self.gs.sync_fields_from_pp(self.pp, 'mock', 'space',
+                                          remove_extra=True, max_workers=4)
+        self.assertEqual(59, len(ans['added']))
+        self.assertEqual(['dyn_flt_stale'], ans['removed'])
+        self.assertEqual([], ans['failed'])
+        fields = dict(self.server.gs_fields)
+        self.assertEqual(61, len(fields))
+        self.assertEqual('concept 42', fields['dyn_flt_42'])
+        self.assertIn('dyn_txt_other', fields)
+
+        ans = self.gs.sync_fields_from_pp(self.pp, 'mock', 'space')
+        self.assertEqual({'added': [], 'removed': [], 'failed': []}, ans)
+
+    def test_concept_without_label(self):
+        self.server.unlabelled.add(7)
+        ans = self.gs.sync_fields_from_pp(self.pp, 'mock', 'space')
+        self.assertEqual(60, len(ans['added']))
+        fields = dict(self.server.gs_fields)
+        self.assertEqual(self.server.uri(7), fields['dyn_flt_7'])
+
+
+if __name__ == '__main__':
+    unittest.main()
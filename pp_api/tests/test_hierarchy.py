@@ -0,0 +1,119 @@
+import datetime
+import unittest
+
+from pp_api import PoolParty
+from pp_api.hierarchy import HierarchyIndex, changed_uris
+from pp_api.tests.mock_server import MockServer
+
+
+class TestHierarchyIndex(unittest.TestCase):
+    def setUp(self):
+        # a -> b -> d, a -> c -> d (polyhierarchy), d -> e
+        self.index = HierarchyIndex()
+        self.index.update([
+            {'uri': 'e', 'broaders': ['d']},
+            {'uri': 'd', 'broaders': ['b', 'c']},
+            {'uri': 'b', 'broaders': ['a']},
+            {'uri': 'c', 'broaders': ['a']},
+            {'uri': 'a', 'broaders': []},
+        ])
+
+    def test_queries(self):
+        index = self.index
+        self.assertEqual(5, len(index))
+        self.assertTrue(index.is_under('e', 'a'))
+        self.assertTrue(index.is_under('e', 'c'))
+        self.assertFalse(index.is_under('a', 'e'))
+        self.assertFalse(index.is_under('b', 'c'))
+        self.assertFalse(index.is_under('e', 'unknown'))
+        self.assertEqual({'a', 'b', 'c', 'd'}, index.ancestors('e'))
+        self.assertEqual({'b', 'c', 'd', 'e'}, index.descendants('a'))
+        self.assertEqual({'d', 'e'}, index.descendants('c'))
+        self.assertEqual({'a'}, index.top_concepts())
+
+    def test_update(self):
+        index = self.index
+        index.update([{'uri': 'd', 'broaders': ['b']}])
+        self.assertFalse(index.is_under('e', 'c'))
+        self.assertTrue(index.is_under('e', 'b'))
+        index.update([{'uri': 'f', 'broaders': ['e']}])
+        self.assertTrue(index.is_under('f', 'a'))
+        index.remove(['d'])
+        self.assertEqual(set(), index.ancestors('e'))
+        self.assertEqual({'e'}, index.ancestors('f'))
+        self.assertEqual({'b', 'c'}, index.descendants('a'))
+
+    def test_compact(self):
+        index = self.index
+        many = [{'uri': 'x{}'.format(i), 'broaders': ['e']}
+                for i in range(20)]
+        index.update(many)
+        self.assertEqual(25, len(index._bits))
+        index.remove([x['uri'] for x in many[:10]])
+        self.assertEqual(15, len(index._bits))
+        self.assertEqual(25, index._next_bit)
+        self.assertFalse(index.is_under('x0', 'a'))
+        index.remove([x['uri'] for x in many[10:]] + ['b'])
+        # compacted: only the bits of a, c, d, e are left
+        self.assertEqual(4, index._next_bit)
+        self.assertEqual({0, 1, 2, 3}, set(index._uris))
+        self.assertEqual({'a', 'c', 'd'}, index.ancestors('e'))
+        self.assertTrue(index.is_under('e', 'a'))
+        self.assertFalse(index.is_under('e', 'b'))
+        index.update([{'uri': 'f', 'broaders': ['e']}])
+        self.assertEqual({'a', 'c', 'd', 'e'}, index.ancestors('f'))
+        self.assertEqual({'c', 'd', 'e', 'f'}, index.descendants('a'))
+
+    def test_cycle(self):
+        index = HierarchyIndex()
+        with self.assertLogs('pp_api.hierarchy', 'WARNING'):
+            index.update([{'uri': 'x', 'broaders': ['y']},
+                          {'uri': 'y', 'broaders': ['x']}])
+        self.assertTrue(index.is_under('x', 'y'))
+
+
+class TestFromProject(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(thesaurus_size=200, branching=5).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_same_as_server(self):
+        index = HierarchyIndex.from_project(self.pp, 'mock')
+        self.assertEqual(200, len(index))
+        for i in [0, 3, 7]:
+            uri = self.server.uri(i)
+            narrowers = self.pp.get_cpt_narrowers('mock', uri)
+            self.assertEqual({x['uri'] for x in narrowers},
+                             index.descendants(uri))
+            for x in narrowers:
+                self.assertTrue(index.is_under(x['uri'], uri))
+        self.assertEqual({self.server.uri(i) for i in self.server.ancestors(150)},
+                         index.ancestors(self.server.uri(150)))
+
+    def test_refresh(self):
+        uri = self.server.uri
+        index = HierarchyIndex.from_project(self.pp, 'mock')
+        # a local change the server does not have, and a deleted concept
+        index.update([{'uri': uri(30), 'broaders': [uri(1)]}])
+        self.assertTrue(index.is_under(uri(155), uri(1)))
+        index.update([{'uri': 'http://deleted', 'broaders': [uri(0)]}])
+        self.server.history = [
+            {'affectedResource': uri(30), 'eventType': 'resourceChangeAddition',
+             'objectValue': 'label'},
+            {'affectedResource': uri(0), 'objectValue': 'http://deleted'},
+        ]
+        since = datetime.datetime(2020, 1, 1)
+        self.assertEqual({uri(30), uri(0), 'http://deleted'},
+                         index.refresh(self.pp, 'mock', since=since))
+        self.assertFalse(index.is_under(uri(155), uri(1)))
+        self.assertTrue(index.is_under(uri(155), uri(0)))
+        self.assertNotIn('http://deleted', index)
+        self.assertEqual(set(changed_uris(self.server.history)),
+                         index.refresh(self.pp, 'mock'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import tempfile
+import unittest
+from collections import Counter
+from datetime import datetime
+
+from pp_api import PoolParty, GraphSearch
+from pp_api.jobs import (CheckpointStore, JobRunner, extraction_task,
+                         indexing_task)
+from pp_api.tests.mock_server import MockServer
+
+
+class TestJobRunner(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'jobs.sqlite')
+        self.store = CheckpointStore(self.path)
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def test_resume(self):
+        calls = Counter()
+        broken = {3, 7}
+
+        def task(x):
+            calls[x] += 1
+            if x in broken:
+                raise ValueError('broken {}'.format(x))
+            return x * x
+
+        runner = JobRunner('squares', self.store, task, max_attempts=2,
+                           backoff=0.001, keep_results=True)
+        progress = runner.run({i: i for i in range(10)})
+        self.assertEqual((8, 2, 2), (progress.done, progress.failed,
+                                     progress.retries))
+        self.assertEqual({'3', '7'}, set(self.store.failed('squares')))
+        self.assertEqual(2, calls[3])
+        self.assertEqual(16, self.store.get('squares', 4)['result'])
+
+        # a new process resumes from the checkpoints in the file
+        broken.clear()
+        store = CheckpointStore(self.path)
+        progress = JobRunner('squares', store, task).run(
+            [(i, i) for i in range(12)])
+        self.assertEqual((8, 4, 0), (progress.skipped, progress.done,
+                                     progress.failed))
+        self.assertEqual(4, progress.total)
+        self.assertEqual(1, calls[5])
+        self.assertEqual({'done': 12}, store.counts('squares'))
+        store.close()
+
+    def test_skip_failed(self):
+        def fail(x):
+            raise ValueError()
+
+        JobRunner('job', self.store, fail, max_attempts=1).run({1: 1})
+        progress = JobRunner('job', self.store, lambda x: x,
+                             retry_failed=False).run({1: 1})
+        self.assertEqual(1, progress.skipped)
+
+    def test_progress(self):
+        seen = []
+        progress = JobRunner('job', self.store, lambda x: x, max_workers=2,
+                             on_progress=lambda p: seen.append(p.finished)
+                             ).run({i: i for i in range(5)})
+        self.assertEqual([1, 2, 3, 4, 5], sorted(seen))
+        self.assertGreater(progress.throughput, 0)
+        self.assertEqual(0, progress.eta)
+
+
+class TestTasks(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(n_concepts=5).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_extraction_and_indexing(self):
+        store = CheckpointStore(':memory:')
+        pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+        runner = JobRunner('extract', store, extraction_task(pp, 'mock'),
+                           keep_results=True)
+        runner.run({'a': 'some text', 'b': 'more text'})
+        self.assertEqual(5, len(store.get('extract', 'a')['result']))
+
+        gs = GraphSearch(self.server.url, auth_data=('user', 'password'))
+        docs = {str(i): {'id': 'doc{}'.format(i), 'title': 't', 'author': 'a',
+                         'date': datetime(2020, 1, 1), 'text': 'text {}'.format(i)}
+                for i in range(3)}
+        progress = JobRunner('index', store,
+                             indexing_task(gs, 'mock', 'space')).run(docs)
+        self.assertEqual(3, progress.done)
+        self.assertEqual(3, len(self.server.gs_documents))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from pp_api import PoolParty, utils as u
+from pp_api.labels import LabelCache, LabelResolver
+from pp_api.tests.mock_server import MockServer
+
+CONCEPTS = '/PoolParty/api/thesaurus/mock/concepts'
+
+
+class TestLabels(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(latency=0.02, thesaurus_size=1000).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_chunks_by_length(self):
+        values = ['x' * 100] * 50
+        chunks = list(u.chunks_by_length(values, max_items=20, max_chars=1000))
+        self.assertEqual(values, sum(chunks, []))
+        self.assertTrue(all(len(c) <= 8 for c in chunks))
+
+    def test_get_pref_labels_chunked(self):
+        uris = [self.server.uri(i) for i in range(500)]
+        labels = self.pp.get_pref_labels(uris, 'mock', lang='de')
+        self.assertEqual([self.server.pref_label(i) for i in range(500)], labels)
+        self.assertGreater(self.server.calls[CONCEPTS], 1)
+
+    def test_resolver_batches_callers(self):
+        uris = [self.server.uri(i) for i in range(200)]
+        with LabelResolver(self.pp, 'mock', max_batch=50) as resolver:
+            with ThreadPoolExecutor(max_workers=32) as executor:
+                labels = list(executor.map(resolver.resolve, uris))
+        self.assertEqual([self.server.pref_label(i) for i in range(200)], labels)
+        self.assertLessEqual(self.server.calls[CONCEPTS], 8)
+
+    def test_resolver_close_with_pending(self):
+        # the timer would fire long after close
+        resolver = LabelResolver(self.pp, 'mock', window=60)
+        futures = [resolver.submit(self.server.uri(i)) for i in range(3)]
+        resolver.close()
+        self.assertEqual([self.server.pref_label(i) for i in range(3)],
+                         [f.result(timeout=5) for f in futures])
+        self.assertIsNone(resolver._timer)
+        with self.assertRaises(RuntimeError):
+            resolver.submit(self.server.uri(5))
+        resolver.flush()
+
+    def test_resolver_cache(self):
+        cache = LabelCache()
+        uris = [self.server.uri(i) for i in range(10)] + ['http://unknown']
+        with LabelResolver(self.pp, 'mock', cache=cache) as resolver:
+            first = resolver.resolve_many(uris)
+            calls = self.server.calls[CONCEPTS]
+            self.assertEqual(first, resolver.resolve_many(uris))
+        self.assertEqual(calls, self.server.calls[CONCEPTS])
+        self.assertIsNone(first['http://unknown'])
+        self.assertEqual(11, len(cache))
+        # labels are cached per language
+        with LabelResolver(self.pp, 'mock', lang='de', cache=cache) as resolver:
+            resolver.resolve(uris[0])
+        self.assertEqual(calls + 1, self.server.calls[CONCEPTS])
+
+    def test_cache_lru(self):
+        cache = LabelCache(maxsize=2)
+        cache.set('p', 'en', 'a', 'A')
+        cache.set('p', 'en', 'b', 'B')
+        cache.get('p', 'en', 'a')
+        cache.set('p', 'en', 'c', 'C')
+        self.assertEqual('A', cache.get('p', 'en', 'a'))
+        self.assertIsNone(cache.get('p', 'en', 'b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
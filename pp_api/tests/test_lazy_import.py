@@ -0,0 +1,47 @@
+import unittest
+
+from benchmarks import bench_import
+
+
+class TestLazyImport(unittest.TestCase):
+    def test_import_does_not_load_heavy_modules(self):
+        for stmt in ['import pp_api',
+                     'from pp_api import PoolParty, GraphSearch, ppextract2matches',
+                     'from pp_api import get_corpus_analysis_graphs']:
+            times, loaded = bench_import.measure(stmt, repeat=1)
+            self.assertEqual(set(), loaded, stmt)
+
+    def test_lazy_attributes(self):
+        import pp_api
+        from pp_api import pp_calls
+        self.assertIs(pp_calls.PoolParty, pp_api.PoolParty)
+        self.assertIs(pp_calls, pp_api.pp_calls)
+        self.assertIn('GraphSearch', dir(pp_api))
+        with self.assertRaises(AttributeError):
+            pp_api.no_such_thing
+
+    def test_star_import(self):
+        # `from pp_api import *` before the lazy imports, without the names
+        # the submodules imported from the standard library and requests
+        baseline = {
+            'GraphSearch', 'PoolParty', 'add_custom_fields_from_the',
+            'all_data_q', 'extractor_utils', 'get_corpus_analysis_graphs',
+            'get_corpus_zscores', 'get_pp_terms', 'get_ridfs', 'gs_calls',
+            'pp_api', 'pp_calls', 'ppextract2matches',
+            'q_get_doc_text_by_doc_id', 'query_cpt_cooc_scores',
+            'query_sparql_endpoint', 'query_terms2cpts_cooc_scores',
+            'remove_overlaps', 'sort_by_date', 'sparql_calls', 'u', 'utils',
+        }
+        namespace = dict()
+        exec('from pp_api import *', namespace)
+        self.assertEqual(set(), baseline - set(namespace))
+        import pp_api
+        from pp_api import utils
+        self.assertIs(pp_api, namespace['pp_api'])
+        self.assertIs(utils, namespace['u'])
+        self.assertIs(pp_api.pp_calls.PoolParty,
+                      namespace['pp_api'].PoolParty)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import requests
+
+from pp_api import metrics as m
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status = 404 if 'missing' in self.path else 200
+        body = b'[]' if status == 200 else b'{}'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestMetrics(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.httpd = HTTPServer(('127.0.0.1', 0), _Handler)
+        cls.server = 'http://127.0.0.1:{}'.format(cls.httpd.server_port)
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+
+    def test_endpoint_name(self):
+        self.assertEqual(
+            '/PoolParty/api/corpusmanagement/{pid}/documents/{id}',
+            m.endpoint_name('http://x/PoolParty/api/corpusmanagement/'
+                            'abc/documents/42?corpusId=1')
+        )
+
+    def test_session_hook(self):
+        metrics = m.Metrics()
+        events = []
+        metrics.add_callback(events.append)
+        session = metrics.instrument(requests.session())
+        metrics.instrument(session)  # installed only once
+        session.get(self.server + '/PoolParty/api/thesaurus/p1/schemes')
+        session.get(self.server + '/PoolParty/api/thesaurus/p2/schemes')
+        session.get(self.server + '/missing')
+        snapshot = metrics.snapshot()['endpoints']
+        stats = snapshot['/PoolParty/api/thesaurus/{pid}/schemes']
+        self.assertEqual(2, stats['count'])
+        self.assertEqual(4, stats['bytes_received'])
+        self.assertEqual({200: 2}, stats['status_codes'])
+        self.assertEqual(1, snapshot['/missing']['errors'])
+        self.assertEqual(3, len(events))
+
+    def test_timer_and_cache(self):
+        metrics = m.Metrics()
+        with self.assertRaises(ValueError):
+            with metrics.timer('sparql'):
+                raise ValueError()
+        metrics.record_cache('labels', hit=True)
+        metrics.record_cache('labels', hit=False)
+        snapshot = metrics.snapshot()
+        self.assertEqual({'ValueError': 1},
+                         snapshot['endpoints']['sparql']['status_codes'])
+        self.assertEqual({'hits': 1, 'misses': 1}, snapshot['caches']['labels'])
+        text = metrics.to_prometheus()
+        self.assertIn('pp_api_cache_hits_total{cache="labels"} 1', text)
+        self.assertIn('pp_api_request_errors_total{endpoint="sparql"} 1', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
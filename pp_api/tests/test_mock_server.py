@@ -0,0 +1,49 @@
+import datetime
+import unittest
+
+from pp_api import PoolParty, GraphSearch
+from pp_api.tests.mock_server import MockServer
+
+from benchmarks import harness
+
+
+class TestMockServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = MockServer(n_concepts=5).start()
+        cls.pp = PoolParty(cls.server.url, auth_data=('user', 'password'))
+        cls.gs = GraphSearch(cls.server.url, session=cls.pp.session)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def test_extract(self):
+        r = self.pp.extract('concept 0 concept 0', 'mock')
+        cpts = self.pp.get_cpts_from_response(r)
+        self.assertEqual(5, len(cpts))
+        self.assertEqual([(0, 8), (10, 18)], cpts[0]['matchings'][0]['positions'])
+
+    def test_thesaurus(self):
+        path = self.pp.get_cpt_path(self.server.uri(37), 'mock')
+        self.assertEqual(['Mock scheme', 'concept 0', 'concept 6', 'concept 37'],
+                         [label for uri, label in path])
+        freqs = self.pp.get_cpt_corpus_freqs('corpus:mock', 'mock')
+        self.assertEqual(self.server.thesaurus_size, len(freqs))
+
+    def test_graphsearch(self):
+        cpts = [{'uri': self.server.uri(1), 'frequencyInDocument': 2}]
+        self.gs.create_with_freqs('http://mock.doc/1', 'title', 'author',
+                                  datetime.datetime(2020, 1, 1), cpts,
+                                  'space', text='text')
+        self.assertTrue(self.gs.in_gs('http://mock.doc/1', 'space'))
+
+    def test_harness(self):
+        for mode in harness.MODES:
+            res = harness.measure('paths', mode, lambda i: self.pp.get_cpt_path(
+                self.server.uri(i), 'mock'), range(10), workers=4)
+            self.assertEqual(10, res.as_dict()['n'])
+
+
+if __name__ == '__main__':
+    unittest.main()
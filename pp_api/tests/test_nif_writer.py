@@ -0,0 +1,72 @@
+import io
+import unittest
+
+import rdflib
+
+from pp_api import PoolParty
+from pp_api import nif_writer
+from pp_api.tests.mock_server import MockServer
+
+
+NIF = rdflib.Namespace(nif_writer.NIF)
+ITSRDF = rdflib.Namespace(nif_writer.ITSRDF)
+
+TEXT = 'data security and "data"\nsecurity'
+CPTS = [
+    {'uri': 'http://ex.org/data', 'prefLabel': 'data',
+     'matchings': [{'text': 'data', 'frequency': 2,
+                    'positions': [(0, 3), (19, 22)]}]},
+    {'uri': 'http://ex.org/data_security', 'prefLabel': 'data security',
+     'matchings': [{'text': 'data security', 'frequency': 1,
+                    'positions': [(0, 12)]}]},
+    {'uri': 'http://ex.org/datum', 'prefLabel': 'datum',
+     'matchings': [{'text': 'data', 'frequency': 1, 'positions': [(0, 3)]}]},
+    {'uri': 'http://ex.org/shadow', 'prefLabel': 'shadow'},
+]
+
+
+class TestNifWriter(unittest.TestCase):
+    def check_graph(self, g, doc_uri='http://ex.org/doc'):
+        context = rdflib.URIRef(doc_uri + '#char=0,{}'.format(len(TEXT)))
+        self.assertEqual(TEXT, str(g.value(context, NIF.isString)))
+        phrase = rdflib.URIRef(doc_uri + '#char=0,4')
+        self.assertEqual('data', str(g.value(phrase, NIF.anchorOf)))
+        self.assertEqual(context, g.value(phrase, NIF.referenceContext))
+        self.assertEqual({rdflib.URIRef('http://ex.org/data'),
+                          rdflib.URIRef('http://ex.org/datum')},
+                         set(g.objects(phrase, ITSRDF.taIdentRef)))
+        phrases = [x for x in g.subjects(rdflib.RDF.type, NIF.Phrase)
+                   if x.startswith(doc_uri + '#')]
+        self.assertEqual(3, len(phrases))
+        self.assertEqual(13, g.value(rdflib.URIRef(doc_uri + '#char=0,13'),
+                                     NIF.endIndex).toPython())
+
+    def test_formats_are_equivalent(self):
+        turtle = nif_writer.to_string(TEXT, CPTS, 'http://ex.org/doc')
+        nt = nif_writer.to_string(TEXT, CPTS, 'http://ex.org/doc', fmt='nt')
+        g_turtle = rdflib.Graph().parse(data=turtle, format='turtle')
+        g_nt = rdflib.Graph().parse(data=nt, format='nt')
+        self.check_graph(g_turtle)
+        self.assertEqual(set(g_turtle), set(g_nt))
+
+    def test_batch(self):
+        out = io.StringIO()
+        docs = [('http://ex.org/doc{}'.format(i), TEXT, CPTS) for i in range(3)]
+        self.assertEqual(3, nif_writer.write_nif_batch(out, docs))
+        g = rdflib.Graph().parse(data=out.getvalue(), format='turtle')
+        for i in range(3):
+            self.check_graph(g, 'http://ex.org/doc{}'.format(i))
+
+    def test_extract2nif_stream(self):
+        with MockServer(n_concepts=3) as server:
+            pp = PoolParty(server.url, auth_data=('user', 'password'))
+            text = ' '.join(server.pref_label(i) for i in range(3))
+            out = pp.extract2nif(text, 'mock', doc_uri='http://ex.org/d',
+                                 out=io.StringIO(), nif_format='nt')
+        g = rdflib.Graph().parse(data=out.getvalue(), format='nt')
+        phrase = rdflib.URIRef('http://ex.org/d#char=10,19')
+        self.assertEqual('concept 1', str(g.value(phrase, NIF.anchorOf)))
+
+
+if __name__ == '__main__':
+    unittest.main()
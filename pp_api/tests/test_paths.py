@@ -0,0 +1,65 @@
+import unittest
+
+from pp_api import PoolParty
+from pp_api.tests.mock_server import MockServer
+
+PATHS = '/PoolParty/api/thesaurus/mock/getPaths'
+
+
+class TestCptPaths(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(thesaurus_size=200, branching=3).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_same_as_get_cpt_path(self):
+        uris = [self.server.uri(i) for i in range(100, 120)]
+        paths = self.pp.get_cpt_paths(uris + uris, 'mock', max_workers=4)
+        self.assertEqual(uris, list(paths))
+        for uri in uris:
+            self.assertEqual(self.pp.get_cpt_path(uri, 'mock'), paths[uri])
+
+    def test_ancestors_from_paths(self):
+        # deep concepts first, their ancestors come from their paths
+        leaf = self.server.uri(150)
+        ancestors = [self.server.uri(i)
+                     for i in self.server.ancestors(150)]
+        paths = self.pp.get_cpt_paths([leaf] + ancestors, 'mock', max_workers=1)
+        self.assertEqual(1, self.server.calls[PATHS])
+        for uri in ancestors:
+            self.assertEqual(self.pp.get_cpt_path(uri, 'mock'), paths[uri])
+
+    def test_all_paths(self):
+        uris = [self.server.uri(i) for i in (5, 50)]
+        paths = self.pp.get_cpt_paths(uris, 'mock', all_paths=True)
+        self.assertEqual(2, self.server.calls[PATHS])
+        for uri in uris:
+            self.assertEqual([self.pp.get_cpt_path(uri, 'mock')], paths[uri])
+
+    def test_unknown_concept(self):
+        uris = [self.server.uri(i) for i in (5, 500, 50)]
+        with self.assertLogs('pp_api.pp_calls', 'WARNING'):
+            paths = self.pp.get_cpt_paths(uris, 'mock')
+        self.assertEqual(uris, list(paths))
+        self.assertIsNone(paths[uris[1]])
+        self.assertEqual(self.pp.get_cpt_path(uris[2], 'mock'), paths[uris[2]])
+        with self.assertLogs('pp_api.pp_calls', 'WARNING'):
+            paths = self.pp.get_cpt_paths(uris, 'mock', all_paths=True)
+        self.assertEqual(uris, list(paths))
+        self.assertIsNone(paths[uris[1]])
+
+    def test_concept_without_path(self):
+        self.server.pathless.add(7)
+        uris = [self.server.uri(i) for i in (5, 7)]
+        paths = self.pp.get_cpt_paths(uris, 'mock')
+        self.assertEqual(uris, list(paths))
+        self.assertIsNone(paths[uris[1]])
+        paths = self.pp.get_cpt_paths(uris, 'mock', all_paths=True)
+        self.assertEqual(uris, list(paths))
+        self.assertEqual([], paths[uris[1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import unittest
+
+from pp_api import PoolParty, extractor_utils, nif_writer
+from pp_api.postprocess import ExtractionPipeline, process
+from pp_api.tests.mock_server import MockServer
+
+
+class TestPostprocess(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(n_concepts=5).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+        self.texts = {'doc{}'.format(i): self.server.document_text(i)
+                      for i in range(6)}
+
+    def tearDown(self):
+        self.server.stop()
+
+    def expected(self, key):
+        text = self.texts[key]
+        cpts = self.pp.get_cpts_from_response(self.pp.extract(text, 'mock'))
+        return (cpts, extractor_utils.ppextract2matches(cpts),
+                nif_writer.to_string(text, cpts, 'http://example.doc/' + key,
+                                     fmt='nt'))
+
+    def test_get_cpts_from_json(self):
+        r = self.pp.extract('some text', 'mock')
+        self.assertEqual(self.pp.get_cpts_from_response(r),
+                         self.pp.get_cpts_from_json(r.content))
+
+    def test_pipeline(self):
+        for processes in (0, 2):
+            pipeline = ExtractionPipeline(self.pp, 'mock', fetchers=3,
+                                          processes=processes)
+            docs = {doc.key: doc for doc in pipeline.run(self.texts)}
+            self.assertEqual(set(self.texts), set(docs))
+            for key, doc in docs.items():
+                self.assertTrue(doc.ok)
+                cpts, matches, nif = self.expected(key)
+                self.assertEqual(cpts, doc.cpts)
+                self.assertEqual(matches, doc.matches)
+                self.assertEqual(nif, doc.nif)
+
+    def test_steps_and_fields(self):
+        pipeline = ExtractionPipeline(self.pp, 'mock', processes=1,
+                                      steps=('cpts',), fields=('uri',))
+        doc = next(pipeline.run([('doc0', self.texts['doc0'])]))
+        self.assertIsNone(doc.matches)
+        self.assertIsNone(doc.nif)
+        self.assertEqual({'uri'}, set().union(*doc.cpts))
+
+    def test_failures(self):
+        self.server.failures['/extractor/api/extract'] = 1
+        docs = list(ExtractionPipeline(self.pp, 'mock', fetchers=1,
+                                       processes=0).run(self.texts))
+        self.assertEqual(1, sum(not doc.ok for doc in docs))
+        bad = process('bad', b'not json')
+        self.assertFalse(bad.ok)
+        self.assertIn('JSONDecodeError', bad.error)
+
+
+if __name__ == '__main__':
+    unittest.main()
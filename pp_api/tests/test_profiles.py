@@ -0,0 +1,47 @@
+import unittest
+
+from pp_api import PoolParty
+from pp_api import profiles
+from pp_api.tests.mock_server import MockServer
+
+
+class TestProfiles(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(n_concepts=10).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+        self.full = self.pp.get_cpts_from_response(
+            self.pp.extract('some text', 'mock'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_profiles_match_full_parser(self):
+        for name, profile in profiles.PROFILES.items():
+            cpts = self.pp.extract_cpts('some text', 'mock', profile=name)
+            self.assertEqual(
+                [{k: c[k] for k in profile.fields} for c in self.full],
+                [{k: c[k] for k in profile.fields} for c in cpts], name)
+            self.assertLessEqual(set(profile.fields), set(cpts[0]))
+
+    def test_smaller_answers(self):
+        sizes = dict()
+        for name in ['minimal', 'full']:
+            r = self.pp.extract('some text', 'mock',
+                                **profiles.PROFILES[name].params)
+            sizes[name] = len(r.content)
+        self.assertLess(sizes['minimal'] * 3, sizes['full'])
+
+    def test_cheapest(self):
+        self.assertEqual('minimal', profiles.cheapest(['uri']).name)
+        self.assertEqual('positions',
+                         profiles.cheapest(['uri', 'matchings']).name)
+        self.assertEqual('full', profiles.cheapest(
+            ['matchings', 'relatedConcepts']).name)
+        with self.assertRaises(ValueError):
+            profiles.cheapest(['score'])
+        with self.assertRaises(ValueError):
+            self.pp.extract_cpts('text', 'mock', profile='tiny')
+
+
+if __name__ == '__main__':
+    unittest.main()
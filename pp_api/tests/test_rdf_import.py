@@ -0,0 +1,91 @@
+import io
+import unittest
+
+import rdflib
+from rdflib.namespace import SKOS
+
+from pp_api import PoolParty, TaxonomyBuilder
+from pp_api.rdf_import import Literal, nt_uri, parse_nt_line
+from pp_api.tests.mock_server import MockServer, SCHEME_URI
+
+
+BASE = 'http://example.org/thesaurus/'
+
+
+def build():
+    builder = TaxonomyBuilder(BASE, scheme_uri=SCHEME_URI)
+    builder.add_concept('fruit', 'Fruit')
+    builder.add_concept('apple', 'Apple "red"\nor green', parent='fruit')
+    builder.add_concept('pear', 'Pear', parent='fruit')
+    builder.add_label('apple', 'Malus', lang='la')
+    builder.add_relation('apple', 'pear', relation_type='skos:related')
+    builder.add_custom_attribute('pear', 'http://example.org/weight', '120',
+                                 datatype='xsd:integer')
+    return builder
+
+
+class TestTaxonomyBuilder(unittest.TestCase):
+    def test_rdf(self):
+        builder = build()
+        out = io.StringIO()
+        builder.serialize(out, chunk_lines=2)
+        self.assertEqual(builder.serialize(), out.getvalue())
+        g = rdflib.Graph().parse(data=out.getvalue(), format='nt')
+        fruit, apple, pear = (rdflib.URIRef(BASE + x)
+                              for x in ['fruit', 'apple', 'pear'])
+        scheme = rdflib.URIRef(SCHEME_URI)
+        self.assertIn((fruit, SKOS.topConceptOf, scheme), g)
+        self.assertIn((apple, SKOS.broader, fruit), g)
+        self.assertIn((fruit, SKOS.narrower, pear), g)
+        self.assertIn((pear, SKOS.related, apple), g)
+        self.assertEqual('Apple "red"\nor green',
+                         str(g.value(apple, SKOS.prefLabel)))
+        self.assertIn((apple, SKOS.altLabel, rdflib.Literal('Malus', lang='la')), g)
+        self.assertEqual(120, g.value(pear, rdflib.URIRef(
+            'http://example.org/weight')).toPython())
+
+    def test_parse(self):
+        data = build().serialize()
+        g = rdflib.Graph().parse(data=data, format='nt')
+        triples = [parse_nt_line(line) for line in data.splitlines()]
+        self.assertEqual(len(g), len(triples))
+        self.assertIn((BASE + 'apple', str(SKOS.prefLabel),
+                       Literal('Apple "red"\nor green', 'en', None)), triples)
+        self.assertIn((BASE + 'pear', 'http://example.org/weight',
+                       Literal('120', None, str(rdflib.XSD.integer))), triples)
+        self.assertIsNone(parse_nt_line('# comment'))
+        with self.assertRaises(ValueError):
+            parse_nt_line('<a> <b>')
+
+    def test_invalid_iri(self):
+        self.assertEqual('<http://x/a%20b>', nt_uri('http://x/a%20b'))
+        for uri in ['http://x/a b', 'http://x/a>', 'http://x/"a"',
+                    'http://x/\ta', 'http://x/{a}', 'http://x/a\\b']:
+            with self.assertRaises(ValueError):
+                nt_uri(uri)
+        builder = build()
+        builder.add_custom_attribute('pear', 'http://x/a b', '1')
+        with self.assertRaises(ValueError):
+            builder.serialize()
+
+    def test_submit(self):
+        with MockServer() as server:
+            pp = PoolParty(server.url, auth_data=('user', 'password'))
+            r = build().submit(pp, 'mock')
+            self.assertEqual(200, r.status_code)
+            self.assertEqual(1, len(server.imported))
+            self.assertEqual([], server.created)
+
+    def test_submit_fallback(self):
+        with MockServer(supports_import=False) as server:
+            pp = PoolParty(server.url, auth_data=('user', 'password'))
+            results = build().submit(pp, 'mock')
+            self.assertEqual(6, len(results))
+            self.assertTrue(all(r.ok for r in results))
+            suffixes = [form['suffix'] for call, form in server.created
+                        if call == 'concept']
+            self.assertEqual('fruit', suffixes[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import requests
+
+from pp_api import utils as u
+from pp_api import PoolParty, GraphSearch
+
+
+class TestSession(unittest.TestCase):
+    auth_data = ('user', 'password')
+
+    def test_new_session_is_pooled(self):
+        session = u.get_session(None, self.auth_data, pool_maxsize=32,
+                                pool_block=True, keep_alive=True)
+        adapter = session.get_adapter('https://example.org/')
+        self.assertEqual(32, adapter._pool_maxsize)
+        self.assertTrue(adapter._pool_block)
+        self.assertEqual('keep-alive', session.headers['Connection'])
+        self.assertEqual(self.auth_data, session.auth)
+
+    def test_shared_session_is_not_reconfigured(self):
+        pp = PoolParty('https://pp.example.org', auth_data=self.auth_data,
+                       pool_maxsize=16)
+        adapter = pp.session.get_adapter('https://pp.example.org/')
+        gs = GraphSearch('https://pp.example.org', session=pp.session)
+        self.assertIs(pp.session, gs.session)
+        self.assertIs(adapter, gs.session.get_adapter('https://pp.example.org/'))
+        self.assertEqual(self.auth_data, gs.session.auth)
+
+    def test_retries_on_shared_session_are_server_specific(self):
+        session = requests.session()
+        PoolParty('https://pp.example.org', auth_data=self.auth_data,
+                  session=session, max_retries=3)
+        pp_adapter = session.get_adapter('https://pp.example.org/x')
+        other_adapter = session.get_adapter('https://other.example.org/x')
+        self.assertEqual(3, pp_adapter.max_retries.total)
+        self.assertEqual(0, other_adapter.max_retries.total)
+
+    def test_pool_args_on_shared_session_are_server_specific(self):
+        pp = PoolParty('https://pp.example.org', auth_data=self.auth_data,
+                       pool_maxsize=16, max_retries=3)
+        pp_adapter = pp.session.get_adapter('https://pp.example.org/x')
+        gs = GraphSearch('https://gs.example.org', session=pp.session,
+                         pool_block=True)
+        self.assertIs(pp_adapter,
+                      gs.session.get_adapter('https://pp.example.org/x'))
+        gs_adapter = gs.session.get_adapter('https://gs.example.org/x')
+        self.assertIsNot(pp_adapter, gs_adapter)
+        self.assertTrue(gs_adapter._pool_block)
+        with self.assertLogs('pp_api.utils', 'WARNING'):
+            GraphSearch('https://pp.example.org/', session=pp.session,
+                        pool_block=True)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import bisect
+import time
+import unittest
+
+from pp_api import PoolParty
+from pp_api.suggest import SuggestIndex, _upper, normalize
+from pp_api.tests.mock_server import MockServer
+
+
+class TestSuggestIndex(unittest.TestCase):
+    def setUp(self):
+        self.server = MockServer(thesaurus_size=2000).start()
+        self.pp = PoolParty(self.server.url, auth_data=('user', 'password'))
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_same_as_server(self):
+        index = SuggestIndex.from_project(self.pp, 'mock')
+        self.assertEqual(2000, len(index))
+        for query in ['concept 1', 'Concept 12', 'concept 1999']:
+            self.assertEqual(self.pp.get_autocomplete(query, 'mock'),
+                             index.suggest(query))
+
+    def test_from_export(self):
+        index = SuggestIndex.from_ntriples(
+            self.pp.export_project('mock', rdf_format='N-Triples'))
+        self.assertEqual(2000, len(index))
+        self.assertEqual(self.pp.get_autocomplete('concept 5', 'mock'),
+                         index.suggest('concept 5'))
+        with self.assertRaises(ValueError):
+            SuggestIndex.from_ntriples(self.pp.export_project('mock'))
+
+    def test_ranking(self):
+        index = SuggestIndex()
+        index.update([
+            {'uri': 'u:apple', 'prefLabel': 'Apple', 'altLabels': ['Malus']},
+            {'uri': 'u:pie', 'prefLabel': 'Apple pie'},
+            {'uri': 'u:crab', 'prefLabel': 'Crab apple'},
+            {'uri': 'u:app', 'prefLabel': 'Application',
+             'altLabels': ['App']},
+            {'uri': 'u:cafe', 'prefLabel': 'Café'},
+        ])
+        self.assertEqual(['u:apple', 'u:pie', 'u:app', 'u:crab'],
+                         [uri for _, uri in index.suggest('app')])
+        self.assertEqual([('Apple', 'u:apple')], index.suggest('mal'))
+        self.assertEqual([('Café', 'u:cafe')], index.suggest('CAFE'))
+        self.assertEqual(2, len(index.suggest('app', limit=2)))
+
+    def test_incremental(self):
+        index = SuggestIndex()
+        index.add('u:1', 'Pear', lang='en')
+        index.add('u:1', 'Birne', lang='de')
+        self.assertEqual([('Pear', 'u:1')], index.suggest('pe'))
+        index.add('u:1', 'Peach')
+        self.assertEqual([('Peach', 'u:1')], index.suggest('pe'))
+        self.assertEqual([], index.suggest('pear'))
+        index.remove('u:1')
+        self.assertEqual([], index.suggest('pe'))
+        self.assertEqual([], index.suggest('bir', lang='de'))
+
+    def test_refresh(self):
+        index = SuggestIndex()
+        index.add(self.server.uri(3), 'old label')
+        index.add('http://deleted', 'old label 2')
+        index.refresh(self.pp, 'mock', [self.server.uri(3), 'http://deleted'])
+        self.assertEqual([], index.suggest('old'))
+        self.assertEqual([('concept 3', self.server.uri(3))],
+                         index.suggest('alt 3'))
+
+    def test_latency(self):
+        index = SuggestIndex.from_project(self.pp, 'mock')
+        queries = ['concept {}'.format(i) for i in range(100, 300)]
+        start = time.perf_counter()
+        for q in queries:
+            index.suggest(q)
+        self.assertLess((time.perf_counter() - start) / len(queries), 0.001)
+
+    def test_precomputed(self):
+        index = SuggestIndex(max_scan=8)
+        index.update([{'uri': 'u:{}'.format(i),
+                       'prefLabel': 'concept {}'.format(i),
+                       'altLabels': ['alt {}'.format(i)]} for i in range(500)])
+        queries = ['', 'c', 'concept 1', 'concept 12', 'alt 4', '3']
+
+        def scanned(query):
+            entries = index._entries['en']
+            lo = bisect.bisect_left(entries, (query,))
+            hi = len(entries)
+            if query:
+                hi = bisect.bisect_left(entries, (_upper(query),))
+            return [(index._concepts['en'][uri][0], uri)
+                    for _, uri in index._scan(entries, lo, hi, 10)]
+
+        def check():
+            for query in queries:
+                self.assertEqual(scanned(query), index.suggest(query))
+
+        self.assertIn('c', index._top['en'])
+        check()
+        index.remove('u:1')
+        index.add('u:new', 'c')
+        index.add('u:2', 'Concept 12a')
+        check()
+        self.assertEqual(('c', 'u:new'), index.suggest('c')[0])
+        self.assertEqual(20, len(index.suggest('c', limit=20)))
+
+    def test_normalize(self):
+        self.assertEqual('creme brulee', normalize('  Crème\tBRÛLÉE '))
+
+
+if __name__ == '__main__':
+    unittest.main()
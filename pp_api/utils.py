@@ -1,19 +1,297 @@
+import functools
+import gzip
+import json
+import logging
+import re
+import threading
+import zlib
+from urllib.parse import urlsplit
+
 import requests
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+
+module_logger = logging.getLogger(__name__)
+
+
+DEFAULT_POOL_CONNECTIONS = 10
+DEFAULT_POOL_MAXSIZE = 10
+
+# request bodies that servers decode when compressed: JSON and text
+COMPRESSIBLE_TYPES = re.compile(r'text/.*|application/([\w.-]+\+)?json')
+
+
+class CompressingAdapter(HTTPAdapter):
+    """
+    HTTPAdapter compressing JSON and text request bodies (see
+    `COMPRESSIBLE_TYPES`) of at least `min_size` bytes with `encoding`
+    ('gzip' or 'deflate'); form posts and multipart uploads are sent as
+    they are. If a server answers 415 (Unsupported
+    Media Type) or 400 to a compressed body, the request is sent again
+    uncompressed. Unless the plain request gets a 400 as well, bodies to
+    that host are not compressed any more. Servers rejecting compressed
+    bodies with another status (e.g. 500) are not detected; do not enable
+    compression for them.
+
+    The uncompressed size is kept as `body_size` on the prepared request,
+    for `metrics.Metrics`.
+    """
+
+    def __init__(self, encoding='gzip', min_size=1024, level=6, **kwargs):
+        if encoding not in ('gzip', 'deflate'):
+            raise ValueError('Unknown encoding: {}'.format(encoding))
+        self.encoding = encoding
+        self.min_size = min_size
+        self.level = level
+        self.refused_hosts = set()
+        super().__init__(**kwargs)
+
+    def _compress(self, data):
+        if self.encoding == 'gzip':
+            return gzip.compress(data, compresslevel=self.level)
+        return zlib.compress(data, self.level)
 
-from decouple import config
+    def send(self, request, **kwargs):
+        body = request.body
+        host = urlsplit(request.url).netloc
+        content_type = request.headers.get('Content-Type', '')
+        if (not isinstance(body, (bytes, str)) or len(body) < self.min_size
+                or 'Content-Encoding' in request.headers
+                or not COMPRESSIBLE_TYPES.fullmatch(
+                    content_type.split(';')[0].strip().lower())
+                or host in self.refused_hosts):
+            return super().send(request, **kwargs)
+        data = body.encode('utf8') if isinstance(body, str) else body
+        original = request.copy()
+        request.body = self._compress(data)
+        request.headers['Content-Encoding'] = self.encoding
+        request.headers['Content-Length'] = str(len(request.body))
+        request.body_size = len(data)
+        r = super().send(request, **kwargs)
+        if r.status_code not in (400, 415):
+            return r
+        r.close()
+        plain = super().send(original, **kwargs)
+        if r.status_code == 415 or plain.status_code != 400:
+            module_logger.warning('{} does not accept compressed requests, '
+                                  'sending them uncompressed'.format(host))
+            self.refused_hosts.add(host)
+        return plain
 
 
-def get_session(session, auth_data):
+def make_adapter(pool_connections=DEFAULT_POOL_CONNECTIONS,
+                 pool_maxsize=DEFAULT_POOL_MAXSIZE, pool_block=False,
+                 max_retries=None, compress_requests=None):
+    """
+    Create an HTTPAdapter with the given connection pool configuration.
+
+    :param pool_connections: number of per-host pools to cache
+    :param pool_maxsize: max number of connections kept open per host. Should
+        be at least the number of threads sharing the session, otherwise
+        urllib3 discards the surplus connections ("Connection pool is full").
+    :param pool_block: if True, block when all connections of a pool are in
+        use instead of opening a throw-away connection
+    :param max_retries: None, an int (retry on 5xx with backoff) or a Retry
+    :param compress_requests: None or False, True (gzip), 'gzip' or
+        'deflate' to compress request bodies, see `CompressingAdapter` for
+        how servers refusing them are handled
+    :return: HTTPAdapter
+    """
+    if max_retries is None:
+        max_retries = 0
+    elif not isinstance(max_retries, Retry):
+        max_retries = Retry(total=max_retries,
+                            backoff_factor=0.3,
+                            status_forcelist=[500, 502, 503, 504])
+    kwargs = dict(pool_connections=pool_connections,
+                  pool_maxsize=pool_maxsize,
+                  max_retries=max_retries,
+                  pool_block=pool_block)
+    if compress_requests:
+        encoding = 'gzip' if compress_requests is True else compress_requests
+        return CompressingAdapter(encoding=encoding, **kwargs)
+    return HTTPAdapter(**kwargs)
+
+
+def get_session(session, auth_data, pool_connections=None, pool_maxsize=None,
+                pool_block=None, max_retries=None, keep_alive=None,
+                prefixes=('http://', 'https://'), compress_requests=None,
+                servers=None):
+    """
+    Return a session configured for use by `PoolParty` and `GraphSearch`.
+
+    A new session always gets a pooled adapter mounted on `prefixes` and
+    the URLs of `servers`. An existing session is only reconfigured if some
+    of the pool parameters are given, and then only for the URLs of
+    `servers`, so the same session can be passed to several clients without
+    one overriding the adapters of the other. Clients of the same server
+    share its adapter: a warning is logged when it is replaced. Configure the session before
+    sharing it between threads: mounting adapters is not thread-safe.
+
+    :param session: existing session or None
+    :param auth_data: (user, password) or None to read from the environment
+    :param pool_connections: see `make_adapter`
+    :param pool_maxsize: see `make_adapter`
+    :param pool_block: see `make_adapter`
+    :param max_retries: see `make_adapter`
+    :param keep_alive: if False, send `Connection: close` with every request
+    :param prefixes: URL prefixes to mount the adapter of a new session on
+    :param compress_requests: see `make_adapter`; only applied to the URLs
+        of `servers` if they are given. Compressed responses are requested
+        by requests itself (Accept-Encoding: gzip, deflate).
+    :param servers: URLs of the servers of the client; an existing session
+        is reconfigured for `prefixes` if None
+    :return: session
+    """
+    pool_args = (pool_connections, pool_maxsize, pool_block, max_retries,
+                 compress_requests)
+    server_prefixes = [x.rstrip('/') + '/' for x in servers or ()]
     if session is None:
         if auth_data is None:
             auth_data = get_auth_data()
         session = requests.session()
+        configure = True
+        # also mounted on the servers, to detect clients replacing it
+        prefixes = list(prefixes) + server_prefixes
+    else:
+        configure = any(x is not None for x in pool_args)
+        if servers is not None:
+            prefixes = server_prefixes
+        for prefix in prefixes:
+            if configure and prefix in session.adapters:
+                module_logger.warning('Replacing the adapter of the shared '
+                                      'session for {}'.format(prefix))
+    if configure:
+        pool = dict(
+            pool_connections=(pool_connections if pool_connections is not None
+                              else DEFAULT_POOL_CONNECTIONS),
+            pool_maxsize=(pool_maxsize if pool_maxsize is not None
+                          else DEFAULT_POOL_MAXSIZE),
+            pool_block=bool(pool_block),
+            max_retries=max_retries
+        )
+        adapter = make_adapter(compress_requests=compress_requests, **pool)
+        # bodies are only compressed for the client's own servers
+        plain = (make_adapter(**pool) if compress_requests and server_prefixes
+                 else adapter)
+        for prefix in prefixes:
+            session.mount(prefix,
+                          adapter if prefix in server_prefixes else plain)
+    if keep_alive is not None:
+        session.headers['Connection'] = 'keep-alive' if keep_alive else 'close'
     if auth_data is not None:
         session.auth = auth_data
     return session
 
 
+def json_dumps(obj):
+    """Compact JSON serialization to UTF-8 bytes."""
+    return json.dumps(obj, separators=(',', ':')).encode('utf8')
+
+
+def fast_json_dumps(obj):
+    """
+    `json_dumps` using orjson if it is installed, otherwise the standard
+    library.
+    """
+    try:
+        import orjson
+    except ImportError:
+        return json_dumps(obj)
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def fast_json_loads(data):
+    """`json.loads` using orjson if it is installed."""
+    try:
+        import orjson
+    except ImportError:
+        return json.loads(data)
+    return orjson.loads(data)
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: while a call is in
+    flight, callers with the same key wait for it and share its result (or
+    exception) instead of repeating it.
+    """
+
+    class _Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = None
+            self.error = None
+            self.waiters = 0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = dict()
+
+    def do(self, key, fn):
+        """
+        :param key: hashable key of the call
+        :param fn: function without arguments making the call
+        :return: (result, shared) where `shared` is True if the result of
+            another caller's call was used
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self._Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def waiting(self):
+        """Number of callers waiting for a call in flight."""
+        with self._lock:
+            return sum(call.waiters for call in self._calls.values())
+
+
+def coalesced(method):
+    """
+    Decorator for read methods of `PoolParty` and `GraphSearch`: if the
+    instance has a `single_flight`, identical concurrent calls share one
+    HTTP request and one parsed result. Callers must not modify the shared
+    result.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        flight = getattr(self, 'single_flight', None)
+        if flight is None:
+            return method(self, *args, **kwargs)
+        key = (self.server, method.__name__, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            key = repr(key)
+        result, shared = flight.do(key, lambda: method(self, *args, **kwargs))
+        metrics = getattr(self, 'metrics', None)
+        if metrics is not None:
+            metrics.record_cache('single_flight', hit=shared)
+        return result
+    return wrapper
+
+
 def get_auth_data(env_username='PP_USER', env_password='PP_PASSWORD'):
+    from decouple import config
+
     username = config(env_username)
     pw = config(env_password)
     auth_data = (username, pw)
@@ -31,3 +309,25 @@ def subdict(fromdict, fields, default=None, *, force=False):
     if default is not None:
         force = True
     return { k: fromdict.get(k, default) for k in fields if k in fromdict or force }
+
+
+def chunks_by_length(values, max_items=100, max_chars=4000):
+    """
+    Split `values` into lists of at most `max_items` values whose URL-encoded
+    length (as repeated query parameters) stays below `max_chars`, so that
+    long lists do not exceed URL length limits of GET requests.
+    """
+    from urllib.parse import quote_plus
+
+    chunk = []
+    length = 0
+    for value in values:
+        n = len(quote_plus(str(value))) + 16  # parameter name and separators
+        if chunk and (len(chunk) >= max_items or length + n > max_chars):
+            yield chunk
+            chunk = []
+            length = 0
+        chunk.append(value)
+        length += n
+    if chunk:
+        yield chunk